@@ -1,20 +1,104 @@
-import json
-
-import pandas as pd
-from flask import Flask, render_template, request
+from typing import Dict, Iterator, Tuple, Union
+
+from flask import (
+    Flask,
+    abort,
+    get_template_attribute,
+    jsonify,
+    render_template,
+    request,
+    stream_template,
+)
 
 from generate_object_tree import ArxivTree, AuthorTree, SemSchTree
+from graph_index import AUTHORS, MAX_HOPS, REFERENCES, RELATIONS, WORKED_WITH, GraphIndex
+from http_client import ThrottledError
+from metrics_table import MetricsTable
+from prefetch import Prefetcher
+from progressive import NeighborJobs
 
 CACHE_ARXIV = "../data/papers_arxiv_v1.json"
 CACHE_SEMSCH = "../data/papers_semsch_v1.json"
 CACHE_AUTHORS = "../data/authors_semsch_v1.json"
-ARXIVTREE = ArxivTree(CACHE_ARXIV)
-SEMSCHTREE = SemSchTree(CACHE_SEMSCH)
-AUTHORTREE = AuthorTree(CACHE_AUTHORS)
+# The caches only load the record IDs at startup and read the records from
+# disk the first time they are accessed
+LAZY_CACHE = True
+# Largest number of papers and authors kept in memory, the least recently used
+# ones are evicted and read from disk again when they are accessed, and number
+# of seconds after which the citation counts of a cached record are requested
+# again
+MAX_PAPERS = 50000
+MAX_AUTHORS = 20000
+RECORD_TTL = 7 * 24 * 3600
+ARXIVTREE = ArxivTree(CACHE_ARXIV, lazy=LAZY_CACHE)
+SEMSCHTREE = SemSchTree(
+    CACHE_SEMSCH, lazy=LAZY_CACHE, max_records=MAX_PAPERS, ttl=RECORD_TTL
+)
+AUTHORTREE = AuthorTree(
+    CACHE_AUTHORS, lazy=LAZY_CACHE, max_records=MAX_AUTHORS, ttl=RECORD_TTL
+)
+# Adjacency index of the cached papers and authors, the trees add the records
+# they fetch to it
+GRAPH = GraphIndex(SEMSCHTREE, AUTHORTREE)
+# Number of nodes listed per ranking of /graph_stats
+GRAPH_TOP_NODES = 10
+# The neighbors of the served papers and authors are fetched in the background
+PREFETCH = True
+PREFETCHER = Prefetcher(SEMSCHTREE, AUTHORTREE)
+if PREFETCH:
+    PREFETCHER.start()
+# The explore pages are rendered with the cached neighbors straight away and
+# the remaining neighbors are loaded in the background and polled by the page
+PROGRESSIVE_EXPLORE = True
+NEIGHBOR_JOBS = NeighborJobs()
+# Macros of templates/neighbors.html that render the records of every section
+# of the explore pages
+SECTION_MACROS = {
+    "references": "paper_card",
+    "citations": "paper_card",
+    "papers": "paper_card",
+    "worked_with": "coauthor_card",
+}
+# Number of previous searches shown per page and number of most viewed papers
+HISTORY_PAGE_SIZE = 50
+HISTORY_MOST_VIEWED = 10
+# Default and largest number of records shown per page of the corpus pages
+CORPUS_PAGE_SIZE = 50
+CORPUS_MAX_PAGE_SIZE = 500
+# Messages of the explore pages of the papers and the authors that semantic
+# scholar does not know
+PAPER_NOT_FOUND = "Semantic scholar does not know this paper"
+AUTHOR_NOT_FOUND = "Semantic scholar does not know this author"
 
 app = Flask(__name__)
 
 
+@app.before_request
+def sync_trees():
+    """The function adds the records that other worker processes wrote to the
+    shared cache stores to the trees of this process before every request. The
+    trees sync at most once every SYNC_INTERVAL seconds
+    """
+    for tree in (ARXIVTREE, SEMSCHTREE, AUTHORTREE):
+        tree.sync()
+
+
+@app.errorhandler(ThrottledError)
+def upstream_throttled(error: ThrottledError):
+    """The function answers with HTTP 503 when semantic scholar or arxiv keeps
+    throttling the requests of a page, passing on their Retry-After header
+
+    Returns
+    -------
+    str
+        Message asking the user to try again later
+    """
+    headers = {}
+    if error.response is not None and "Retry-After" in error.response.headers:
+        headers["Retry-After"] = error.response.headers["Retry-After"]
+    return "The upstream API is busy, please try again in a moment", 503, headers
+
+
 @app.route("/")
 def index():
     """Main landing page"""
@@ -44,6 +128,11 @@ def paper_display():
         use_cache = True
     else:
         use_cache = False
+    # Checking if the user wants papers that match both categories
+    if request.form.get("category_and"):
+        category_op = "and"
+    else:
+        category_op = "or"
     # Retreiving paper data based on user inputs
     paper_results = ARXIVTREE.gather_data(
         paper_title=paper_title,
@@ -51,7 +140,8 @@ def paper_display():
         abstract=keyword,
         use_cache=use_cache,
         primary_category=primary_cat,
-        secondary_category =secondary_cat
+        secondary_category =secondary_cat,
+        category_op=category_op,
     )
     return render_template("papers.html", paper_results=paper_results)
 
@@ -74,6 +164,11 @@ def explore_paper():
         # primary_category = ARXIVTREE.papers_dict[arxiv_id_paper].primary_category
         # secondary_category = ARXIVTREE.papers_dict[arxiv_id_paper].secondary_category
 
+        paper_data = SEMSCHTREE.fetch_paper_data(
+            semsch_id, wait_for_neighbors=not PROGRESSIVE_EXPLORE
+        )
+        if paper_data is None:
+            abort(404, description=PAPER_NOT_FOUND)
         (
             title,
             authors,
@@ -84,7 +179,12 @@ def explore_paper():
             url,
             reference_list,
             citation_list,
-        ) = SEMSCHTREE.fetch_paper_data(semsch_id)
+        ) = paper_data
+        job_id = None
+        if PROGRESSIVE_EXPLORE and SEMSCHTREE.missing_neighbors(semsch_id):
+            job_id = NEIGHBOR_JOBS.submit(
+                lambda emit: SEMSCHTREE.load_neighbors(semsch_id, emit)
+            )
         return render_template(
             "paper_explore.html",
             title=title,
@@ -96,6 +196,8 @@ def explore_paper():
             url=url,
             reference_list=reference_list,
             citation_list=citation_list,
+            job_id=job_id,
+            node_id=semsch_id,
         )
 
 
@@ -112,6 +214,11 @@ def explore_paper_sch():
     """
     if request.form.get("paper_id"):
         id_paper = request.form["paper_id"]
+        paper_data = SEMSCHTREE.fetch_paper_data(
+            id_paper, wait_for_neighbors=not PROGRESSIVE_EXPLORE
+        )
+        if paper_data is None:
+            abort(404, description=PAPER_NOT_FOUND)
         (
             title,
             authors,
@@ -122,7 +229,12 @@ def explore_paper_sch():
             url,
             reference_list,
             citation_list,
-        ) = SEMSCHTREE.fetch_paper_data(id_paper)
+        ) = paper_data
+        job_id = None
+        if PROGRESSIVE_EXPLORE and SEMSCHTREE.missing_neighbors(id_paper):
+            job_id = NEIGHBOR_JOBS.submit(
+                lambda emit: SEMSCHTREE.load_neighbors(id_paper, emit)
+            )
         return render_template(
             "paper_explore.html",
             title=title,
@@ -134,6 +246,8 @@ def explore_paper_sch():
             url=url,
             reference_list=reference_list,
             citation_list=citation_list,
+            job_id=job_id,
+            node_id=id_paper,
         )
 
 
@@ -151,6 +265,11 @@ def explore_author_sch():
     # Extracting the author ID
     if request.form.get("author_id"):
         author_id = request.form["author_id"]
+        author_data = AUTHORTREE.get_author_data(
+            SEMSCHTREE, author_id, wait_for_neighbors=not PROGRESSIVE_EXPLORE
+        )
+        if author_data is None:
+            abort(404, description=AUTHOR_NOT_FOUND)
         (
             name,
             home,
@@ -159,7 +278,14 @@ def explore_author_sch():
             hindex,
             worked_with_authors,
             papers_author,
-        ) = AUTHORTREE.get_author_data(SEMSCHTREE, author_id)
+        ) = author_data
+        job_id = None
+        if PROGRESSIVE_EXPLORE and any(
+            AUTHORTREE.missing_neighbors(SEMSCHTREE, author_id)
+        ):
+            job_id = NEIGHBOR_JOBS.submit(
+                lambda emit: AUTHORTREE.load_neighbors(SEMSCHTREE, author_id, emit)
+            )
         return render_template(
             "author_explore.html",
             name=name,
@@ -169,9 +295,84 @@ def explore_author_sch():
             hindex=hindex,
             worked_with_authors=worked_with_authors,
             papers_author=papers_author,
+            job_id=job_id,
+            node_id=author_id,
         )
 
 
+@app.route("/papers/neighbors/<job_id>", methods=["GET"])
+def explore_neighbors(job_id: str):
+    """The function returns the neighbors of an explore page that were loaded
+    in the background since the last poll of the page, rendered with the macros
+    of templates/neighbors.html
+
+    Parameters
+    ----------
+    job_id : str
+        ID of the background job of the explore page
+
+    Returns
+    -------
+    json
+        The new events of the job, the cursor for the next poll and whether
+        the job is done
+    """
+    result = NEIGHBOR_JOBS.poll(job_id, max(request.args.get("cursor", 0, type=int), 0))
+    if result is None:
+        # The job runs in another worker process, the neighbors are read from
+        # the shared cache stores instead
+        result = neighbor_snapshot(request.args.get("kind"), request.args.get("id"))
+    if result is None:
+        abort(404)
+    for event in result["events"]:
+        macro = get_template_attribute("neighbors.html", SECTION_MACROS[event["section"]])
+        event["html"] = [str(macro(f)) for f in event["records"]]
+    return jsonify(result)
+
+
+def neighbor_snapshot(kind: str, node_id: str) -> Union[Dict, None]:
+    """The function returns the cached neighbors of a paper or an author in the
+    format of NeighborJobs.poll, replacing every section of the page. The page
+    is done once all the neighbors are cached
+
+    Parameters
+    ----------
+    kind : str
+        "paper" or "author"
+    node_id : str
+        Semantic scholar ID of the paper or the author
+
+    Returns
+    -------
+    Union[Dict, None]
+        Events of the sections of the page, None if the node is unknown
+    """
+    if kind == "paper":
+        SEMSCHTREE.sync(force=True)
+        if node_id not in SEMSCHTREE.papers_dict:
+            return None
+        references, citations = SEMSCHTREE.paper_neighbors(node_id)
+        sections = {
+            "references": SEMSCHTREE.cached_papers(references),
+            "citations": SEMSCHTREE.cached_papers(citations),
+        }
+        done = not SEMSCHTREE.missing_neighbors(node_id)
+    elif kind == "author":
+        SEMSCHTREE.sync(force=True)
+        AUTHORTREE.sync(force=True)
+        if node_id not in AUTHORTREE.author_dict:
+            return None
+        worked_with_authors, papers_author = AUTHORTREE.rank_neighbors(SEMSCHTREE, node_id)
+        sections = {"papers": papers_author, "worked_with": worked_with_authors}
+        done = not any(AUTHORTREE.missing_neighbors(SEMSCHTREE, node_id))
+    else:
+        return None
+    events = [
+        {"section": k, "records": v, "replace": True} for k, v in sections.items()
+    ]
+    return {"events": events, "cursor": 0, "done": done, "error": None}
+
+
 @app.route("/prev_searches", methods=["GET", "POST"])
 def prev_papers_explored():
     """The function returns the previous papers explored by the user
@@ -182,9 +383,77 @@ def prev_papers_explored():
         A renderable HTML page that contains information about user's previous
         searches
     """
-    df = pd.read_csv("../data/prev_searches.csv")
-    df_records = df.to_dict("records")
-    return render_template("prev_searches.html", records=df_records)
+    page_idx = max(request.args.get("page", 0, type=int), 0)
+    records, total = SEMSCHTREE.history.page(page_idx, HISTORY_PAGE_SIZE)
+    most_viewed = SEMSCHTREE.history.most_viewed(HISTORY_MOST_VIEWED)
+    return render_template(
+        "prev_searches.html",
+        records=records,
+        most_viewed=most_viewed,
+        page_idx=page_idx,
+        page_count=(total + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE,
+    )
+
+
+def corpus_page(
+    metrics: MetricsTable, default_sort: str
+) -> Tuple[Iterator[Dict], Dict]:
+    """The function selects one page of a corpus page from the metrics table
+    using the query parameters of the request, i.e., "page", "page_size",
+    "sort", "order" and "min_<column>"/"max_<column>" for every column of the
+    table. The records without a value for the sort column are shown last
+
+    Parameters
+    ----------
+    metrics : MetricsTable
+        Metrics table of the corpus
+    default_sort : str
+        Column to sort by when the request does not give one
+
+    Returns
+    -------
+    Tuple[Iterator[Dict], Dict]
+        Metrics of the records of the page and the parameters of the page to
+        render the sort, filter and page controls
+    """
+    sort = request.args.get("sort", default_sort)
+    if sort not in metrics.column_names:
+        sort = default_sort
+    order = "asc" if request.args.get("order") == "asc" else "desc"
+    page_size = request.args.get("page_size", CORPUS_PAGE_SIZE, type=int)
+    page_size = min(max(page_size, 1), CORPUS_MAX_PAGE_SIZE)
+    page_idx = max(request.args.get("page", 0, type=int), 0)
+
+    min_values = {}
+    max_values = {}
+    for name in metrics.column_names:
+        min_value = request.args.get(f"min_{name}", type=float)
+        max_value = request.args.get(f"max_{name}", type=float)
+        if min_value is not None:
+            min_values[name] = min_value
+        if max_value is not None:
+            max_values[name] = max_value
+
+    # The rows are taken in the cached sorted order of the sort column, which is
+    # only sorted again after the column changed. The filters are a vectorized
+    # mask over that order, and only the records of the page are read from the
+    # tree
+    rows = metrics.sorted_rows(sort, descending=order == "desc")
+    if min_values or max_values:
+        rows = metrics.filter(rows, min_values=min_values, max_values=max_values)
+    page_rows = rows[page_idx * page_size : (page_idx + 1) * page_size]
+    params = {
+        "sort": sort,
+        "order": order,
+        "page_idx": page_idx,
+        "page_size": page_size,
+        "page_count": (len(rows) + page_size - 1) // page_size,
+        "total": len(rows),
+        "columns": metrics.column_names,
+        "min_values": min_values,
+        "max_values": max_values,
+    }
+    return iter(metrics.records(page_rows)), params
 
 
 @app.route("/paper_corpus", methods=["GET", "POST"])
@@ -193,7 +462,8 @@ def paper_corpus_explored():
     corpus(cached file). Note that it might be possible that a paper is present
     in the corpus(cache file) and still takes time to load. This is because
     we need to request the sematic scholar API for the details about a paper's
-    authors, references and citations.
+    authors, references and citations. The papers are served one page at a
+    time and the page is streamed while the titles are read
 
     Returns
     -------
@@ -201,22 +471,11 @@ def paper_corpus_explored():
         A renderable HTML page that contains information about papers in the
         corpus
     """
-    req_keys = [
-        "id",
-        "title",
-        "reference_count",
-        "citation_count",
-        "influential_paper_citations",
-    ]
-    with open(CACHE_SEMSCH, "r") as f:
-        data_paper = json.load(f)
-
-    paper_records = data_paper.values()
-    paper_records = [
-        {k: v for k, v in f.items() if k in req_keys} for f in paper_records
-    ]
-
-    return render_template("paper_corpus.html", paper_records=paper_records)
+    page_records, params = corpus_page(SEMSCHTREE.metrics, "citation_count")
+    paper_records = (
+        {**f, "title": SEMSCHTREE.papers_dict[f["id"]].title} for f in page_records
+    )
+    return stream_template("paper_corpus.html", paper_records=paper_records, **params)
 
 
 @app.route("/author_corpus", methods=["GET", "POST"])
@@ -225,7 +484,8 @@ def author_corpus_explored():
     corpus(cached file). Note that it might be possible that an author is present
     in the corpus(cache file) and still takes time to load. This is because
     we need to request the sematic scholar API for the details about a author's
-    papers and the other authors who worked with the author.
+    papers and the other authors who worked with the author. The authors are
+    served one page at a time and the page is streamed while the names are read
 
     Returns
     -------
@@ -233,16 +493,106 @@ def author_corpus_explored():
         A renderable HTML page that contains information about authors in the
         corpus
     """
-    req_keys = ["id", "name", "paper_count", "citations", "hindex"]
-    with open(CACHE_AUTHORS, "r") as f:
-        data_authors = json.load(f)
+    page_records, params = corpus_page(AUTHORTREE.metrics, "citations")
+    author_records = (
+        {**f, "name": AUTHORTREE.author_dict[f["id"]].name} for f in page_records
+    )
+    return stream_template("author_corpus.html", author_records=author_records, **params)
+
+
+@app.route("/prefetch_stats", methods=["GET"])
+def prefetch_stats():
+    """The function returns the counters of the background prefetcher, e.g.,
+    its hit rate, as JSON
+
+    Returns
+    -------
+    json
+        Counters of the prefetcher
+    """
+    return jsonify(PREFETCHER.get_stats())
 
-    author_records = data_authors.values()
-    author_records = [
-        {k: v for k, v in f.items() if k in req_keys} for f in author_records
-    ]
 
-    return render_template("author_corpus.html", author_records=author_records)
+@app.route("/graph/<relation>/<node_id>", methods=["GET"])
+def graph_neighbors(relation: str, node_id: str):
+    """The function returns the neighbors of a paper or an author from the
+    adjacency index as JSON, e.g., /graph/references/<paper_id>?k=2 for the
+    papers within 2 hops of references, without reading the records
+
+    Parameters
+    ----------
+    relation : str
+        Name of the relation, e.g., references, citations, authors, papers or
+        worked_with
+    node_id : str
+        Semantic scholar ID of the paper or the author
+
+    Returns
+    -------
+    json
+        The neighbors, the out and in degree of the node and, if k is given,
+        the nodes within k hops
+    """
+    if relation not in RELATIONS:
+        abort(404)
+    result = {
+        "id": node_id,
+        "relation": relation,
+        "neighbors": GRAPH.neighbors(relation, node_id),
+        "degree": GRAPH.degree(relation, node_id),
+        "in_degree": GRAPH.degree(relation, node_id, incoming=True),
+    }
+    k = request.args.get("k", type=int)
+    if k is not None:
+        source_kind, target_kind = RELATIONS[relation]
+        if source_kind != target_kind or not 1 <= k <= MAX_HOPS:
+            abort(400)
+        result["k_hop"] = GRAPH.k_hop(node_id, relation, k)
+    return jsonify(result)
+
+
+@app.route("/graph_stats", methods=["GET"])
+def graph_stats():
+    """The function returns the size of the adjacency index and the most
+    connected papers and authors of the cache as JSON
+
+    Returns
+    -------
+    json
+        Counters of the index, the most referenced papers, the authors with the
+        most cached papers and the authors with the most coauthors
+    """
+    return jsonify(
+        {
+            **GRAPH.get_stats(),
+            "most_referenced": GRAPH.top_degrees(REFERENCES, GRAPH_TOP_NODES, incoming=True),
+            "most_papers": GRAPH.top_degrees(AUTHORS, GRAPH_TOP_NODES, incoming=True),
+            "most_coauthors": GRAPH.top_degrees(WORKED_WITH, GRAPH_TOP_NODES),
+        }
+    )
+
+
+@app.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    """The function returns the counters of the papers and the authors kept in
+    memory, e.g., their hit rate and the number of evicted records, of the
+    cached arxiv responses and of the IDs missing from semantic scholar as JSON
+
+    Returns
+    -------
+    json
+        Counters of the paper, author, arxiv response and negative caches
+    """
+    return jsonify(
+        {
+            "papers": SEMSCHTREE.get_cache_stats(),
+            "authors": AUTHORTREE.get_cache_stats(),
+            "arxiv_responses": ARXIVTREE.responses.get_stats(),
+            "missing_arxiv_papers": ARXIVTREE.misses.get_stats(),
+            "missing_papers": SEMSCHTREE.misses.get_stats(),
+            "missing_authors": AUTHORTREE.misses.get_stats(),
+        }
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,819 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+import zlib
+from collections import Counter, OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Set, Tuple, Union
+
+# Extension of the SQLite file that replaces a JSON cache file
+STORE_EXTENSION = ".sqlite3"
+# Number of milliseconds a writer waits for the lock of the database
+BUSY_TIMEOUT = 30000
+# Number of bytes of the database file that SQLite reads through a memory map
+MMAP_SIZE = 256 * 1024 * 1024
+# Suffix of the SQLite file of the HTTP responses cached next to a JSON cache
+RESPONSES_SUFFIX = "_responses"
+# Number of seconds a cached HTTP response is served without requesting it again
+RESPONSE_TTL = 24 * 3600
+# Largest number of compressed bytes of the cached HTTP responses, the least
+# recently used responses are evicted beyond it
+MAX_RESPONSE_BYTES = 64 * 1024 * 1024
+# zlib compression level of the cached HTTP responses
+RESPONSE_COMPRESSION = 6
+# Number of bytes read at a time when a response is cached from a file
+RESPONSE_CHUNK_SIZE = 64 * 1024
+# Suffix of the SQLite file of the IDs missing upstream, kept next to a JSON
+# cache
+MISSES_SUFFIX = "_misses"
+# Number of seconds an ID that is missing upstream is not requested again
+MISS_TTL = 7 * 24 * 3600
+# Number of IDs looked up per query of the missing IDs, below the limit of
+# SQLite on the number of query parameters
+MISS_QUERY_SIZE = 500
+
+
+def connect(db_pth: str) -> sqlite3.Connection:
+    """Returns a new connection to the SQLite database in WAL mode"""
+    conn = sqlite3.connect(db_pth, timeout=BUSY_TIMEOUT / 1000)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    return conn
+
+
+class CacheStore:
+    def __init__(self, db_pth: str):
+        """A key-value store of JSON records backed by SQLite in WAL mode. Every
+        write is a single transaction, so a crash in the middle of a write
+        leaves the previous version of the records intact, and only the records
+        that changed are written
+
+        Parameters
+        ----------
+        db_pth : str
+            Path of the SQLite database file
+        """
+        self.db_pth = db_pth
+        self._local = threading.local()
+        with self.connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            # Other processes find the records written since their last sync
+            # through this index
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS records_updated_at ON records (updated_at)"
+            )
+
+    @classmethod
+    def for_cache(cls, cache_pth: str) -> "CacheStore":
+        """The function returns the store that replaces the given JSON cache
+        file. The store lives next to the JSON file and the records of the JSON
+        file are imported the first time the store is opened
+
+        Parameters
+        ----------
+        cache_pth : str
+            Path of the JSON cache file
+
+        Returns
+        -------
+        CacheStore
+            Store of the cache
+        """
+        db_pth = os.path.splitext(cache_pth)[0] + STORE_EXTENSION
+        store = cls(db_pth)
+        if len(store) == 0 and os.path.exists(cache_pth):
+            store.import_json(cache_pth)
+        return store
+
+    def connection(self) -> sqlite3.Connection:
+        """Returns the connection of the current thread to the database"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.db_pth)
+            self._local.conn = conn
+        return conn
+
+    def __len__(self) -> int:
+        return self.connection().execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def __contains__(self, key: str) -> bool:
+        row = self.connection().execute(
+            "SELECT 1 FROM records WHERE key = ?", (key,)
+        ).fetchone()
+        return row is not None
+
+    def get(self, key: str) -> Union[Dict, None]:
+        """Returns the record stored under the key, None if there is none"""
+        row = self.connection().execute(
+            "SELECT value FROM records WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def get_at(self, offset: int) -> Union[Dict, None]:
+        """Returns the record stored at the given offset, i.e., the rowid of the
+        record as returned by self.offsets
+        """
+        row = self.connection().execute(
+            "SELECT value FROM records WHERE rowid = ?", (offset,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def get_entry(
+        self, key: str, offset: int = None
+    ) -> Union[Tuple[Dict, float], None]:
+        """The function returns the record stored under the key together with
+        the time it was written, None if there is none. The record is read at
+        the given offset if there is one, and looked up by its key otherwise
+
+        Parameters
+        ----------
+        key : str
+            Key of the record
+        offset : int, optional
+            Offset of the record as returned by self.offsets, by default None
+
+        Returns
+        -------
+        Union[Tuple[Dict, float], None]
+            Record and its write time in seconds since the epoch
+        """
+        row = None
+        if offset is not None:
+            row = self.connection().execute(
+                "SELECT value, updated_at FROM records WHERE rowid = ?", (offset,)
+            ).fetchone()
+        if row is None:
+            row = self.connection().execute(
+                "SELECT value, updated_at FROM records WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def offsets(self) -> Dict[str, int]:
+        """Returns the offset of every record keyed by the record ID, in the
+        order the records were added. Only the keys are read, not the records
+        """
+        rows = self.connection().execute(
+            "SELECT key, rowid FROM records ORDER BY rowid"
+        )
+        return dict(rows.fetchall())
+
+    def keys(self) -> List[str]:
+        """Returns the keys of all the records in the order they were added"""
+        rows = self.connection().execute("SELECT key FROM records ORDER BY rowid")
+        return [f[0] for f in rows]
+
+    def iter_items(self) -> Iterator[Tuple[str, Dict]]:
+        """Iterates over all the records in the order they were added without
+        loading all of them in memory at once
+        """
+        rows = self.connection().execute(
+            "SELECT key, value FROM records ORDER BY rowid"
+        )
+        for key, value in rows:
+            yield key, json.loads(value)
+
+    def iter_fields(self, fields: List[str]) -> Iterator[Tuple[str, Dict]]:
+        """Iterates over the given top level fields of all the records in the
+        order they were added. The fields are extracted by SQLite, so the
+        records are not parsed in Python, e.g., to fill a side table of metrics
+        without materializing the records
+
+        Parameters
+        ----------
+        fields : List[str]
+            Names of the top level fields of the records
+
+        Yields
+        ------
+        Tuple[str, Dict]
+            Key of the record and the dictionary of the requested fields
+        """
+        columns = ", ".join(f"json_extract(value, '$.{f}')" for f in fields)
+        rows = self.connection().execute(
+            f"SELECT key, {columns} FROM records ORDER BY rowid"
+        )
+        for row in rows:
+            yield row[0], dict(zip(fields, row[1:]))
+
+    def changed_since(self, since: float) -> Iterator[Tuple[str, Dict, float]]:
+        """Iterates over the records written at or after the given time, e.g.,
+        by other processes sharing the store, in the order they were written
+
+        Parameters
+        ----------
+        since : float
+            Time in seconds since the epoch
+
+        Yields
+        ------
+        Tuple[str, Dict, float]
+            Key, record and write time of every changed record
+        """
+        rows = self.connection().execute(
+            "SELECT key, value, updated_at FROM records WHERE updated_at >= ? "
+            "ORDER BY updated_at",
+            (since,),
+        )
+        for key, value, updated_at in rows:
+            yield key, json.loads(value), updated_at
+
+    def put_many(self, records: Dict[str, Dict]) -> float:
+        """The function writes the given records in a single transaction,
+        replacing the records already stored under the same keys
+
+        Parameters
+        ----------
+        records : Dict[str, Dict]
+            Records keyed by their ID
+
+        Returns
+        -------
+        float
+            Write time of the records, i.e., their updated_at
+        """
+        now = time.time()
+        if not records:
+            return now
+        rows = [(k, json.dumps(v), now) for k, v in records.items()]
+        with self.connection() as conn:
+            conn.executemany(
+                "INSERT INTO records (key, value, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                "value = excluded.value, updated_at = excluded.updated_at",
+                rows,
+            )
+        return now
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        """The function deletes the records stored under the given keys"""
+        with self.connection() as conn:
+            conn.executemany("DELETE FROM records WHERE key = ?", [(f,) for f in keys])
+
+    def import_json(self, json_pth: str) -> int:
+        """The function imports the records of a JSON cache file, i.e., a JSON
+        object of records keyed by their ID
+
+        Parameters
+        ----------
+        json_pth : str
+            Path of the JSON cache file
+
+        Returns
+        -------
+        int
+            Number of records imported
+        """
+        try:
+            with open(json_pth, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if not isinstance(data, dict):
+            return 0
+        self.put_many(data)
+        return len(data)
+
+    def export_json(self, json_pth: str) -> None:
+        """The function writes all the records to a JSON cache file, e.g., to
+        share a snapshot of the cache
+        """
+        data = dict(self.iter_items())
+        tmp_pth = json_pth + ".tmp"
+        with open(tmp_pth, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_pth, json_pth)
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        db_pth: str,
+        ttl: float = RESPONSE_TTL,
+        max_bytes: int = MAX_RESPONSE_BYTES,
+    ):
+        """A cache of the text of HTTP responses keyed by their normalized URL,
+        e.g., the results of arxiv searches. The responses are stored
+        compressed in SQLite, served for ttl seconds and the least recently
+        used ones are evicted once they take more than max_bytes
+
+        Parameters
+        ----------
+        db_pth : str
+            Path of the SQLite database file
+        ttl : float, optional
+            Number of seconds a response is served, by default RESPONSE_TTL
+        max_bytes : int, optional
+            Largest number of compressed bytes of all the responses, by default
+            MAX_RESPONSE_BYTES
+        """
+        self.db_pth = db_pth
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hit_count = 0
+        self.miss_count = 0
+        self.stale_count = 0
+        self.eviction_count = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        with self.connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, "
+                "fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+                "ON responses (accessed_at)"
+            )
+
+    @classmethod
+    def for_cache(cls, cache_pth: str, **kwargs) -> "ResponseCache":
+        """Returns the response cache that lives next to the given JSON cache
+        file, e.g., the arxiv responses next to the arxiv papers
+        """
+        db_pth = os.path.splitext(cache_pth)[0] + RESPONSES_SUFFIX + STORE_EXTENSION
+        return cls(db_pth, **kwargs)
+
+    def connection(self) -> sqlite3.Connection:
+        """Returns the connection of the current thread to the database"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.db_pth)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        """The function returns the key of a URL. The query parameters are
+        sorted, and the whitespace and the case of the search query are
+        normalized since they do not change the results of the search
+
+        Parameters
+        ----------
+        url : str
+            URL of the request
+
+        Returns
+        -------
+        str
+            Normalized URL
+        """
+        parts = urllib.parse.urlsplit(url)
+        params = []
+        for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True):
+            if k == "search_query":
+                v = " ".join(v.lower().split())
+            params.append((k, v))
+        query = urllib.parse.urlencode(sorted(params))
+        return urllib.parse.urlunsplit(
+            (parts.scheme.lower(), parts.netloc.lower(), parts.path, query, "")
+        )
+
+    def get(self, url: str) -> Union[str, None]:
+        """The function returns the cached text of the response of the URL,
+        None if it is not cached or older than self.ttl seconds
+
+        Parameters
+        ----------
+        url : str
+            URL of the request
+
+        Returns
+        -------
+        Union[str, None]
+            Text of the response
+        """
+        key = self.normalize_url(url)
+        row = self.connection().execute(
+            "SELECT body, fetched_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or now - row[1] > self.ttl:
+            with self._lock:
+                self.miss_count += 1
+                self.stale_count += row is not None
+            return None
+        with self.connection() as conn:
+            conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        with self._lock:
+            self.hit_count += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, url: str, text: str) -> None:
+        """The function caches the text of the response of the URL and evicts
+        the expired and the least recently used responses beyond
+        self.max_bytes
+
+        Parameters
+        ----------
+        url : str
+            URL of the request
+        text : str
+            Text of the response
+        """
+        self.put_body(url, zlib.compress(text.encode("utf-8"), RESPONSE_COMPRESSION))
+
+    def put_file(self, url: str, source: BinaryIO) -> None:
+        """The function caches the response of the URL read from a binary
+        file, e.g., a response spooled to a temporary file while it was
+        parsed. The file is compressed chunk by chunk, so only the compressed
+        response is held in memory
+
+        Parameters
+        ----------
+        url : str
+            URL of the request
+        source : BinaryIO
+            Binary file of the response, read from its current position
+        """
+        compressor = zlib.compressobj(RESPONSE_COMPRESSION)
+        chunks = []
+        for chunk in iter(lambda: source.read(RESPONSE_CHUNK_SIZE), b""):
+            chunks.append(compressor.compress(chunk))
+        chunks.append(compressor.flush())
+        self.put_body(url, b"".join(chunks))
+
+    def put_body(self, url: str, body: bytes) -> None:
+        """The function stores the compressed response of the URL and evicts
+        the expired and the least recently used responses beyond
+        self.max_bytes
+        """
+        now = time.time()
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT INTO responses (key, body, size, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+                "body = excluded.body, size = excluded.size, "
+                "fetched_at = excluded.fetched_at, accessed_at = excluded.accessed_at",
+                (self.normalize_url(url), body, len(body), now, now),
+            )
+            evicted = conn.execute(
+                "DELETE FROM responses WHERE fetched_at < ?", (now - self.ttl,)
+            ).rowcount
+            total = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+            if total > self.max_bytes:
+                rows = conn.execute(
+                    "SELECT key, size FROM responses ORDER BY accessed_at"
+                ).fetchall()
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    total -= size
+                    evicted += 1
+        with self._lock:
+            self.eviction_count += evicted
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        """Returns the number of cached responses and their compressed bytes,
+        the number of hits, misses and stale responses, the hit rate and the
+        number of evicted responses
+        """
+        count, size = self.connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        with self._lock:
+            lookups = self.hit_count + self.miss_count
+            return {
+                "responses": count,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hit_count,
+                "misses": self.miss_count,
+                "hit_rate": self.hit_count / lookups if lookups else 0.0,
+                "stale": self.stale_count,
+                "evictions": self.eviction_count,
+            }
+
+
+class NegativeCache:
+    def __init__(self, db_pth: str, ttl: float = MISS_TTL):
+        """A cache of the IDs that an upstream API does not know, e.g., the
+        arxiv papers that are not on semantic scholar. The IDs are not
+        requested again for ttl seconds. The misses are kept apart from the
+        records, so the records only hold what the API returned
+
+        Parameters
+        ----------
+        db_pth : str
+            Path of the SQLite database file
+        ttl : float, optional
+            Number of seconds a missing ID is not requested again, by default
+            MISS_TTL
+        """
+        self.db_pth = db_pth
+        self.ttl = ttl
+        self.lookup_count = 0
+        self.hit_count = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        with self.connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS misses ("
+                "key TEXT PRIMARY KEY, missed_at REAL NOT NULL)"
+            )
+
+    @classmethod
+    def for_cache(cls, cache_pth: str, **kwargs) -> "NegativeCache":
+        """Returns the negative cache that lives next to the given JSON cache
+        file, e.g., the missing papers next to the semantic scholar papers
+        """
+        db_pth = os.path.splitext(cache_pth)[0] + MISSES_SUFFIX + STORE_EXTENSION
+        return cls(db_pth, **kwargs)
+
+    def connection(self) -> sqlite3.Connection:
+        """Returns the connection of the current thread to the database"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.db_pth)
+            self._local.conn = conn
+        return conn
+
+    def add(self, keys: Iterable[str]) -> None:
+        """The function records the given IDs as missing upstream"""
+        now = time.time()
+        rows = [(f, now) for f in dict.fromkeys(keys) if f is not None]
+        if not rows:
+            return
+        with self.connection() as conn:
+            conn.executemany(
+                "INSERT INTO misses (key, missed_at) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET missed_at = excluded.missed_at",
+                rows,
+            )
+
+    def discard(self, keys: Iterable[str]) -> None:
+        """The function forgets the given IDs, e.g., once they are found"""
+        with self.connection() as conn:
+            conn.executemany("DELETE FROM misses WHERE key = ?", [(f,) for f in keys])
+
+    def missing(self, keys: Iterable[str]) -> Set[str]:
+        """The function returns the given IDs that were found missing upstream
+        less than self.ttl seconds ago
+
+        Parameters
+        ----------
+        keys : Iterable[str]
+            IDs to look up
+
+        Returns
+        -------
+        Set[str]
+            IDs that are not requested again
+        """
+        keys = [f for f in dict.fromkeys(keys) if f is not None]
+        since = time.time() - self.ttl
+        missing = set()
+        for start_idx in range(0, len(keys), MISS_QUERY_SIZE):
+            chunk_keys = keys[start_idx : start_idx + MISS_QUERY_SIZE]
+            marks = ", ".join("?" * len(chunk_keys))
+            rows = self.connection().execute(
+                f"SELECT key FROM misses WHERE missed_at >= ? AND key IN ({marks})",
+                (since, *chunk_keys),
+            )
+            missing.update(f[0] for f in rows)
+        with self._lock:
+            self.lookup_count += len(keys)
+            self.hit_count += len(missing)
+        return missing
+
+    def __contains__(self, key: str) -> bool:
+        return bool(self.missing([key]))
+
+    def get_stats(self) -> Dict[str, int]:
+        """Returns the number of missing IDs, the number of IDs looked up and
+        the number of them that were not requested again
+        """
+        count = self.connection().execute(
+            "SELECT COUNT(*) FROM misses WHERE missed_at >= ?",
+            (time.time() - self.ttl,),
+        ).fetchone()[0]
+        with self._lock:
+            return {
+                "misses": count,
+                "lookups": self.lookup_count,
+                "skipped": self.hit_count,
+            }
+
+
+class LazyRecordDict(MutableMapping):
+    def __init__(
+        self,
+        store: CacheStore,
+        factory: Callable[[Dict], Any],
+        max_records: int = None,
+        ttl: float = None,
+        evictable: Callable[[str], bool] = None,
+    ):
+        """A dictionary over the records of a cache store that only holds the
+        offset of every record at startup and materializes a record the first
+        time it is accessed. The store reads the records through a memory map,
+        so startup time and memory only depend on the number of records and not
+        on their size. The materialized records can be bounded, in which case
+        the least recently used ones are evicted and read from the store again
+        when they are accessed
+
+        Parameters
+        ----------
+        store : CacheStore
+            Store of the records
+        factory : Callable[[Dict], Any]
+            Function that builds the in-memory object of a stored record, e.g.,
+            lambda v: SemSchPaper(**v)
+        max_records : int, optional
+            Largest number of materialized records, by default None for no
+            bound. Pinned records are not evicted, so they can exceed it
+        ttl : float, optional
+            Number of seconds after which a record is stale, by default None
+            for records that never go stale
+        evictable : Callable[[str], bool], optional
+            Function that tells whether a record can be evicted, e.g., False
+            for the records that are not written to the store yet, by default
+            None for all the records
+        """
+        self.store = store
+        self.factory = factory
+        self.max_records = max_records
+        self.ttl = ttl
+        self.evictable = evictable
+        # Offsets of the records by ID, None for records that are not stored yet
+        self.offsets = store.offsets()
+        # Materialized records from the least to the most recently used, and
+        # the time every one of them was fetched
+        self.records = OrderedDict()
+        self.fetched_at = {}
+        # Number of users of every pinned record
+        self.pins = Counter()
+        self.hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+        self.stale_count = 0
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key: str) -> Any:
+        with self._lock:
+            record = self.records.get(key)
+            if record is not None:
+                self.records.move_to_end(key)
+                self.hit_count += 1
+                return record
+            if key not in self.offsets:
+                raise KeyError(key)
+            offset = self.offsets[key]
+        entry = self.store.get_entry(key, offset)
+        if entry is None:
+            raise KeyError(key)
+        value, updated_at = entry
+        record = self.factory(value)
+        with self._lock:
+            self.miss_count += 1
+            self._put(key, record, updated_at)
+        return record
+
+    def __setitem__(self, key: str, record: Any) -> None:
+        with self._lock:
+            self._put(key, record, time.time())
+            if key not in self.offsets:
+                self.offsets[key] = None
+
+    def load(self, key: str, record: Any, fetched_at: float = None) -> None:
+        """The function adds a record that is already in the store, e.g.,
+        written by another process, without marking it as a new record
+        """
+        with self._lock:
+            self._put(key, record, fetched_at if fetched_at is not None else time.time())
+            self.offsets.setdefault(key, None)
+
+    def _put(self, key: str, record: Any, fetched_at: float) -> None:
+        self.records[key] = record
+        self.records.move_to_end(key)
+        self.fetched_at[key] = fetched_at
+        self._evict()
+
+    def _evict(self) -> None:
+        if self.max_records is None:
+            return
+        # Every record is looked at once at most, the pinned records and the
+        # records that cannot be evicted are moved to the recently used end
+        for _ in range(len(self.records)):
+            if len(self.records) <= self.max_records:
+                return
+            key = next(iter(self.records))
+            if self.pins[key] > 0 or (
+                self.evictable is not None and not self.evictable(key)
+            ):
+                self.records.move_to_end(key)
+                continue
+            del self.records[key]
+            del self.fetched_at[key]
+            self.eviction_count += 1
+
+    def trim(self) -> None:
+        """The function evicts the least recently used records until the
+        materialized records are within the bound, e.g., once the records that
+        could not be evicted are written to the store
+        """
+        with self._lock:
+            self._evict()
+
+    @contextmanager
+    def pin(self, keys: Iterable[str]) -> Iterator[None]:
+        """A context in which the given records are not evicted, e.g., the
+        records of a page that is being built. The records do not need to be
+        materialized or even present
+        """
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            self.pins.update(keys)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.pins.subtract(keys)
+                for key in keys:
+                    if self.pins[key] <= 0:
+                        del self.pins[key]
+                self._evict()
+
+    def is_stale(self, key: str) -> bool:
+        """The function tells whether a record was fetched more than self.ttl
+        seconds ago. The record is materialized if it is not already
+
+        Parameters
+        ----------
+        key : str
+            Key of the record
+
+        Returns
+        -------
+        bool
+            True if the record is stale, False otherwise
+        """
+        if self.ttl is None:
+            return False
+        fetched_at = self.fetched_at.get(key)
+        if fetched_at is None:
+            self[key]
+            fetched_at = self.fetched_at.get(key, 0.0)
+        stale = time.time() - fetched_at > self.ttl
+        if stale:
+            with self._lock:
+                self.stale_count += 1
+        return stale
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            del self.offsets[key]
+            self.records.pop(key, None)
+            self.fetched_at.pop(key, None)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.offsets
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.offsets))
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def materialized_count(self) -> int:
+        """Returns the number of records that have been materialized"""
+        return len(self.records)
+
+    def get_stats(self) -> Dict[str, Union[int, float, None]]:
+        """Returns the number of records, of materialized and pinned records,
+        the number of accesses served from memory (hits) and from the store
+        (misses), the hit rate, and the number of evicted and stale records
+        """
+        with self._lock:
+            accesses = self.hit_count + self.miss_count
+            return {
+                "records": len(self.offsets),
+                "materialized": len(self.records),
+                "max_records": self.max_records,
+                "pinned": len(self.pins),
+                "hits": self.hit_count,
+                "misses": self.miss_count,
+                "hit_rate": self.hit_count / accesses if accesses else 0.0,
+                "evictions": self.eviction_count,
+                "stale": self.stale_count,
+            }
@@ -1,19 +1,31 @@
 import sys
 
 sys.path.append("../")
+import io
 import json
+import sqlite3
+import tempfile
+import threading
 import time
 import urllib.parse
+from contextlib import nullcontext
 import xml.etree.ElementTree as ET
-from typing import Dict, List, Tuple, Union
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, ContextManager, Dict, Iterable, Iterator, List, Tuple, Union
 
-import numpy as np
-import pandas as pd
 import requests
 from data.secret_key import SemanticScholarCreds
 
-import utils
+from cache_store import CacheStore, LazyRecordDict, NegativeCache, ResponseCache
+from search_history import SearchHistory
+from search_index import AuthorIndex, CategoryIndex, TokenIndex, TrigramIndex
+from http_client import HttpClient, NoCapacityError, ThrottledError, get_client
+from metrics_table import AUTHOR_METRICS, PAPER_METRICS, MetricsTable, top_k_keys
+from graph_index import CITATIONS, PAPERS, REFERENCES, WORKED_WITH
+from prefetch import AUTHOR, PAPER
 from primitive_objects import ArxivID, ArxivPaper, Authors, SemSchPaper
+from single_flight import SingleFlight
 
 SEMSCH_PAPER_KEYS = [
     "id",
@@ -29,35 +41,108 @@ SEMSCH_PAPER_KEYS = [
     "is_open_access",
 ]
 SEMSCH_LINK = "https://api.semanticscholar.org/graph/v1"
+# Maximum number of paper IDs sent in a single request to the semantic scholar
+# batch endpoint
+SEMSCH_BATCH_SIZE = 100
+# Fields requested for every semantic scholar paper, i.e., author, citation and
+# general fields
+SEMSCH_AUTHOR_FIELDS = (
+    "authors.name,authors.hIndex,authors.paperCount,authors.citationCount"
+)
+SEMSCH_CITATION_FIELDS = "citations.title,citations.influentialCitationCount"
+SEMSCH_PAPER_FIELDS = f"url,title,{SEMSCH_AUTHOR_FIELDS},abstract,year,referenceCount,citationCount,influentialCitationCount,isOpenAccess,fieldsOfStudy,{SEMSCH_CITATION_FIELDS},references"
+# Fields requested for every semantic scholar author
+SEMSCH_AUTHOR_RECORD_FIELDS = "name,affiliations,homepage,paperCount,citationCount,hIndex,papers.title,papers.authors"
+# Fields of the metrics of the papers and the authors that are only ranked, and
+# the attributes of the records they are stored as. Their requests are much
+# smaller than the requests of the records, so more IDs are sent per request
+SEMSCH_PAPER_METRIC_FIELDS = {
+    "year": "year",
+    "citationCount": "citation_count",
+    "referenceCount": "reference_count",
+    "influentialCitationCount": "influential_paper_citations",
+}
+SEMSCH_AUTHOR_METRIC_FIELDS = {
+    "citationCount": "citations",
+    "hIndex": "hindex",
+    "paperCount": "paper_count",
+}
+SEMSCH_METRICS_BATCH_SIZE = 500
+# Number of coauthors and papers shown on the page of an author. Only these are
+# fetched in full, the other ones are only ranked by their metrics
+AUTHOR_TOP_COAUTHORS = 50
+AUTHOR_TOP_PAPERS = 50
 ARXIV_KEYS = ["arxiv_id", "title", "authors", "abstract"]
 ARXIV_LINK = "http://export.arxiv.org/api/query?search_query="
 NAMESPACE = {"n": "http://www.w3.org/2005/Atom"}
-
-
-class SemSchTree:
-    def __init__(self, cache_pth: str):
-        self.cache_pth = cache_pth
-        self.papers_dict = {}
-        self.read_cache()
-
-    def read_cache(self) -> None:
-        """A function that reads the cache from the given input path JSON. It
-        appends the result in the dictionary self.papers_dict. Note that this
-        function reads a JSON that consists of papers from semantic scholar API
+ARXIV_ENTRY_TAG = f"{{{NAMESPACE['n']}}}entry"
+# Number of arxiv results requested per page, the pages of a search are only
+# requested once the results of the previous page are consumed, and number of
+# results of a search of the search page
+ARXIV_PAGE_SIZE = 100
+ARXIV_MAX_RESULTS = 100
+# Number of papers of an arxiv page mapped to semantic scholar IDs together,
+# smaller than a page so that the first papers are handed on before the whole
+# page is resolved
+ARXIV_RESOLVE_CHUNK = 25
+# Number of bytes of an arxiv response kept in memory while it is parsed, the
+# rest is spooled to a temporary file until the response is cached
+ARXIV_SPOOL_BYTES = 1024 * 1024
+# Fields of the arxiv papers read by the search indexes, and the fields among
+# them that CacheStore.iter_fields returns as JSON text
+ARXIV_INDEX_FIELDS = ["title", "abstract", "authors", "primary_category", "secondary_category"]
+ARXIV_LIST_FIELDS = ["authors", "primary_category", "secondary_category"]
+# Number of threads used to resolve semantic scholar IDs of arxiv papers when
+# the batch endpoint is not available
+ARXIV_RESOLVE_WORKERS = 8
+# Number of seconds between two reads of the records that other processes wrote
+# to the cache stores, and number of seconds of writes read again at every sync
+# because a write can be committed a little after its timestamp
+SYNC_INTERVAL = 1.0
+SYNC_OVERLAP = 5.0
+
+
+class _SpoolingReader:
+    def __init__(self, raw: BinaryIO, spool: BinaryIO):
+        """A reader over a streamed response that writes the bytes it read to
+        a spool file, so that the response can be cached once it is completely
+        parsed without keeping it in memory
         """
-        try:
-            with open(self.cache_pth, "r") as f:
-                data = json.load(f)
-            if bool(data):
-                for k, v in data.items():
-                    self.papers_dict[k] = SemSchPaper(**v)
-        except:
-            pass
+        self.raw = raw
+        self.spool = spool
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.raw.read(size)
+        self.spool.write(chunk)
+        return chunk
+
+
+class StoredRecordsMixin:
+    """Synchronization of the records of a tree with its cache store, shared by
+    the trees. A tree sets records_attr to the name of its record dictionary
+    and record_class to the class of its records, and implements
+    index_record to add a record to its metrics or search indexes. It also
+    has the attributes lock, store, lazy, dirty_ids, writing_ids, stored_at,
+    loaded_at, synced_at and last_sync
+    """
+
+    records_attr = None
+    record_class = None
+
+    @property
+    def records(self) -> Dict:
+        """The record dictionary of the tree, e.g., self.papers_dict"""
+        return getattr(self, self.records_attr)
+
+    def index_record(self, record_id: str, record: Any) -> None:
+        """The function adds a record to the metrics or search indexes of the
+        tree. It is called with self.lock held
+        """
+        raise NotImplementedError
 
     def write_cache(self) -> bool:
-        """The function writes cache for papers from semantic scholar API. It
-        takes the dictionary self.paper_dict and writes down each paper with
-        a given ID
+        """The function writes the records that changed since the last write
+        to the cache store, in a single transaction
 
         Returns
         -------
@@ -65,17 +150,230 @@ class SemSchTree:
             Returns True if the data is successfully written to the disk, False
             otherwise
         """
-        data_save = {}
+        with self.lock:
+            written_ids, self.dirty_ids = self.dirty_ids, set()
+            records = {f: self.records[f].to_dict() for f in written_ids}
+            # The records are not in the store until put_many commits, so
+            # they stay in memory in the meantime
+            self.writing_ids.update(written_ids)
         try:
-            for paper_id, val in self.papers_dict.items():
-                temp_dict = vars(val)
-                data_save[paper_id] = temp_dict
-
-            with open(self.cache_pth, "w") as f:
-                json.dump(data_save, f)
-            return True
-        except:
+            written_at = self.store.put_many(records)
+        except sqlite3.Error:
+            with self.lock:
+                self.dirty_ids |= written_ids
+                self.writing_ids -= Counter(written_ids)
+            return False
+        with self.lock:
+            self.stored_at.update(dict.fromkeys(records, written_at))
+            self.writing_ids -= Counter(written_ids)
+        if self.lazy:
+            # The written records can be evicted now
+            self.records.trim()
+        return True
+
+    def is_evictable(self, record_id: str) -> bool:
+        """Returns True if the record can be evicted from memory, i.e., it is
+        neither changed since the last write nor being written, since it could
+        not be read back from the store otherwise
+        """
+        return record_id not in self.dirty_ids and record_id not in self.writing_ids
+
+    def add_stored_record(
+        self, record_id: str, value: Dict, updated_at: float = None
+    ) -> None:
+        """The function adds a record that is already in the cache store, e.g.,
+        written by another process, to the records of the tree and to its
+        indexes
+        """
+        record = self.record_class(**value)
+        with self.lock:
+            if self.lazy:
+                self.records.load(record_id, record, updated_at)
+            else:
+                self.records[record_id] = record
+            if updated_at is not None:
+                self.stored_at[record_id] = updated_at
+            self.index_record(record_id, record)
+
+    def read_through(self, record_id: str) -> bool:
+        """The function looks up a record that is not in memory in the cache
+        store before it is requested upstream, since another process may have
+        fetched it already. Returns True if it was found
+        """
+        entry = self.store.get_entry(record_id)
+        if entry is None:
+            return False
+        self.add_stored_record(record_id, *entry)
+        return True
+
+    def sync(self, force: bool = False) -> int:
+        """The function adds the records that other processes wrote to the
+        cache store since the last sync, and replaces the records in memory
+        that they wrote a newer version of. It runs at most once every
+        SYNC_INTERVAL seconds unless forced
+
+        Parameters
+        ----------
+        force : bool, optional
+            A bool to sync even if the last sync is recent, by default False
+
+        Returns
+        -------
+        int
+            Number of records added or replaced
+        """
+        now = time.time()
+        with self.lock:
+            if not force and now - self.last_sync < SYNC_INTERVAL:
+                return 0
+            self.last_sync = now
+            since = self.synced_at - SYNC_OVERLAP
+        added = 0
+        for record_id, value, updated_at in self.store.changed_since(since):
+            with self.lock:
+                self.synced_at = max(self.synced_at, updated_at)
+                if not self.is_outdated(record_id, updated_at):
+                    continue
+                self.add_stored_record(record_id, value, updated_at)
+            added += 1
+        return added
+
+    def is_outdated(self, record_id: str, updated_at: float) -> bool:
+        """Returns True if the record is not in memory or if the version of
+        the record written to the cache store at updated_at, e.g., by another
+        process, is newer than the version in memory. The records changed in
+        memory and not written yet are never outdated
+        """
+        with self.lock:
+            if record_id not in self.records:
+                return True
+            if not self.is_evictable(record_id):
+                return False
+            return updated_at > self.stored_at.get(record_id, self.loaded_at)
+
+    def is_cached(self, record_id: str) -> bool:
+        """Returns True if the record is in memory and it is not stale, i.e.,
+        it was fetched less than self.ttl seconds ago
+        """
+        if record_id not in self.records:
             return False
+        return not (self.lazy and self.records.is_stale(record_id))
+
+    def needs_request(self, record_id: str) -> bool:
+        """Returns True if the record has to be requested upstream, i.e., it is
+        neither cached nor fresh in the cache store, where another process may
+        have fetched it already
+        """
+        if self.is_cached(record_id):
+            return False
+        return not (self.read_through(record_id) and self.is_cached(record_id))
+
+    def pinned(self, record_ids: Iterable[str]) -> ContextManager:
+        """Returns a context in which the given records are not evicted from
+        memory, e.g., while the page of a paper or an author is built
+        """
+        if self.lazy:
+            return self.records.pin(record_ids)
+        return nullcontext()
+
+    def get_cache_stats(self) -> Dict:
+        """Returns the counters of the records kept in memory, e.g., the hit
+        rate and the number of evicted records
+        """
+        if self.lazy:
+            return self.records.get_stats()
+        return {"records": len(self.records), "materialized": len(self.records)}
+
+
+class SemSchTree(StoredRecordsMixin):
+    records_attr = "papers_dict"
+    record_class = SemSchPaper
+
+    def __init__(
+        self,
+        cache_pth: str,
+        api_link: str = SEMSCH_LINK,
+        client: HttpClient = None,
+        lazy: bool = False,
+        history: SearchHistory = None,
+        max_records: int = None,
+        ttl: float = None,
+        misses: NegativeCache = None,
+    ):
+        self.cache_pth = cache_pth
+        # In lazy mode the papers are only materialized when they are accessed,
+        # at most max_records of them are kept in memory and the papers fetched
+        # more than ttl seconds ago are requested again
+        self.lazy = lazy
+        self.max_records = max_records
+        self.ttl = ttl
+        # IDs of the papers that semantic scholar does not know, they are not
+        # requested again until the TTL of the negative cache
+        self.misses = misses if misses is not None else NegativeCache.for_cache(cache_pth)
+        # Log of the explored papers, written in the background
+        self.history = history if history is not None else SearchHistory.open()
+        # Background prefetcher of the neighbors of the served papers, if any
+        self.prefetcher = None
+        # Adjacency index of the cached papers and authors, if any
+        self.graph = None
+        # All the upstream requests go through the shared pooled HTTP client
+        self.client = client if client is not None else get_client()
+        # The API link can be pointed to a local stand-in server of the semantic
+        # scholar API
+        self.api_link = api_link
+        self.papers_dict = {}
+        # Numeric metrics of every paper of self.papers_dict, used for rankings,
+        # and of the papers that were only ranked and not fetched in full
+        self.metrics = MetricsTable(PAPER_METRICS)
+        self.ranked_metrics = MetricsTable(PAPER_METRICS)
+        # IDs of the papers that changed since the last write of the cache, and
+        # number of writes in progress of every paper
+        self.dirty_ids = set()
+        self.writing_ids = Counter()
+        # The lock guards the papers, the metrics and the dirty IDs, and the
+        # concurrent fetches of the same paper share a single request. A fetch
+        # of the prefetcher that found no spare capacity is run again by the
+        # callers that waited for it instead of failing them
+        self.lock = threading.RLock()
+        self.flights = SingleFlight(retry_errors=(NoCapacityError,))
+        # Time of the latest record read from the cache store and of the
+        # latest sync with the records written by other processes
+        self.synced_at = time.time()
+        self.last_sync = 0.0
+        # Write time of the stored version of every record in memory, the
+        # records read at startup are as recent as the start of the tree
+        self.stored_at = {}
+        self.loaded_at = self.synced_at
+        self.store = CacheStore.for_cache(cache_pth)
+        self.read_cache()
+
+    def read_cache(self) -> None:
+        """A function that reads the cache from the cache store of the given
+        input path. It appends the result in the dictionary self.papers_dict.
+        Note that this function reads papers from semantic scholar API
+        """
+        if self.lazy:
+            # The papers that are not written to the store yet are not evicted
+            self.papers_dict = LazyRecordDict(
+                self.store,
+                lambda v: SemSchPaper(**v),
+                max_records=self.max_records,
+                ttl=self.ttl,
+                evictable=self.is_evictable,
+            )
+            # Filling the metrics without materializing the papers
+            for k, v in self.store.iter_fields(PAPER_METRICS):
+                self.metrics.upsert(k, v)
+            return
+        for k, v in self.store.iter_items():
+            self.papers_dict[k] = SemSchPaper(**v)
+            self.metrics.upsert(k, self.papers_dict[k])
+
+    def index_record(self, paper_id: str, paper: SemSchPaper) -> None:
+        """Adds the paper to the metrics and to the adjacency index"""
+        self.metrics.upsert(paper_id, paper)
+        if self.graph is not None:
+            self.graph.add_paper(paper_id, paper)
 
     def get_paper_list(self) -> List[str]:
         """Returns a list of paper IDs that are present in the current cache
@@ -114,8 +412,8 @@ class SemSchTree:
         str
             Semantic scholar ID for the paper
         """
-        url = f"{SEMSCH_LINK}/paper/arXiv:{arxiv_id}"
-        res = requests.get(url, headers={"x-api-key": SemanticScholarCreds.API_KEY})
+        url = f"{self.api_link}/paper/arXiv:{arxiv_id}"
+        res = self.client.get(url, headers={"x-api-key": SemanticScholarCreds.API_KEY})
         semsch_paperid = res.json()["paperId"]
         return semsch_paperid
 
@@ -137,38 +435,42 @@ class SemSchTree:
         semsch_paperid = input_id
 
         # Get the current list of semantic scholar paper IDs in the cache list
-        paper_list = self.get_paper_list()
-
-        # If the ID is already present in the paper, then do not request the
-        # semantic scholar API
-        if semsch_paperid in paper_list:
-            pass
-        else:
-            # Request the semantic scholar API if the ID is not present in the
-            # cache
-
-            # author fields needed in the request
-            author_fields = (
-                "authors.name,authors.hIndex,authors.paperCount,authors.citationCount"
-            )
-
-            # Citation fields needed in the request
-            citations_fields = "citations.title,citations.influentialCitationCount"
+        # If the ID is already present in the paper and it is not stale, then
+        # do not request the semantic scholar API
+        if not self.is_cached(semsch_paperid):
+            # Concurrent requests for the same paper wait for a single request
+            self.flights.do(semsch_paperid, lambda: self.request_paper(semsch_paperid))
+        return semsch_paperid
 
-            # General fields needed in the request
-            req_fields = f"""url,title,{author_fields},abstract,year,referenceCount,citationCount,influentialCitationCount,isOpenAccess,fieldsOfStudy,{citations_fields},references&limit=50"""
+    def request_paper(self, semsch_paperid: str) -> None:
+        """The function requests the semantic scholar API for a single paper and
+        updates the cache with it, unless another thread cached it in the
+        meantime
 
-            # Constructing the URl to request the semantic scholar API. Note that
-            # we use the secret key from SemanticScholarCreds.API_KEY here
-            url_paper = f"{SEMSCH_LINK}/paper/{semsch_paperid}?fields={req_fields}"
-            _results = requests.get(
-                url_paper, headers={"x-api-key": SemanticScholarCreds.API_KEY}
-            )
-            results = _results.json()
+        Parameters
+        ----------
+        semsch_paperid : str
+            Semantic scholar ID of the paper
+        """
+        if not self.needs_request(semsch_paperid) or semsch_paperid in self.misses:
+            return
+        # Request the semantic scholar API if the ID is not present in the
+        # cache
+        req_fields = f"{SEMSCH_PAPER_FIELDS}&limit=50"
+
+        # Constructing the URl to request the semantic scholar API. Note that
+        # we use the secret key from SemanticScholarCreds.API_KEY here
+        url_paper = f"{self.api_link}/paper/{semsch_paperid}?fields={req_fields}"
+        _results = self.client.get(
+            url_paper, headers={"x-api-key": SemanticScholarCreds.API_KEY}
+        )
+        if _results.status_code == 404:
+            self.misses.add([semsch_paperid])
+            return
+        results = _results.json()
 
-            # Updating the current cache using the results for the paper
-            self.update_paper_info(results, semsch_paperid)
-        return semsch_paperid
+        # Updating the current cache using the results for the paper
+        self.update_paper_info(results, semsch_paperid)
 
     def update_paper_info(self, results: Dict, semsch_paperid: str) -> None:
         """The function updates the self.paper_dict dictionary by appending the
@@ -219,16 +521,145 @@ class SemSchTree:
         _initialize_dict["citations"] = citations
         _initialize_dict["references"] = references
         paper = SemSchPaper(**_initialize_dict)
-        self.papers_dict[results["paperId"]] = paper
-
         # Note that there is a bug in semantic scholar paper API. sometimes, the
         # original semsch_paperid can be different from the paperId return from
         # the API request and in that case we make duplicate paper records for
         # the two separate papers IDs
-        if semsch_paperid != results["paperId"]:
-            self.papers_dict[semsch_paperid] = paper
+        with self.lock:
+            for paper_id in dict.fromkeys([results["paperId"], semsch_paperid]):
+                self.dirty_ids.add(paper_id)
+                self.papers_dict[paper_id] = paper
+                self.index_record(paper_id, paper)
+
+    def request_paper_batch(
+        self, paper_ids: List[str], fields: str = SEMSCH_PAPER_FIELDS
+    ) -> List[Union[Dict, None]]:
+        """The function requests the semantic scholar batch endpoint for a chunk
+        of paper IDs. The endpoint returns one result per requested ID in the
+        same order, and None for the IDs that it could not find.
+
+        Parameters
+        ----------
+        paper_ids : List[str]
+            List of semantic scholar paper IDs, at most SEMSCH_BATCH_SIZE long
+        fields : str, optional
+            Fields requested for every paper, by default SEMSCH_PAPER_FIELDS
+
+        Returns
+        -------
+        List[Union[Dict, None]]
+            List of paper details from semantic scholar API, one per input ID
+        """
+        url_batch = f"{self.api_link}/paper/batch?fields={fields}"
+        _results = self.client.post(
+            url_batch,
+            json={"ids": paper_ids},
+            headers={"x-api-key": SemanticScholarCreds.API_KEY},
+        )
+        results = _results.json()
+        if not isinstance(results, list):
+            raise ValueError(f"Unexpected batch response from semantic scholar: {results}")
+        return results
+
+    def update_papers_batch(self, paper_ids: List[str]) -> None:
+        """The function resolves all the paper IDs that are not yet present in
+        the cache using the semantic scholar batch endpoint. The missing IDs are
+        requested in chunks of SEMSCH_BATCH_SIZE and every result is appended to
+        self.papers_dict using self.update_paper_info
+
+        Parameters
+        ----------
+        paper_ids : List[str]
+            List of semantic scholar paper IDs
+        """
+        # Removing the duplicates while keeping the order of the IDs
+        missing_ids = [
+            f for f in dict.fromkeys(paper_ids) if f is not None and not self.is_cached(f)
+        ]
+        # The IDs that semantic scholar does not know are not requested again
+        known_missing = self.misses.missing(missing_ids)
+        missing_ids = [f for f in missing_ids if f not in known_missing]
+        # The IDs that other threads are already fetching are not requested
+        # again, their fetches are awaited instead
+        self.flights.do_many(missing_ids, self._request_papers_batch)
+
+    def _request_papers_batch(self, paper_ids: List[str]) -> None:
+        missing_ids = [f for f in paper_ids if self.needs_request(f)]
+        for start_idx in range(0, len(missing_ids), SEMSCH_BATCH_SIZE):
+            chunk_ids = missing_ids[start_idx : start_idx + SEMSCH_BATCH_SIZE]
+            try:
+                results = self.request_paper_batch(chunk_ids)
+            except ValueError:
+                # Falling back to one request per paper if the batch endpoint
+                # fails for this chunk. The IDs of the chunk are already claimed
+                # by this thread, so they are requested directly
+                for paper_id in chunk_ids:
+                    self.request_paper(paper_id)
+                continue
+            # Papers that semantic scholar does not know about are skipped and
+            # recorded in the negative cache
+            self.misses.add(f for f, result in zip(chunk_ids, results) if result is None)
+            for semsch_paperid, result in zip(chunk_ids, results):
+                if result is None:
+                    continue
+                self.update_paper_info(result, semsch_paperid)
+
+    def update_ranked_metrics(self, paper_ids: List[str]) -> None:
+        """The function requests the metrics, e.g., the citation count, of the
+        given papers that have none yet, so that they can be ranked without
+        fetching them in full. The metrics are requested from the batch
+        endpoint in chunks of SEMSCH_METRICS_BATCH_SIZE
+
+        Parameters
+        ----------
+        paper_ids : List[str]
+            List of semantic scholar paper IDs
+        """
+        missing_ids = self.unranked(paper_ids)
+        fields = ",".join(SEMSCH_PAPER_METRIC_FIELDS)
+        for start_idx in range(0, len(missing_ids), SEMSCH_METRICS_BATCH_SIZE):
+            chunk_ids = missing_ids[start_idx : start_idx + SEMSCH_METRICS_BATCH_SIZE]
+            try:
+                results = self.request_paper_batch(chunk_ids, fields=fields)
+            except (ThrottledError, NoCapacityError):
+                # A throttled request is reported to the caller, it does not
+                # just leave the IDs unranked
+                raise
+            except (ValueError, requests.RequestException):
+                # The papers without metrics are ranked last
+                continue
+            self.misses.add(f for f, result in zip(chunk_ids, results) if result is None)
+            with self.lock:
+                for paper_id, result in zip(chunk_ids, results):
+                    if result is None:
+                        continue
+                    self.ranked_metrics.upsert(
+                        paper_id,
+                        {v: result.get(k) for k, v in SEMSCH_PAPER_METRIC_FIELDS.items()},
+                    )
+
+    def unranked(self, paper_ids: List[str]) -> List[str]:
+        """Returns the given papers that have no metrics yet and are not known
+        to be missing from semantic scholar
+        """
+        missing_ids = [
+            f
+            for f in dict.fromkeys(paper_ids)
+            if f is not None and f not in self.metrics and f not in self.ranked_metrics
+        ]
+        known_missing = self.misses.missing(missing_ids)
+        return [f for f in missing_ids if f not in known_missing]
 
-    def update_papers(self, paper_ids: List[str]) -> None:
+    def top_papers(self, paper_ids: List[str], k: int) -> List[str]:
+        """Returns the IDs of the k papers with the most citations among the
+        given papers, using the metrics of the cached and of the ranked papers
+        """
+        with self.lock:
+            return top_k_keys(
+                paper_ids, "citation_count", k, [self.metrics, self.ranked_metrics]
+            )
+
+    def update_papers(self, paper_ids: List[str], batch: bool = True) -> None:
         """The function is a helper function to update the citations and references
         of a paper. It takes the list of semantic scholar paper IDs and appends
         the pertaining paper details to the python dictionary self.papers_dict
@@ -237,22 +668,23 @@ class SemSchTree:
         ----------
         paper_ids : List[str]
             List of semantic scholar paper IDs
+        batch : bool, optional
+            A bool to resolve the missing papers using the semantic scholar
+            batch endpoint instead of one request per paper, by default True
         """
+        if batch:
+            self.update_papers_batch(paper_ids)
+            return
 
-        i = 1
+        # The requests are paced by the rate limiter of the shared HTTP client
         for ref_id in paper_ids:
-            if self.papers_dict.get(ref_id):
+            if self.is_cached(ref_id):
                 pass
             else:
                 self.update_paper_data(ref_id)
-                i = i + 1
-                # Using time.sleep to reduce the chances of overloading the API
-                # with requests
-                if i % 98 == 0:
-                    time.sleep(1.0)
 
     def fetch_paper_data(
-        self, input_id: Union[ArxivID, str]
+        self, input_id: Union[ArxivID, str], wait_for_neighbors: bool = True
     ) -> Tuple[str, str, str, str, str, str, str, List[Dict], List[Dict]]:
         """The function is the main controlling function to create the paper
         tree. it is used inside src/app.py to extract all the details of the
@@ -264,48 +696,47 @@ class SemSchTree:
         ----------
         input_id : Union[ArxivID, str]
             Input ID for the paper
+        wait_for_neighbors : bool, optional
+            A bool to resolve the references and citations that are not cached
+            before returning, by default True. Otherwise only the cached ones
+            are returned and the rest can be loaded with self.load_neighbors
 
         Returns
         -------
         Tuple[str,str,str,str,str,str,str,List[Dict], List[Dict]]
             paper.title, paper.authors, paper.abstract, paper.reference_count,
         paper.citation_count, paper.influential_paper_citations, paper.url,
-        paper.references, paper.citation_list in that order
+        paper.references, paper.citation_list in that order, or None if
+        semantic scholar does not know the paper
         """
+        if input_id is None:
+            return None
+        if self.prefetcher is not None:
+            self.prefetcher.record_lookup(PAPER, input_id, input_id in self.papers_dict)
         semsch_paperid = self.update_paper_data(input_id)
+        # The paper is not cached if semantic scholar answered 404 now or
+        # recently, in which case it is in the negative cache
+        if semsch_paperid not in self.papers_dict:
+            return None
         paper = self.papers_dict[semsch_paperid]
-        references = paper.references
-        citations = paper.citations
-        references = [f for f in references if f is not None]
-        citations = [f for f in citations if f is not None]
-        self.update_papers(references)
-        self.update_papers(citations)
-        reference_list = []
-        citation_list = []
-        self.write_cache()
-
-        for ref in references:
-            reference_list.append(vars(self.papers_dict[ref]))
-
-        for cit in citations:
-            citation_list.append(vars(self.papers_dict[cit]))
-
-        df = pd.read_csv("../data/prev_searches.csv")
-        columns_csv = [
-            "paper_id",
-            "Title",
-            "citation_count",
-            "reference_count",
-            "influencial_citations_count",
-        ]
-        temp_df = pd.DataFrame(index=range(1), columns=columns_csv)
-        temp_df["paper_id"] = paper.id
-        temp_df["Title"] = paper.title
-        temp_df["citation_count"] = paper.citation_count
-        temp_df["reference_count"] = paper.reference_count
-        temp_df["influencial_citations_count"] = paper.influential_paper_citations
-        df = pd.concat([df, temp_df])
-        df.to_csv("../data/prev_searches.csv", index=False)
+        references, citations = self.paper_neighbors(semsch_paperid)
+        # The paper and its neighbors stay in memory while the page is built
+        with self.pinned([semsch_paperid] + references + citations):
+            if wait_for_neighbors:
+                # Resolving references and citations together so that they
+                # share the batch requests
+                self.update_papers(references + citations)
+            self.write_cache()
+
+            # Papers that could not be resolved by semantic scholar are skipped
+            reference_list = self.cached_papers(references)
+            citation_list = self.cached_papers(citations)
+
+        # Appending the paper to the search history off the request path
+        self.history.record(paper)
+        # Fetching the neighbors of the paper in the background
+        if self.prefetcher is not None:
+            self.prefetcher.schedule_paper(paper)
 
         return (
             paper.title,
@@ -319,47 +750,143 @@ class SemSchTree:
             citation_list,
         )
 
+    def paper_neighbors(self, semsch_paperid: str) -> Tuple[List[str], List[str]]:
+        """Returns the IDs of the references and the citations of a cached
+        paper, read from the adjacency index if there is one, so that the
+        paper is not materialized
+        """
+        if self.graph is not None:
+            return (
+                self.graph.neighbors(REFERENCES, semsch_paperid),
+                self.graph.neighbors(CITATIONS, semsch_paperid),
+            )
+        paper = self.papers_dict[semsch_paperid]
+        references = [f for f in paper.references if f is not None]
+        citations = [f for f in paper.citations if f is not None]
+        return references, citations
+
+    def cached_papers(self, paper_ids: List[str]) -> List[Dict]:
+        """Returns the details of the given papers that are in the cache, in
+        the given order
+        """
+        return [self.papers_dict[f].to_dict() for f in paper_ids if f in self.papers_dict]
+
+    def missing_neighbors(self, input_id: str) -> List[str]:
+        """Returns the IDs of the references and the citations of a cached
+        paper that are not in the cache yet
+        """
+        references, citations = self.paper_neighbors(input_id)
+        return [f for f in dict.fromkeys(references + citations) if f not in self.papers_dict]
+
+    def load_neighbors(self, input_id: str, emit: Callable) -> None:
+        """The function resolves the references and the citations of a cached
+        paper that are not in the cache yet, one batch at a time. The papers of
+        every batch are passed to emit as soon as they are resolved, and the
+        complete lists in the order of fetch_paper_data at the end
 
-class ArxivTree:
-    def __init__(self, cache_pth: str):
+        Parameters
+        ----------
+        input_id : str
+            Semantic scholar ID of the paper
+        emit : Callable
+            Function called as emit(section, records, replace=False) with the
+            section "references" or "citations"
+        """
+        references, citations = self.paper_neighbors(input_id)
+        reference_ids = set(references)
+        citation_ids = set(citations)
+        missing_ids = self.missing_neighbors(input_id)
+        with self.pinned([input_id] + references + citations):
+            for start_idx in range(0, len(missing_ids), SEMSCH_BATCH_SIZE):
+                chunk_ids = missing_ids[start_idx : start_idx + SEMSCH_BATCH_SIZE]
+                self.update_papers(chunk_ids)
+                self.write_cache()
+                emit("references", self.cached_papers([f for f in chunk_ids if f in reference_ids]))
+                emit("citations", self.cached_papers([f for f in chunk_ids if f in citation_ids]))
+            emit("references", self.cached_papers(references), replace=True)
+            emit("citations", self.cached_papers(citations), replace=True)
+
+
+class ArxivTree(StoredRecordsMixin):
+    records_attr = "papers_dict"
+    record_class = ArxivPaper
+
+    def __init__(
+        self,
+        cache_pth: str,
+        api_link: str = SEMSCH_LINK,
+        client: HttpClient = None,
+        lazy: bool = False,
+        responses: ResponseCache = None,
+        misses: NegativeCache = None,
+        arxiv_link: str = ARXIV_LINK,
+    ):
         self.cache_pth = cache_pth
+        # In lazy mode the papers are only materialized when they are accessed,
+        # the search indexes are still built for all the papers
+        self.lazy = lazy
+        # Compressed responses of the arxiv searches, identical searches are
+        # served from it instead of requesting the arxiv API again
+        self.responses = (
+            responses if responses is not None else ResponseCache.for_cache(cache_pth)
+        )
+        # Semantic scholar lookup IDs of the arxiv papers that semantic scholar
+        # does not know, they are not looked up again until the TTL of the
+        # negative cache
+        self.misses = misses if misses is not None else NegativeCache.for_cache(cache_pth)
+        # All the upstream requests go through the shared pooled HTTP client
+        self.client = client if client is not None else get_client()
+        # Semantic scholar API link used to map arxiv IDs to semantic scholar IDs,
+        # and arxiv API link the search queries are appended to
+        self.api_link = api_link
+        self.arxiv_link = arxiv_link
         self.papers_dict = {}
+        # Arxiv IDs in the order of self.papers_dict, the search indexes refer
+        # to the papers by their position in this list
+        self.paper_keys = []
+        self.paper_positions = {}
+        self.title_index = TrigramIndex()
+        self.abstract_index = TokenIndex()
+        self.author_index = AuthorIndex()
+        self.primary_category_index = CategoryIndex()
+        self.secondary_category_index = CategoryIndex()
+        # IDs of the papers that changed since the last write of the cache, and
+        # number of writes in progress of every paper
+        self.dirty_ids = set()
+        self.writing_ids = Counter()
+        # The lock guards the papers, the search indexes and the dirty IDs
+        self.lock = threading.RLock()
+        # Time of the latest record read from the cache store and of the
+        # latest sync with the records written by other processes
+        self.synced_at = time.time()
+        self.last_sync = 0.0
+        # Write time of the stored version of every record in memory, the
+        # records read at startup are as recent as the start of the tree
+        self.stored_at = {}
+        self.loaded_at = self.synced_at
+        self.store = CacheStore.for_cache(cache_pth)
         self.read_cache()
 
     def read_cache(self) -> None:
         """The function reads the cache data for arxiv paper search, which is the
         first API hit that happens on the user input
         """
-        try:
-            with open(self.cache_pth, "r") as f:
-                data = json.load(f)
-            if bool(data):
-                for k, v in data.items():
-                    self.papers_dict[k] = ArxivPaper(**v)
-        except:
-            pass
-
-    def write_cache(self) -> bool:
-        """The function writes the data for Arxiv paper search
-
-        Returns
-        -------
-        bool
-            A bool that is True when the data is written successfully, False
-            otherwise
-        """
-        data_save = {}
-        try:
-
-            for id_ar, paper in self.papers_dict.items():
-                temp_dict = vars(paper)
-                data_save[id_ar] = temp_dict
-
-            with open(self.cache_pth, "w") as f:
-                json.dump(data_save, f)
-            return True
-        except:
-            return False
+        if self.lazy:
+            self.papers_dict = LazyRecordDict(
+                self.store, lambda v: ArxivPaper(**v), evictable=self.is_evictable
+            )
+            # Indexing the stored papers from the fields read by the indexes,
+            # extracted by SQLite, without parsing or keeping the records
+            for k, v in self.store.iter_fields(ARXIV_INDEX_FIELDS):
+                for f in ARXIV_LIST_FIELDS:
+                    if isinstance(v[f], str):
+                        v[f] = json.loads(v[f])
+                self.index_record(k, ArxivPaper(**v))
+            return
+        for k, v in self.store.iter_items():
+            self.update_paper_list(ArxivPaper(**v), k)
+        # Papers read from the cache do not need to be written again
+        self.dirty_ids = set()
 
     def get_paper_titles(self) -> List[str]:
         """The function returns the list of Arxiv paper IDs that are present
@@ -406,17 +933,62 @@ class ArxivTree:
         all_secondary = [[i, f.secondary_category] for i, f in enumerate(self.papers_dict.values())]
         return all_secondary
 
-    def update_paper_list(self, paper: ArxivPaper) -> None:
+    def update_paper_list(self, paper: ArxivPaper, paper_id: str = None) -> None:
         """The function updates the cache list self.papers by appending the
-        result from the API request into the list
+        result from the API request into the list. The search indexes are
+        updated incrementally with the paper
 
         Parameters
         ----------
         paper_dict : ArxivPaper
             Dictionary representing the results from the Arxiv API request
+        paper_id : str, optional
+            Key of the paper in the cache, by default the arxiv ID of the paper
         """
-        paper_id = paper.arxiv_id
-        self.papers_dict[paper_id] = paper
+        if paper_id is None:
+            paper_id = paper.arxiv_id
+        with self.lock:
+            self.papers_dict[paper_id] = paper
+            self.dirty_ids.add(paper_id)
+            self.index_record(paper_id, paper)
+
+    def index_record(self, paper_id: str, paper: ArxivPaper) -> None:
+        """The function updates the search indexes with the given paper
+
+        Parameters
+        ----------
+        paper_id : str
+            Key of the paper in the cache
+        paper : ArxivPaper
+            Paper to index
+        """
+        with self.lock:
+            if paper_id not in self.paper_positions:
+                self.paper_positions[paper_id] = len(self.paper_keys)
+                self.paper_keys.append(paper_id)
+
+            paper_pos = self.paper_positions[paper_id]
+            self.title_index.add(paper_pos, paper.title)
+            self.abstract_index.add(paper_pos, paper.abstract)
+            self.author_index.add(paper_pos, paper.authors)
+            self.primary_category_index.add(paper_pos, paper.primary_category)
+            self.secondary_category_index.add(paper_pos, paper.secondary_category)
+
+    def get_papers_at(self, paper_pos: List[int]) -> List[Dict]:
+        """The function returns the details of the papers at the given positions
+        of the cache, only materializing the requested papers
+
+        Parameters
+        ----------
+        paper_pos : List[int]
+            Positions of the papers in self.paper_keys
+
+        Returns
+        -------
+        List[Dict]
+            A list of Arxiv papers representing the paper details
+        """
+        return [self.papers_dict[self.paper_keys[f]].to_dict() for f in paper_pos]
 
     def construct_arxiv_link(
         self,
@@ -463,16 +1035,18 @@ class ArxivTree:
         str_query = urllib.parse.quote_plus(str_query)
 
         str_query += f"&sortBy=relevance&sortOrder=descending&start={start_idx}&max_results={max_results}"
-        return ARXIV_LINK + str_query
+        return self.arxiv_link + str_query
 
     def request_arxiv_api_and_update(
         self,
         paper_title: Union[str, None],
         author: Union[str, None],
         abstract: Union[str, None],
-    ) -> None:
-        """The function requests the Arxiv API and update the list self.papers
-        to append the latest cache of papers
+        max_results: int = ARXIV_MAX_RESULTS,
+    ) -> List[ArxivPaper]:
+        """The function requests the Arxiv API, appends the resulting papers to
+        the cache and returns them. The papers are returned instead of being
+        kept on the tree, since concurrent searches share the tree
 
         Parameters
         ----------
@@ -482,65 +1056,317 @@ class ArxivTree:
             Author of the paper as requested by the user
         abstract : Union[str, None]
             A keyword from Abstract of the paper as requested by the user
-        """
-        # Initializing a list ot store the local results for the user session
-        self.local_paper_list = []
+        max_results : int, optional
+            Number of results requested, by default ARXIV_MAX_RESULTS
 
-        # Construct a URL to requet the Arxiv API
-        link_arxiv = self.construct_arxiv_link(
-            paper_title=paper_title, author=author, abstract=abstract, max_results=100
+        Returns
+        -------
+        List[ArxivPaper]
+            Papers of the search results
+        """
+        return list(
+            self.iter_arxiv_search(paper_title, author, abstract, max_results=max_results)
         )
 
-        # Request the Arxiv API
-        response = requests.get(link_arxiv)
+    def iter_arxiv_search(
+        self,
+        paper_title: Union[str, None] = None,
+        author: Union[str, None] = None,
+        abstract: Union[str, None] = None,
+        max_results: int = None,
+        page_size: int = ARXIV_PAGE_SIZE,
+    ) -> Iterator[ArxivPaper]:
+        """The function yields the papers of an arxiv search page by page. A
+        page is only requested once the papers of the previous page are
+        consumed. Its papers are yielded once it is read, in chunks of
+        ARXIV_RESOLVE_CHUNK papers that are mapped to semantic scholar IDs
+        together and added to the cache
+
+        Parameters
+        ----------
+        paper_title : Union[str, None], optional
+            Title of the paper as requested by the user, by default None
+        author : Union[str, None], optional
+            Author of the paper as requested by the user, by default None
+        abstract : Union[str, None], optional
+            A keyword from Abstract of the paper as requested by the user, by
+            default None
+        max_results : int, optional
+            Largest number of papers, by default None for all the results
+        page_size : int, optional
+            Number of papers requested per page, by default ARXIV_PAGE_SIZE
+
+        Yields
+        ------
+        ArxivPaper
+            Papers in the order of the search results
+        """
+        start_idx = 0
+        while max_results is None or start_idx < max_results:
+            page_count = page_size
+            if max_results is not None:
+                page_count = min(page_size, max_results - start_idx)
+            link_arxiv = self.construct_arxiv_link(
+                paper_title=paper_title,
+                author=author,
+                abstract=abstract,
+                start_idx=start_idx,
+                max_results=page_count,
+            )
+            page_papers = self.read_arxiv_page(link_arxiv)
+            for chunk_idx in range(0, len(page_papers), ARXIV_RESOLVE_CHUNK):
+                yield from self.add_arxiv_papers(
+                    page_papers[chunk_idx : chunk_idx + ARXIV_RESOLVE_CHUNK]
+                )
+            # A page that is not full is the last page of the search
+            if len(page_papers) < page_count:
+                return
+            start_idx += page_count
+
+    def read_arxiv_page(self, link_arxiv: str) -> List[ArxivPaper]:
+        """The function returns the papers of a page of arxiv results. The page
+        is served from self.responses if it was requested recently, otherwise
+        it is parsed while it is streamed and spooled to a temporary file, and
+        cached once it is complete. The response is closed, and its slot of the
+        rate limiter released, before the papers are returned
+
+        Parameters
+        ----------
+        link_arxiv : str
+            Arxiv link of the page
 
-        # The response of Arxiv API is an HTML, parsing the HTML using
-        # ElementTree
-        xmlstring = response.text
-        tree = ET.ElementTree(ET.fromstring(xmlstring))
-        tree_root = tree.getroot()
-        all_papers = tree_root.findall("n:entry", namespaces=NAMESPACE)
+        Returns
+        -------
+        List[ArxivPaper]
+            Papers of the page, the semantic scholar IDs are not resolved here
+        """
+        xmlstring = self.responses.get(link_arxiv)
+        if xmlstring is not None:
+            return self.parse_arxiv_response(xmlstring)
+
+        with tempfile.SpooledTemporaryFile(max_size=ARXIV_SPOOL_BYTES) as spool:
+            with self.client.get(link_arxiv, stream=True) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                reader = _SpoolingReader(response.raw, spool)
+                papers = list(self.iter_arxiv_entries(reader))
+            # Only the pages that were completely read are cached
+            spool.seek(0)
+            self.responses.put_file(link_arxiv, spool)
+        return papers
+
+    def add_arxiv_papers(self, papers: List[ArxivPaper]) -> List[ArxivPaper]:
+        """The function maps the papers that are not resolved yet to semantic
+        scholar IDs together and adds them to the cache of arxiv papers
 
-        # Iterating over all the papers for the user request
-        for paper in all_papers:
-            temp_tile = paper.find("n:title", namespaces=NAMESPACE).text
+        Parameters
+        ----------
+        papers : List[ArxivPaper]
+            List of arxiv papers parsed from a response of the Arxiv API
 
-            all_authors = list(paper.findall("n:author", namespaces=NAMESPACE))
+        Returns
+        -------
+        List[ArxivPaper]
+            The papers in the same order, the cached version of the papers
+            that were already resolved
+        """
+        resolved = self.resolved_papers(papers)
+        self.resolve_semsch_ids([f for f in papers if f.arxiv_id not in resolved])
+        added_papers = []
+        for paper in papers:
+            if paper.arxiv_id in resolved:
+                added_papers.append(resolved[paper.arxiv_id])
+            else:
+                added_papers.append(paper)
+                self.update_paper_list(paper)
+        return added_papers
 
-            paper_id = paper.find("n:id", namespaces=NAMESPACE).text.replace(
-                "http://arxiv.org/", ""
-            )
-            paper_abstract = paper.find("n:summary", namespaces=NAMESPACE).text.replace(
-                "http://arxiv.org/", ""
+    def resolved_papers(self, papers: List[ArxivPaper]) -> Dict[str, ArxivPaper]:
+        """The function returns the cached versions of the given papers that
+        are already mapped to a semantic scholar ID, so that they are neither
+        looked up on semantic scholar nor written to the cache again
+
+        Parameters
+        ----------
+        papers : List[ArxivPaper]
+            List of arxiv papers parsed from a response of the Arxiv API
+
+        Returns
+        -------
+        Dict[str, ArxivPaper]
+            Cached papers keyed by their arxiv ID
+        """
+        resolved = {}
+        for paper in papers:
+            if paper.arxiv_id not in self.papers_dict:
+                continue
+            cached_paper = self.papers_dict[paper.arxiv_id]
+            if cached_paper.id is not None:
+                resolved[paper.arxiv_id] = cached_paper
+        return resolved
+
+    def parse_arxiv_response(self, xmlstring: str) -> List[ArxivPaper]:
+        """The function parses the Atom response of the Arxiv API into a list
+        of ArxivPaper objects. Note that the semantic scholar IDs of the papers
+        are not resolved here
+
+        Parameters
+        ----------
+        xmlstring : str
+            Response text of the Arxiv API
+
+        Returns
+        -------
+        List[ArxivPaper]
+            List of arxiv papers in the order of the response
+        """
+        return list(self.iter_arxiv_entries(io.BytesIO(xmlstring.encode("utf-8"))))
+
+    def iter_arxiv_entries(self, source: BinaryIO) -> Iterator[ArxivPaper]:
+        """The function parses an Atom response of the Arxiv API incrementally
+        and yields every entry as soon as it is parsed. The parsed entries are
+        removed from the document, so the memory does not grow with the number
+        of entries
+
+        Parameters
+        ----------
+        source : BinaryIO
+            Binary file-like object of the response, e.g., a streamed response
+
+        Yields
+        ------
+        ArxivPaper
+            Arxiv paper for every entry, in the order of the response
+        """
+        context = ET.iterparse(source, events=("start", "end"))
+        _, root = next(context)
+        for event, element in context:
+            if event == "end" and element.tag == ARXIV_ENTRY_TAG:
+                yield self.parse_arxiv_entry(element)
+                root.clear()
+
+    def parse_arxiv_entry(self, paper: ET.Element) -> ArxivPaper:
+        """The function parses a single Atom entry of the Arxiv API response
+
+        Parameters
+        ----------
+        paper : ET.Element
+            Atom entry element of the Arxiv API response
+
+        Returns
+        -------
+        ArxivPaper
+            Arxiv paper for the entry
+        """
+        temp_tile = paper.find("n:title", namespaces=NAMESPACE).text
+
+        all_authors = list(paper.findall("n:author", namespaces=NAMESPACE))
+
+        paper_id = paper.find("n:id", namespaces=NAMESPACE).text.replace(
+            "http://arxiv.org/", ""
+        )
+        paper_abstract = paper.find("n:summary", namespaces=NAMESPACE).text.replace(
+            "http://arxiv.org/", ""
+        )
+        categories = paper.findall("n:category", namespaces=NAMESPACE)
+        categories = [f.get("term") for f in categories]
+        categories = [f.split(".") for f in categories if ((f is not None) and f.split(".")[0] in ["cs", "math", "econ", "math"] )]
+        primary_cats = [f[0] for f in categories]
+
+        secondary_cats = [f[1] for f in categories]
+        paper_abstract = paper_abstract.replace("\n", " ").lstrip().rstrip()
+        paper_author_list = []
+        for au in all_authors:
+            paper_author_list.append(list(au)[0].text)
+        paper_details = {
+            "arxiv_id": paper_id,
+            "authors": paper_author_list,
+            "title": temp_tile,
+            "abstract": paper_abstract,
+            "primary_category": primary_cats,
+            "secondary_category": secondary_cats
+        }
+        return ArxivPaper(**paper_details)
+
+    def resolve_semsch_ids(self, papers: List[ArxivPaper]) -> None:
+        """The function maps the arxiv IDs of all the given papers to semantic
+        scholar IDs together. It first uses the semantic scholar batch endpoint
+        and falls back to a bounded thread pool of single requests if the batch
+        request fails
+
+        Parameters
+        ----------
+        papers : List[ArxivPaper]
+            List of arxiv papers whose semantic scholar IDs are resolved in place
+        """
+        # The papers that semantic scholar did not know recently are not looked
+        # up again
+        known_missing = self.misses.missing(f.semsch_lookup_id() for f in papers)
+        lookup_papers = []
+        for paper in papers:
+            if paper.semsch_lookup_id() in known_missing:
+                paper.set_semsch_id(None)
+            else:
+                lookup_papers.append(paper)
+
+        for start_idx in range(0, len(lookup_papers), SEMSCH_BATCH_SIZE):
+            chunk_papers = lookup_papers[start_idx : start_idx + SEMSCH_BATCH_SIZE]
+            try:
+                semsch_ids = self.request_semsch_id_batch(chunk_papers)
+            except (ThrottledError, NoCapacityError):
+                # Only a failure of the batch endpoint itself falls back to
+                # single requests, a throttled batch would only multiply the
+                # requests the API refuses
+                raise
+            except (ValueError, requests.RequestException):
+                with ThreadPoolExecutor(max_workers=ARXIV_RESOLVE_WORKERS) as executor:
+                    found = list(
+                        executor.map(
+                            lambda f: f.update_semsch_id(self.api_link, self.client),
+                            chunk_papers,
+                        )
+                    )
+                self.misses.add(
+                    f.semsch_lookup_id() for f, ok in zip(chunk_papers, found) if not ok
+                )
+                continue
+            for paper, semsch_id in zip(chunk_papers, semsch_ids):
+                paper.set_semsch_id(semsch_id)
+            self.misses.add(
+                f.semsch_lookup_id() for f, semsch_id in zip(chunk_papers, semsch_ids)
+                if semsch_id is None
             )
-            categories = paper.findall("n:category", namespaces=NAMESPACE)
-            categories = [f.get("term") for f in categories]
-            categories = [f.split(".") for f in categories if ((f is not None) and f.split(".")[0] in ["cs", "math", "econ", "math"] )]
-            primary_cats = [f[0] for f in categories]
-
-            # import pdb; pdb.set_trace()
-            secondary_cats = [f[1] for f in categories]
-            paper_abstract = paper_abstract.replace("\n", " ").lstrip().rstrip()
-            paper_author_list = []
-            for au in all_authors:
-                paper_author_list.append(list(au)[0].text)
-            paper_details = {
-                "arxiv_id": paper_id,
-                "authors": paper_author_list,
-                "title": temp_tile,
-                "abstract": paper_abstract,
-                "primary_category": primary_cats,
-                "secondary_category": secondary_cats
-            }
-            # Update the cache of arxiv papers
-            paper = ArxivPaper(**paper_details)
-            paper.update_semsch_id()
-            self.local_paper_list.append(paper)
-            self.update_paper_list(paper)
+
+    def request_semsch_id_batch(self, papers: List[ArxivPaper]) -> List[Union[str, None]]:
+        """The function requests the semantic scholar batch endpoint for the
+        semantic scholar IDs of a chunk of arxiv papers
+
+        Parameters
+        ----------
+        papers : List[ArxivPaper]
+            List of arxiv papers, at most SEMSCH_BATCH_SIZE long
+
+        Returns
+        -------
+        List[Union[str, None]]
+            Semantic scholar ID for each paper, None if the paper is not
+            available on semantic scholar
+        """
+        url_batch = f"{self.api_link}/paper/batch?fields=paperId"
+        _results = self.client.post(
+            url_batch,
+            json={"ids": [f.semsch_lookup_id() for f in papers]},
+            headers={"x-api-key": SemanticScholarCreds.API_KEY},
+        )
+        results = _results.json()
+        if not isinstance(results, list):
+            raise ValueError(f"Unexpected batch response from semantic scholar: {results}")
+        return [f.get("paperId") if f is not None else None for f in results]
 
     def gather_data(
         self, paper_title=None, author=None, abstract=None, use_cache=False, 
-        primary_category = None, secondary_category=None
+        primary_category = None, secondary_category=None, category_op="or",
+        max_results=ARXIV_MAX_RESULTS,
     ) -> List[Dict]:
         """The function that controls the construction of Arxiv papers tree. Note
         that this is not technically a tree but a List. We use this list as
@@ -554,9 +1380,20 @@ class ArxivTree:
             The author of the paper as requested by the user, by default None
         abstract : _type_, optional
             The keyword from abstract of the paper as requested by the user, by
-            default None
+            default None. Cached abstracts match any of the keywords, or all of
+            the keywords joined by "AND"
         use_cache : bool, optional
             A bool to use cached arxiv data or not, by default False
+        primary_category : _type_, optional
+            Primary category of the cached papers to browse, by default None
+        secondary_category : _type_, optional
+            Secondary category of the cached papers to browse, by default None
+        category_op : str, optional
+            "or" to return the papers in either of the two categories, "and" to
+            return the papers in both of them, by default "or"
+        max_results : int, optional
+            Number of results requested from the Arxiv API, they are requested
+            ARXIV_PAGE_SIZE at a time, by default ARXIV_MAX_RESULTS
 
         Returns
         -------
@@ -578,105 +1415,141 @@ class ArxivTree:
         if ((primary_category is None) and (secondary_category is None)):
 
 
-            # Extracting cached Titles, authors, and abstracts
-            paper_list = self.get_paper_titles()
-            author_list = self.get_paper_authors()
-            abstract_list = self.get_paper_abstracts()
-
-            if paper_title is not None:
-                paper_ids_title = [
-                    f[0] for f in paper_list if utils.lev_dist(f[1], paper_title) < 30
-                ]
-            else:
-                paper_ids_title = []
-            if author is not None:
-                paper_ids_author = [
-                    f[0] for f in author_list if utils.arxiv_author_match(author, f[1])
-                ]
-            else:
-                paper_ids_author = []
-            if abstract is not None:
-                paper_ids_abstract = [
-                    f[0]
-                    for f in abstract_list
-                    if utils.arxiv_abstract_match(f[1], abstract)
-                ]
-            else:
-                paper_ids_abstract = []
+            # The cached titles, authors and abstracts are searched through
+            # self.title_index, self.author_index and self.abstract_index
+            with self.lock:
+                if paper_title is not None:
+                    paper_ids_title = self.title_index.search(paper_title, 30)
+                else:
+                    paper_ids_title = []
+                if author is not None:
+                    paper_ids_author = self.author_index.search(author, 3)
+                else:
+                    paper_ids_author = []
+                if abstract is not None:
+                    paper_ids_abstract = self.abstract_index.search(abstract)
+                else:
+                    paper_ids_abstract = []
             paper_ids = paper_ids_title + paper_ids_author + paper_ids_abstract
             # if the use_cache is True, then use the existung paper titles, abstract,
             # and authors
             if bool(paper_ids) and use_cache == True:
-                candidate_papers = [vars(f) for f in self.papers_dict.values()]
-                papers_data = np.array(candidate_papers)[paper_ids].tolist()
+                papers_data = self.get_papers_at(paper_ids)
             else:
-                self.request_arxiv_api_and_update(paper_title, author, abstract)
+                papers = self.request_arxiv_api_and_update(
+                    paper_title, author, abstract, max_results=max_results
+                )
                 self.write_cache()
-                papers_data = [vars(f) for f in self.local_paper_list]
+                papers_data = [f.to_dict() for f in papers]
         else:
-            
-            candidate_papers = [vars(f) for f in self.papers_dict.values()]
-            
-            primary_category_list = self.get_primary_category()
-            secondary_category_list = self.get_secondary_category()
-
-            if primary_category is not None:
-                paperd_ids_primary = [f[0] for f in primary_category_list if primary_category in f[1]]
-            else:
-                paperd_ids_primary = []
-            
-            if secondary_category is not None:
-                paperd_ids_secondary = [f[0] for f in secondary_category_list if secondary_category in f[1]]
-            else:
-                paperd_ids_secondary = []
-            paper_ids = paperd_ids_secondary + paperd_ids_primary
-            paper_ids = list(set(paper_ids))
-            papers_data = np.array(candidate_papers)[paper_ids].tolist()            
+            # Combining the category bitmaps and only materializing the papers
+            # of the resulting bitmap
+            category_bitmaps = []
+            with self.lock:
+                if primary_category is not None:
+                    category_bitmaps.append(
+                        self.primary_category_index.bitmap(primary_category)
+                    )
+                if secondary_category is not None:
+                    category_bitmaps.append(
+                        self.secondary_category_index.bitmap(secondary_category)
+                    )
+            paper_bitmap = category_bitmaps[0]
+            for bitmap in category_bitmaps[1:]:
+                if category_op == "and":
+                    paper_bitmap &= bitmap
+                else:
+                    paper_bitmap |= bitmap
+            paper_ids = CategoryIndex.positions(paper_bitmap)
+            papers_data = self.get_papers_at(paper_ids)
         return papers_data
 
 
-class AuthorTree:
-    def __init__(self, cache_pth: str):
+class AuthorTree(StoredRecordsMixin):
+    records_attr = "author_dict"
+    record_class = Authors
+
+    def __init__(
+        self,
+        cache_pth: str,
+        api_link: str = SEMSCH_LINK,
+        client: HttpClient = None,
+        lazy: bool = False,
+        max_records: int = None,
+        ttl: float = None,
+        misses: NegativeCache = None,
+    ):
         self.cache_pth = cache_pth
+        # In lazy mode the authors are only materialized when they are accessed,
+        # at most max_records of them are kept in memory and the authors fetched
+        # more than ttl seconds ago are requested again
+        self.lazy = lazy
+        self.max_records = max_records
+        self.ttl = ttl
+        # IDs of the authors that semantic scholar does not know, they are not
+        # requested again until the TTL of the negative cache
+        self.misses = misses if misses is not None else NegativeCache.for_cache(cache_pth)
+        # All the upstream requests go through the shared pooled HTTP client
+        self.client = client if client is not None else get_client()
+        self.api_link = api_link
         self.author_dict = {}
+        # Background prefetcher of the neighbors of the served authors, if any
+        self.prefetcher = None
+        # Adjacency index of the cached papers and authors, if any
+        self.graph = None
+        # Numeric metrics of every author of self.author_dict, used for
+        # rankings, and of the authors that were only ranked and not fetched
+        # in full
+        self.metrics = MetricsTable(AUTHOR_METRICS)
+        self.ranked_metrics = MetricsTable(AUTHOR_METRICS)
+        # IDs of the authors that changed since the last write of the cache, and
+        # number of writes in progress of every author
+        self.dirty_ids = set()
+        self.writing_ids = Counter()
+        # The lock guards the authors, the metrics and the dirty IDs, and the
+        # concurrent fetches of the same author share a single request. A fetch
+        # of the prefetcher that found no spare capacity is run again by the
+        # callers that waited for it instead of failing them
+        self.lock = threading.RLock()
+        self.flights = SingleFlight(retry_errors=(NoCapacityError,))
+        # Time of the latest record read from the cache store and of the
+        # latest sync with the records written by other processes
+        self.synced_at = time.time()
+        self.last_sync = 0.0
+        # Write time of the stored version of every record in memory, the
+        # records read at startup are as recent as the start of the tree
+        self.stored_at = {}
+        self.loaded_at = self.synced_at
+        self.store = CacheStore.for_cache(cache_pth)
         self.read_cache()
 
     def read_cache(self):
-        """A function that reads the cache from the given input path JSON. It
-        appends the result in the dictionary self.authors_dict. Note that this
-        function reads a JSON that consists of authors from semantic scholar API
-        """
-        try:
-            with open(self.cache_pth, "r") as f:
-                data = json.load(f)
-            if bool(data):
-                for k, v in data.items():
-                    self.author_dict[k] = Authors(**v)
-        except:
-            pass
-
-    def write_cache(self):
-        """The function writes cache for authors from semantic scholar API. It
-        takes the dictionary self.author_dict and writes down each author with
-        a given ID
-
-        Returns
-        -------
-        bool
-            Returns True if the data is successfully written to the disk, False
-            otherwise
+        """A function that reads the cache from the cache store of the given
+        input path. It appends the result in the dictionary self.authors_dict.
+        Note that this function reads authors from semantic scholar API
         """
-        data_save = {}
-        try:
-            for author_id, val in self.author_dict.items():
-                temp_dict = vars(val)
-                data_save[author_id] = temp_dict
-
-            with open(self.cache_pth, "w") as f:
-                json.dump(data_save, f)
-            return True
-        except:
-            return False
+        if self.lazy:
+            # The authors that are not written to the store yet are not evicted
+            self.author_dict = LazyRecordDict(
+                self.store,
+                lambda v: Authors(**v),
+                max_records=self.max_records,
+                ttl=self.ttl,
+                evictable=self.is_evictable,
+            )
+            # Filling the metrics without materializing the authors
+            for k, v in self.store.iter_fields(AUTHOR_METRICS):
+                self.metrics.upsert(k, v)
+            return
+        for k, v in self.store.iter_items():
+            self.author_dict[k] = Authors(**v)
+            self.metrics.upsert(k, self.author_dict[k])
+
+    def index_record(self, author_id: str, author: Authors) -> None:
+        """Adds the author to the metrics and to the adjacency index"""
+        self.metrics.upsert(author_id, author)
+        if self.graph is not None:
+            self.graph.add_author(author_id, author)
 
     def get_author_list(self) -> List[str]:
         """A function that returns a list of Author IDs present in the cache
@@ -703,26 +1576,157 @@ class AuthorTree:
         str
             The semantic scholar author ID
         """
-        author_list = self.get_author_list()
-        if author_id in author_list:
+        if not self.is_cached(author_id):
+            # Concurrent requests for the same author wait for a single request
+            self.flights.do(author_id, lambda: self.request_author(author_id))
+        return author_id
 
-            pass
-        else:
-            papers_req = "papers.title,papers.authors"
-            req_fields = f"name,affiliations,homepage,paperCount,citationCount,hIndex,{papers_req}"
-            author_url = f"{SEMSCH_LINK}/author/{author_id}?fields={req_fields}"
-            _results = requests.get(
-                author_url, headers={"x-api-key": SemanticScholarCreds.API_KEY}
-            )
-            results = _results.json()
-            try:
-                self.update_author_info(results)
-            except:
-                import pdb
+    def request_author(self, author_id: str) -> None:
+        """The function requests the semantic scholar API for a single author
+        and updates the cache with it, unless another thread cached it in the
+        meantime
 
-                pdb.set_trace()
+        Parameters
+        ----------
+        author_id : str
+            Semantic Scholar Author ID
+        """
+        if not self.needs_request(author_id) or author_id in self.misses:
+            return
+        author_url = f"{self.api_link}/author/{author_id}?fields={SEMSCH_AUTHOR_RECORD_FIELDS}"
+        _results = self.client.get(
+            author_url, headers={"x-api-key": SemanticScholarCreds.API_KEY}
+        )
+        if _results.status_code == 404:
+            self.misses.add([author_id])
+            return
+        results = _results.json()
+        try:
+            self.update_author_info(results)
+        except (KeyError, TypeError) as e:
+            raise ValueError(
+                f"Unexpected author response from semantic scholar: {results}"
+            ) from e
+
+    def request_author_batch(
+        self, author_ids: List[str], fields: str = SEMSCH_AUTHOR_RECORD_FIELDS
+    ) -> List[Union[Dict, None]]:
+        """The function requests the semantic scholar author batch endpoint for
+        a chunk of author IDs. The endpoint returns one result per requested ID
+        in the same order, and None for the IDs that it could not find
 
-        return author_id
+        Parameters
+        ----------
+        author_ids : List[str]
+            List of semantic scholar author IDs
+        fields : str, optional
+            Fields requested for every author, by default
+            SEMSCH_AUTHOR_RECORD_FIELDS
+
+        Returns
+        -------
+        List[Union[Dict, None]]
+            List of author details from semantic scholar API, one per input ID
+        """
+        url_batch = f"{self.api_link}/author/batch?fields={fields}"
+        _results = self.client.post(
+            url_batch,
+            json={"ids": author_ids},
+            headers={"x-api-key": SemanticScholarCreds.API_KEY},
+        )
+        results = _results.json()
+        if not isinstance(results, list):
+            raise ValueError(f"Unexpected batch response from semantic scholar: {results}")
+        return results
+
+    def update_authors(self, author_ids: List[str]) -> None:
+        """The function fetches the given authors that are not cached yet
+        using the semantic scholar author batch endpoint, in chunks of
+        SEMSCH_BATCH_SIZE
+
+        Parameters
+        ----------
+        author_ids : List[str]
+            List of semantic scholar author IDs
+        """
+        missing_ids = [
+            f for f in dict.fromkeys(author_ids) if f is not None and not self.is_cached(f)
+        ]
+        # The IDs that semantic scholar does not know are not requested again
+        known_missing = self.misses.missing(missing_ids)
+        missing_ids = [f for f in missing_ids if f not in known_missing]
+        # The IDs that other threads are already fetching are not requested
+        # again, their fetches are awaited instead
+        self.flights.do_many(missing_ids, self._request_authors_batch)
+
+    def _request_authors_batch(self, author_ids: List[str]) -> None:
+        missing_ids = [f for f in author_ids if self.needs_request(f)]
+        for start_idx in range(0, len(missing_ids), SEMSCH_BATCH_SIZE):
+            chunk_ids = missing_ids[start_idx : start_idx + SEMSCH_BATCH_SIZE]
+            try:
+                results = self.request_author_batch(chunk_ids)
+            except ValueError:
+                # Falling back to one request per author if the batch endpoint
+                # fails for this chunk
+                for author_id in chunk_ids:
+                    self.request_author(author_id)
+                continue
+            self.misses.add(f for f, result in zip(chunk_ids, results) if result is None)
+            for result in results:
+                if result is None:
+                    continue
+                try:
+                    self.update_author_info(result)
+                except (KeyError, TypeError) as e:
+                    raise ValueError(
+                        f"Unexpected author response from semantic scholar: {result}"
+                    ) from e
+
+    def update_ranked_metrics(self, author_ids: List[str]) -> None:
+        """The function requests the metrics, e.g., the citation count, of the
+        given authors that have none yet, so that they can be ranked without
+        fetching them in full. The metrics are requested from the author batch
+        endpoint in chunks of SEMSCH_METRICS_BATCH_SIZE
+
+        Parameters
+        ----------
+        author_ids : List[str]
+            List of semantic scholar author IDs
+        """
+        missing_ids = self.unranked(author_ids)
+        fields = ",".join(SEMSCH_AUTHOR_METRIC_FIELDS)
+        for start_idx in range(0, len(missing_ids), SEMSCH_METRICS_BATCH_SIZE):
+            chunk_ids = missing_ids[start_idx : start_idx + SEMSCH_METRICS_BATCH_SIZE]
+            try:
+                results = self.request_author_batch(chunk_ids, fields=fields)
+            except (ThrottledError, NoCapacityError):
+                # A throttled request is reported to the caller, it does not
+                # just leave the IDs unranked
+                raise
+            except (ValueError, requests.RequestException):
+                # The authors without metrics are ranked last
+                continue
+            self.misses.add(f for f, result in zip(chunk_ids, results) if result is None)
+            with self.lock:
+                for author_id, result in zip(chunk_ids, results):
+                    if result is None:
+                        continue
+                    self.ranked_metrics.upsert(
+                        author_id,
+                        {v: result.get(k) for k, v in SEMSCH_AUTHOR_METRIC_FIELDS.items()},
+                    )
+
+    def unranked(self, author_ids: List[str]) -> List[str]:
+        """Returns the given authors that have no metrics yet and are not known
+        to be missing from semantic scholar
+        """
+        missing_ids = [
+            f
+            for f in dict.fromkeys(author_ids)
+            if f is not None and f not in self.metrics and f not in self.ranked_metrics
+        ]
+        known_missing = self.misses.missing(missing_ids)
+        return [f for f in missing_ids if f not in known_missing]
 
     def update_author_info(self, results: Dict):
         """The function that updates the self.author_dict by appending the
@@ -757,10 +1761,13 @@ class AuthorTree:
         _author_dict["worked_with"] = id_worked_with
         author = Authors(**_author_dict)
         # appending the results inside the dict
-        self.author_dict[author_id] = author
+        with self.lock:
+            self.dirty_ids.add(author_id)
+            self.author_dict[author_id] = author
+            self.index_record(author_id, author)
 
     def get_author_data(
-        self, SEMSCHTREE: SemSchTree, author_id: str
+        self, SEMSCHTREE: SemSchTree, author_id: str, wait_for_neighbors: bool = True
     ) -> Tuple[str, str, str, str, str, List[Dict], List[Dict]]:
         """The function that returns the author details from the semantic scholar
         API. It returns author.name, author.homepage, author.paper_count,
@@ -772,67 +1779,42 @@ class AuthorTree:
             A class object of type SemSchTree
         author_id : str
             Author ID that user wants to see more info for
+        wait_for_neighbors : bool, optional
+            A bool to fetch the papers and coauthors that are not cached before
+            returning, by default True. Otherwise only the cached ones are
+            returned and the rest can be loaded with self.load_neighbors
 
         Returns
         -------
         Tuple[str, str, str, str, str, List[Dict], List[Dict]]
-            _description_
+            _description_, or None if semantic scholar does not know the
+            author
         """
 
         # Requesting results from semantic scholar API for the requested author
+        if self.prefetcher is not None:
+            self.prefetcher.record_lookup(AUTHOR, author_id, author_id in self.author_dict)
         sem_sch_id = self.request_and_update(author_id)
+        if sem_sch_id not in self.author_dict:
+            return None
         author = self.author_dict[sem_sch_id]
-
-        # Retreiving the ID of papers that the author wrote
-        author_papers_id = author.papers
-        author_papers_id = [f for f in author_papers_id if f is not None]
-
-        # Retreiving the ID of authors that the author worked with
-        id_worked = author.worked_with
-        id_worked = [f for f in id_worked if f is not None]
-
-        # Updating the info for author papers and author IDs if they are not
-        # already in the cache
-        i = 1
-        for a_id in id_worked:
-            if self.author_dict.get(a_id):
-                pass
-            else:
-                self.request_and_update(a_id)
-                i = i + 1
-                if i % 98 == 0:
-                    time.sleep(1)
-        i = 1
-        for p_id in author_papers_id:
-            if SEMSCHTREE.papers_dict.get(p_id):
-                pass
-            else:
-                SEMSCHTREE.update_paper_data(p_id)
-                i = i + 1
-                if i % 98 == 0:
-                    time.sleep(1)
-
-        worked_with_id = [f for f in author.worked_with]
-        worked_with_authors = [self.author_dict.get(f) for f in worked_with_id]
-        worked_with_authors = [f for f in worked_with_authors if f is not None]
-        worked_with_authors = [
-            f for f in worked_with_authors if f.citations is not None
-        ]
-        worked_with_authors = sorted(
-            worked_with_authors, key=lambda x: x.citations, reverse=True
-        )
-        # Picking top 50 authors based on the citation count
-        worked_with_authors = worked_with_authors[:50]
-        worked_with_authors = [vars(f) for f in worked_with_authors]
-
-        # Picking all the authors the author has worked with
-        papers_author = [SEMSCHTREE.papers_dict.get(f) for f in author_papers_id]
-        papers_author = [f for f in papers_author if f is not None]
-        papers_author = [f for f in papers_author if f.citation_count is not None]
-        papers_author = sorted(
-            papers_author, key=lambda x: x.citation_count, reverse=True
-        )
-        papers_author = [vars(f) for f in papers_author]
+        worked_with, papers = self.author_neighbors(sem_sch_id)
+
+        # The author, the coauthors and the papers stay in memory while the
+        # page is built
+        with self.pinned([sem_sch_id, *worked_with]), SEMSCHTREE.pinned(papers):
+            # Ranking the coauthors and the papers of the author by their
+            # metrics, and only fetching the ones shown on the page in full.
+            # The requests are paced by the rate limiter of the shared HTTP
+            # client
+            if wait_for_neighbors:
+                self.update_ranked_metrics(worked_with)
+                SEMSCHTREE.update_ranked_metrics(papers)
+                coauthor_ids, paper_ids = self.top_neighbors(SEMSCHTREE, sem_sch_id)
+                self.update_authors(coauthor_ids)
+                SEMSCHTREE.update_papers(paper_ids)
+
+            worked_with_authors, papers_author = self.rank_neighbors(SEMSCHTREE, sem_sch_id)
 
         hindex = author.hindex
         cit_cnt = author.citations
@@ -844,4 +1826,136 @@ class AuthorTree:
         SEMSCHTREE.write_cache()
         self.write_cache()
 
+        # Fetching the neighbors of the author in the background
+        if self.prefetcher is not None:
+            self.prefetcher.schedule_author(author)
+
         return (name, home, p_cnt, cit_cnt, hindex, worked_with_authors, papers_author)
+
+    def author_neighbors(self, author_id: str) -> Tuple[List[str], List[str]]:
+        """Returns the IDs of the coauthors and the papers of a cached author,
+        read from the adjacency index if there is one, so that the author is
+        not materialized
+        """
+        if self.graph is not None:
+            return (
+                self.graph.neighbors(WORKED_WITH, author_id),
+                self.graph.neighbors(PAPERS, author_id),
+            )
+        author = self.author_dict[author_id]
+        return list(author.worked_with or []), list(author.papers or [])
+
+    def top_neighbors(
+        self, SEMSCHTREE: SemSchTree, author_id: str
+    ) -> Tuple[List[str], List[str]]:
+        """Returns the IDs of the coauthors and the papers shown on the page of
+        a cached author, i.e., the AUTHOR_TOP_COAUTHORS coauthors and the
+        AUTHOR_TOP_PAPERS papers with the most citations among the ones whose
+        metrics are known, in descending order of citations
+        """
+        worked_with, papers = self.author_neighbors(author_id)
+        with self.lock:
+            coauthor_ids = top_k_keys(
+                worked_with,
+                "citations",
+                AUTHOR_TOP_COAUTHORS,
+                [self.metrics, self.ranked_metrics],
+            )
+        paper_ids = SEMSCHTREE.top_papers(papers, AUTHOR_TOP_PAPERS)
+        return coauthor_ids, paper_ids
+
+    def missing_neighbors(
+        self, SEMSCHTREE: SemSchTree, author_id: str
+    ) -> Tuple[List[str], List[str]]:
+        """Returns the IDs of the coauthors and the papers of a cached author
+        that still have to be requested for its page, i.e., the ones without
+        metrics and the ones shown on the page that are not in the caches yet
+        """
+        worked_with, papers = self.author_neighbors(author_id)
+        coauthor_ids, paper_ids = self.top_neighbors(SEMSCHTREE, author_id)
+        missing_authors = [f for f in coauthor_ids if f not in self.author_dict]
+        missing_papers = [f for f in paper_ids if f not in SEMSCHTREE.papers_dict]
+        # The IDs that semantic scholar does not know are not requested again
+        known_missing = self.misses.missing(missing_authors)
+        missing_authors = self.unranked(worked_with) + [
+            f for f in missing_authors if f not in known_missing
+        ]
+        known_missing = SEMSCHTREE.misses.missing(missing_papers)
+        missing_papers = SEMSCHTREE.unranked(papers) + [
+            f for f in missing_papers if f not in known_missing
+        ]
+        return list(dict.fromkeys(missing_authors)), list(dict.fromkeys(missing_papers))
+
+    def rank_neighbors(
+        self, SEMSCHTREE: SemSchTree, author_id: str
+    ) -> Tuple[List[Dict], List[Dict]]:
+        """The function ranks the cached coauthors and papers of a cached
+        author by their citation count
+
+        Parameters
+        ----------
+        SEMSCHTREE : SemSchTree
+            A class object of type SemSchTree
+        author_id : str
+            Semantic scholar ID of the author
+
+        Returns
+        -------
+        Tuple[List[Dict], List[Dict]]
+            The top AUTHOR_TOP_COAUTHORS coauthors and AUTHOR_TOP_PAPERS papers
+            of the author that are cached
+        """
+        # The ranking runs over the metrics tables with a heap of the top IDs
+        # and only the selected authors and papers are materialized
+        coauthor_ids, paper_ids = self.top_neighbors(SEMSCHTREE, author_id)
+        worked_with_authors = [
+            self.author_dict[f].to_dict() for f in coauthor_ids if f in self.author_dict
+        ]
+        papers_author = SEMSCHTREE.cached_papers(paper_ids)
+        return worked_with_authors, papers_author
+
+    def load_neighbors(self, SEMSCHTREE: SemSchTree, author_id: str, emit: Callable) -> None:
+        """The function fetches the papers and the coauthors shown on the page
+        of a cached author that are not in the caches yet. The records are
+        passed to emit as soon as they are fetched, and the ranked lists of
+        get_author_data at the end
+
+        Parameters
+        ----------
+        SEMSCHTREE : SemSchTree
+            A class object of type SemSchTree
+        author_id : str
+            Semantic scholar ID of the author
+        emit : Callable
+            Function called as emit(section, records, replace=False) with the
+            section "papers" or "worked_with"
+        """
+        worked_with, papers = self.author_neighbors(author_id)
+        with self.pinned([author_id, *worked_with]), SEMSCHTREE.pinned(papers):
+            # Ranking the coauthors and the papers by their metrics first, so
+            # that only the ones shown on the page are fetched in full
+            self.update_ranked_metrics(worked_with)
+            SEMSCHTREE.update_ranked_metrics(papers)
+            coauthor_ids, paper_ids = self.top_neighbors(SEMSCHTREE, author_id)
+
+            missing_papers = [f for f in paper_ids if f not in SEMSCHTREE.papers_dict]
+            for start_idx in range(0, len(missing_papers), SEMSCH_BATCH_SIZE):
+                chunk_ids = missing_papers[start_idx : start_idx + SEMSCH_BATCH_SIZE]
+                SEMSCHTREE.update_papers(chunk_ids)
+                SEMSCHTREE.write_cache()
+                emit("papers", SEMSCHTREE.cached_papers(chunk_ids))
+            missing_authors = [f for f in coauthor_ids if f not in self.author_dict]
+            for start_idx in range(0, len(missing_authors), SEMSCH_BATCH_SIZE):
+                chunk_ids = missing_authors[start_idx : start_idx + SEMSCH_BATCH_SIZE]
+                self.update_authors(chunk_ids)
+                # Writing the authors through to the cache store right away so
+                # that the other processes can serve them
+                self.write_cache()
+                emit(
+                    "worked_with",
+                    [self.author_dict[f].to_dict() for f in chunk_ids if f in self.author_dict],
+                )
+
+            worked_with_authors, papers_author = self.rank_neighbors(SEMSCHTREE, author_id)
+            emit("papers", papers_author, replace=True)
+            emit("worked_with", worked_with_authors, replace=True)
@@ -0,0 +1,517 @@
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+
+from prefetch import AUTHOR, PAPER
+
+# Relations of the graph as name -> (kind of the source nodes, kind of the
+# target nodes), named after the attributes of SemSchPaper and Authors they
+# are read from
+REFERENCES = "references"
+CITATIONS = "citations"
+AUTHORS = "authors"
+PAPERS = "papers"
+WORKED_WITH = "worked_with"
+RELATIONS = {
+    REFERENCES: (PAPER, PAPER),
+    CITATIONS: (PAPER, PAPER),
+    AUTHORS: (PAPER, AUTHOR),
+    PAPERS: (AUTHOR, PAPER),
+    WORKED_WITH: (AUTHOR, AUTHOR),
+}
+# Relations read from the papers and from the authors
+PAPER_RELATIONS = [REFERENCES, CITATIONS, AUTHORS]
+AUTHOR_RELATIONS = [PAPERS, WORKED_WITH]
+# Largest number of hops of a k-hop query
+MAX_HOPS = 3
+
+
+class IdMap:
+    def __init__(self):
+        """A mapping of paper or author IDs to dense integers, in the order the
+        IDs were first seen, and back
+        """
+        self.ids = []
+        self.index = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def get(self, key: str) -> int:
+        """Returns the integer of an ID, -1 if the ID is unknown"""
+        return self.index.get(key, -1)
+
+    def add(self, key: str) -> int:
+        """Returns the integer of an ID, a new one if the ID is unknown"""
+        node = self.index.get(key)
+        if node is None:
+            node = len(self.ids)
+            self.index[key] = node
+            self.ids.append(key)
+        return node
+
+    def add_many(self, keys: Iterable[str]) -> np.ndarray:
+        """Returns the integers of the IDs, new ones for the unknown IDs"""
+        return np.fromiter((self.add(f) for f in keys), dtype=np.int32)
+
+    def keys_at(self, nodes: Iterable[int]) -> List[str]:
+        """Returns the IDs of the integers"""
+        return [self.ids[f] for f in nodes]
+
+
+class CSRAdjacency:
+    def __init__(self):
+        """The edges of one relation in compressed sparse row format. The
+        targets of the source node i are indices[indptr[i]:indptr[i + 1]], in
+        the order of the record they were read from. Rows that are added or
+        replaced are kept in a pending buffer and merged into the arrays by
+        build(), so a batch of new records costs a single merge. The number
+        of sources of every target node, i.e., the row lengths of the reverse
+        adjacency, is updated by every merge, and the reverse adjacency itself
+        is built from the merged arrays when it is first needed
+        """
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        # Latest targets of the rows added or replaced since the last build
+        self.pending = {}
+        # Number of sources of every target node of the merged arrays
+        self.in_counts = np.zeros(0, dtype=np.int64)
+        # Reverse adjacency of the merged arrays, None until it is needed
+        self._transpose = None
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices)
+
+    def set_row(self, row: int, targets: np.ndarray) -> None:
+        """The function replaces the targets of a source node, the change is
+        visible after the next build()
+        """
+        self.pending[row] = targets
+
+    def build(self) -> bool:
+        """The function merges the pending rows into the CSR arrays, dropping
+        the previous targets of the replaced rows. The new row lengths give the
+        new indptr, and the unchanged rows between two pending rows are copied
+        as one block, so a merge copies the edges once and only loops over
+        the pending rows. The numbers of sources are updated with the previous
+        and the new targets of the pending rows only
+
+        Returns
+        -------
+        bool
+            True if there were pending rows, False otherwise
+        """
+        if not self.pending:
+            return False
+        rows = sorted(self.pending)
+        targets = [self.pending[f] for f in rows]
+        built = len(self)
+        size = max(built, rows[-1] + 1)
+        counts = np.zeros(size, dtype=np.int64)
+        counts[:built] = np.diff(self.indptr)
+        counts[rows] = [len(f) for f in targets]
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        # Blocks of unchanged rows and pending rows in row order, start is the
+        # next row of the previous arrays that is not taken yet
+        old_indptr = self.indptr.tolist()
+        pieces = [self.indices[:0]]
+        start = 0
+        for row, row_targets in zip(rows, targets):
+            end = min(row, built)
+            if start < end:
+                pieces.append(self.indices[old_indptr[start] : old_indptr[end]])
+            pieces.append(row_targets)
+            start = row + 1
+        if start < built:
+            pieces.append(self.indices[old_indptr[start] :])
+        rows = np.array(rows, dtype=np.int64)
+        # Previous targets of the replaced rows
+        removed = self.gather(rows)
+        self.indices = np.concatenate(pieces).astype(np.int32, copy=False)
+        self.indptr = indptr
+        self.pending = {}
+        self._transpose = None
+
+        added = self.gather(rows)
+        if len(added) and added.max() >= len(self.in_counts):
+            in_counts = np.zeros(int(added.max()) + 1, dtype=np.int64)
+            in_counts[: len(self.in_counts)] = self.in_counts
+            self.in_counts = in_counts
+        np.subtract.at(self.in_counts, removed, 1)
+        np.add.at(self.in_counts, added, 1)
+        return True
+
+    def transpose(self) -> "CSRAdjacency":
+        """The function returns the reverse adjacency of the merged arrays,
+        whose row i holds the sources of the target node i in increasing
+        order. Its indptr comes from self.in_counts and its indices from a
+        stable sort of the targets, which is the costly part, so it is only
+        built for the queries of the sources themselves and kept until the
+        next merge
+
+        Returns
+        -------
+        CSRAdjacency
+            Reverse adjacency, without pending rows
+        """
+        if self._transpose is None:
+            transpose = CSRAdjacency()
+            transpose.indptr = np.zeros(len(self.in_counts) + 1, dtype=np.int64)
+            np.cumsum(self.in_counts, out=transpose.indptr[1:])
+            sources = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.indptr))
+            transpose.indices = sources[np.argsort(self.indices, kind="stable")]
+            self._transpose = transpose
+        return self._transpose
+
+    def row(self, row: int) -> np.ndarray:
+        """Returns the targets of a source node"""
+        if row < 0 or row >= len(self):
+            return self.indices[:0]
+        return self.indices[self.indptr[row] : self.indptr[row + 1]]
+
+    def latest_row(self, row: int) -> np.ndarray:
+        """Returns the targets of a source node with its pending change, if
+        any, without merging the pending rows
+        """
+        targets = self.pending.get(row)
+        if targets is not None:
+            return targets
+        return self.row(row)
+
+    def gather(self, rows: np.ndarray) -> np.ndarray:
+        """Returns the targets of several source nodes concatenated, without a
+        Python loop over the rows
+        """
+        rows = rows[(rows >= 0) & (rows < len(self))]
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return self.indices[:0]
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        return self.indices[offsets + np.arange(total)]
+
+    def degrees(self, size: int) -> np.ndarray:
+        """Returns the number of targets of every source node"""
+        degrees = np.zeros(size, dtype=np.int64)
+        built = min(size, len(self))
+        degrees[:built] = np.diff(self.indptr)[:built]
+        return degrees
+
+    def in_degree(self, node: int) -> int:
+        """Returns the number of sources of a target node"""
+        if node < 0 or node >= len(self.in_counts):
+            return 0
+        return int(self.in_counts[node])
+
+    def in_degrees(self, size: int) -> np.ndarray:
+        """Returns the number of sources of every target node"""
+        degrees = np.zeros(size, dtype=np.int64)
+        built = min(size, len(self.in_counts))
+        degrees[:built] = self.in_counts[:built]
+        return degrees
+
+
+class GraphIndex:
+    def __init__(self, semsch_tree=None, author_tree=None):
+        """A compact adjacency index of the cached papers and authors. The
+        paper and author IDs are mapped to dense integers, and the references,
+        citations, authors, papers and coauthors (worked_with) of the records
+        are kept as CSR arrays of NumPy, so neighbor, degree and k-hop queries
+        do not walk the record objects and do not materialize the records of a
+        lazy cache. The trees add their new records to the index as they are
+        fetched, and the index merges them into the arrays at the next query
+
+        Parameters
+        ----------
+        semsch_tree : SemSchTree, optional
+            Tree of the semantic scholar papers, its cached papers are indexed
+            and its new papers are added as they are fetched, by default None
+        author_tree : AuthorTree, optional
+            Tree of the semantic scholar authors, its cached authors are
+            indexed and its new authors are added as they are fetched, by
+            default None
+        """
+        self.nodes = {PAPER: IdMap(), AUTHOR: IdMap()}
+        self.adjacency = {f: CSRAdjacency() for f in RELATIONS}
+        # The lock guards the ID maps and the CSR arrays, it is never held
+        # while a lock of a tree is acquired
+        self._lock = threading.RLock()
+        self._builds = 0
+        self._queries = 0
+        # The trees are hooked before the stores are read, so that no record
+        # fetched in the meantime is missed
+        if semsch_tree is not None:
+            semsch_tree.graph = self
+            self.load_papers(semsch_tree.store)
+        if author_tree is not None:
+            author_tree.graph = self
+            self.load_authors(author_tree.store)
+        # The cached records are merged up front instead of at the first query
+        self.build()
+
+    @staticmethod
+    def _field(record: Union[Dict, Any], name: str) -> List:
+        """Returns a list field of a record object, a dictionary, or a JSON
+        string extracted by SQLite, as a list
+        """
+        if isinstance(record, dict):
+            value = record.get(name)
+        else:
+            value = getattr(record, name, None)
+        if isinstance(value, str):
+            value = json.loads(value)
+        return list(value) if value else []
+
+    def _set_neighbors(self, relation: str, node_id: str, targets: Iterable[str]) -> None:
+        source_kind, target_kind = RELATIONS[relation]
+        row = self.nodes[source_kind].add(node_id)
+        targets = [f for f in dict.fromkeys(targets) if f is not None]
+        self.adjacency[relation].set_row(row, self.nodes[target_kind].add_many(targets))
+
+    def add_paper(self, paper_id: str, paper: Union[Dict, Any]) -> None:
+        """The function adds or replaces the references, citations and authors
+        of a paper
+
+        Parameters
+        ----------
+        paper_id : str
+            Semantic scholar ID of the paper
+        paper : Union[Dict, Any]
+            Either a SemSchPaper or its dictionary
+        """
+        authors = [
+            f.get("authorId") if isinstance(f, dict) else f
+            for f in self._field(paper, AUTHORS)
+        ]
+        with self._lock:
+            self._set_neighbors(REFERENCES, paper_id, self._field(paper, REFERENCES))
+            self._set_neighbors(CITATIONS, paper_id, self._field(paper, CITATIONS))
+            self._set_neighbors(AUTHORS, paper_id, authors)
+
+    def add_author(self, author_id: str, author: Union[Dict, Any]) -> None:
+        """The function adds or replaces the papers and the coauthors of an
+        author
+
+        Parameters
+        ----------
+        author_id : str
+            Semantic scholar ID of the author
+        author : Union[Dict, Any]
+            Either an Authors object or its dictionary
+        """
+        with self._lock:
+            for relation in AUTHOR_RELATIONS:
+                self._set_neighbors(relation, author_id, self._field(author, relation))
+
+    def load_papers(self, store) -> None:
+        """The function indexes all the papers of a cache store. The fields are
+        extracted by SQLite, so the papers are not materialized
+        """
+        for k, v in store.iter_fields(PAPER_RELATIONS):
+            self.add_paper(k, v)
+
+    def load_authors(self, store) -> None:
+        """The function indexes all the authors of a cache store. The fields
+        are extracted by SQLite, so the authors are not materialized
+        """
+        for k, v in store.iter_fields(AUTHOR_RELATIONS):
+            self.add_author(k, v)
+
+    def build(self) -> None:
+        """The function merges the pending rows of every relation into the CSR
+        arrays
+        """
+        with self._lock:
+            for adjacency in self.adjacency.values():
+                if adjacency.build():
+                    self._builds += 1
+
+    def _adjacency(self, relation: str, build: bool = True) -> CSRAdjacency:
+        """Returns the CSR arrays of a relation, with the pending rows merged
+        unless build is False
+        """
+        if relation not in RELATIONS:
+            raise ValueError(f"Unknown relation {relation}")
+        adjacency = self.adjacency[relation]
+        if build and adjacency.build():
+            self._builds += 1
+        self._queries += 1
+        return adjacency
+
+    def neighbors(self, relation: str, node_id: str, incoming: bool = False) -> List[str]:
+        """The function returns the neighbors of a paper or an author, in the
+        order of its record, or with incoming=True the nodes it is a neighbor
+        of, e.g., the cached papers referencing a paper. The neighbors of a
+        node added since the last merge are read from its pending row, so the
+        lookups of a page never wait for a merge
+
+        Parameters
+        ----------
+        relation : str
+            One of RELATIONS, e.g., REFERENCES for the references of a paper
+        node_id : str
+            Semantic scholar ID of the paper or the author
+        incoming : bool, optional
+            Whether to follow the edges backwards, by default False
+
+        Returns
+        -------
+        List[str]
+            IDs of the neighbors, empty if the node is unknown
+        """
+        source_kind, target_kind = RELATIONS.get(relation, (None, None))
+        with self._lock:
+            if incoming:
+                adjacency = self._adjacency(relation).transpose()
+                row = adjacency.row(self.nodes[target_kind].get(node_id))
+                return self.nodes[source_kind].keys_at(row)
+            adjacency = self._adjacency(relation, build=False)
+            row = adjacency.latest_row(self.nodes[source_kind].get(node_id))
+            return self.nodes[target_kind].keys_at(row)
+
+    def degree(self, relation: str, node_id: str, incoming: bool = False) -> int:
+        """The function returns the number of neighbors of a paper or an
+        author, or with incoming=True the number of nodes it is a neighbor of,
+        e.g., the number of cached papers referencing a paper
+
+        Parameters
+        ----------
+        relation : str
+            One of RELATIONS
+        node_id : str
+            Semantic scholar ID of the paper or the author
+        incoming : bool, optional
+            Whether to count the incoming edges, by default False
+
+        Returns
+        -------
+        int
+            The degree of the node, 0 if the node is unknown
+        """
+        source_kind, target_kind = RELATIONS.get(relation, (None, None))
+        with self._lock:
+            if not incoming:
+                adjacency = self._adjacency(relation, build=False)
+                return len(adjacency.latest_row(self.nodes[source_kind].get(node_id)))
+            adjacency = self._adjacency(relation)
+            return adjacency.in_degree(self.nodes[target_kind].get(node_id))
+
+    def top_degrees(
+        self, relation: str, k: int, incoming: bool = False
+    ) -> List[Tuple[str, int]]:
+        """The function returns the k nodes with the largest degree, e.g., the
+        most referenced papers of the cache with incoming=True
+
+        Parameters
+        ----------
+        relation : str
+            One of RELATIONS
+        k : int
+            Number of nodes to return
+        incoming : bool, optional
+            Whether to count the incoming edges, by default False
+
+        Returns
+        -------
+        List[Tuple[str, int]]
+            IDs and degrees of the nodes, sorted by decreasing degree
+        """
+        source_kind, target_kind = RELATIONS.get(relation, (None, None))
+        with self._lock:
+            adjacency = self._adjacency(relation)
+            kind = target_kind if incoming else source_kind
+            size = len(self.nodes[kind])
+            if incoming:
+                degrees = adjacency.in_degrees(size)
+            else:
+                degrees = adjacency.degrees(size)
+            k = min(k, size)
+            if k <= 0:
+                return []
+            top = np.argpartition(-degrees, k - 1)[:k]
+            top = top[np.argsort(-degrees[top], kind="stable")]
+            return list(zip(self.nodes[kind].keys_at(top), degrees[top].tolist()))
+
+    def k_hop(
+        self, node_id: str, relations: Union[str, List[str]], k: int
+    ) -> List[str]:
+        """The function returns the nodes within k hops of a paper or an
+        author, following the given relations, e.g., the papers reachable over
+        2 hops of references and citations. Every hop gathers the neighbors of
+        the whole frontier at once
+
+        Parameters
+        ----------
+        node_id : str
+            Semantic scholar ID of the paper or the author
+        relations : Union[str, List[str]]
+            One or more of RELATIONS whose source and target nodes are of the
+            same kind, i.e., REFERENCES, CITATIONS or WORKED_WITH
+        k : int
+            Number of hops, at most MAX_HOPS
+
+        Returns
+        -------
+        List[str]
+            IDs of the reached nodes without the node itself, closer nodes
+            first
+
+        Raises
+        ------
+        ValueError
+            If a relation is unknown or connects two kinds of nodes
+        """
+        if isinstance(relations, str):
+            relations = [relations]
+        kinds = {RELATIONS[f] for f in relations if f in RELATIONS}
+        if len(kinds) != 1 or len(relations) != len(set(relations) & set(RELATIONS)):
+            raise ValueError(f"Relations {relations} do not connect one kind of nodes")
+        kind, target_kind = kinds.pop()
+        if kind != target_kind:
+            raise ValueError(f"Relations {relations} do not connect one kind of nodes")
+        with self._lock:
+            adjacencies = [self._adjacency(f) for f in relations]
+            node = self.nodes[kind].get(node_id)
+            if node < 0:
+                return []
+            visited = np.zeros(len(self.nodes[kind]), dtype=bool)
+            visited[node] = True
+            frontier = np.array([node], dtype=np.int64)
+            reached = []
+            for _ in range(min(k, MAX_HOPS)):
+                found = np.concatenate([f.gather(frontier) for f in adjacencies])
+                # Keeping the first occurrence of every new node in order
+                found, first = np.unique(found, return_index=True)
+                found = found[np.argsort(first)]
+                frontier = found[~visited[found]].astype(np.int64)
+                if len(frontier) == 0:
+                    break
+                visited[frontier] = True
+                reached.append(frontier)
+            if not reached:
+                return []
+            return self.nodes[kind].keys_at(np.concatenate(reached))
+
+    def get_stats(self) -> Dict:
+        """Returns the number of nodes of every kind, the number of edges of
+        every relation, and the number of merges of pending rows and of queries
+        """
+        with self._lock:
+            self.build()
+            return {
+                "nodes": {f: len(v) for f, v in self.nodes.items()},
+                "edges": {f: v.edge_count for f, v in self.adjacency.items()},
+                "builds": self._builds,
+                "queries": self._queries,
+            }
@@ -0,0 +1,289 @@
+import contextlib
+import threading
+import urllib.parse
+from typing import Dict, Iterator, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import rate_limiter
+from rate_limiter import RateLimiter
+
+# Number of keep-alive connections kept open per upstream host
+POOL_SIZE = 20
+# Connect and read timeouts in seconds for every upstream request
+TIMEOUT = (5.0, 30.0)
+# Number of retries for failed connections and server errors, the wait between
+# retries grows as BACKOFF_FACTOR * 2 ** (retry - 1) seconds
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+RETRY_STATUS = [500, 502, 503, 504]
+# Number of times a request throttled by the upstream API (HTTP 429) is sent
+# again after the rate limiter backed off
+MAX_THROTTLE_RETRIES = 5
+
+
+class ThrottledError(requests.HTTPError):
+    """Raised when the upstream API still throttles a request (HTTP 429) after
+    all the retries. The response is kept in self.response
+    """
+
+
+class NoCapacityError(requests.RequestException):
+    """Raised instead of waiting for the rate limiter when a request is sent
+    inside HttpClient.spare_capacity and the API has no spare capacity
+    """
+
+
+class HttpClient:
+    def __init__(
+        self,
+        pool_size: int = POOL_SIZE,
+        timeout: Union[float, Tuple[float, float]] = TIMEOUT,
+        max_retries: int = MAX_RETRIES,
+        backoff_factor: float = BACKOFF_FACTOR,
+        max_throttle_retries: int = MAX_THROTTLE_RETRIES,
+    ):
+        """A pooled HTTP client shared by all the trees. It keeps the
+        connections to the upstream APIs alive between requests and retries
+        failed requests with an exponential backoff
+
+        Parameters
+        ----------
+        pool_size : int, optional
+            Number of connections kept open per host, by default POOL_SIZE
+        timeout : Union[float, Tuple[float, float]], optional
+            Connect and read timeout of every request, by default TIMEOUT
+        max_retries : int, optional
+            Number of retries of a failed request, by default MAX_RETRIES
+        backoff_factor : float, optional
+            Backoff factor between retries, by default BACKOFF_FACTOR
+        max_throttle_retries : int, optional
+            Number of retries of a request throttled with HTTP 429, by default
+            MAX_THROTTLE_RETRIES
+        """
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_throttle_retries = max_throttle_retries
+        # Rate limiters keyed by the host they schedule the requests for
+        self.rate_limiters = {}
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS,
+            # The POST requests of the application are batch lookups and are
+            # safe to retry
+            allowed_methods=frozenset(["GET", "POST"]),
+            raise_on_status=False,
+            # Throttled requests (HTTP 429) are handled by the rate limiters
+            respect_retry_after_header=False,
+        )
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+        self._lock = threading.Lock()
+        # Threads sending their requests inside self.spare_capacity
+        self._local = threading.local()
+        self.request_count = 0
+        self.error_count = 0
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """The function sends a request through the pooled session
+
+        Parameters
+        ----------
+        method : str
+            HTTP method of the request
+        url : str
+            URL of the request
+
+        Returns
+        -------
+        requests.Response
+            Response of the upstream API. A streamed response, i.e., with
+            stream=True, holds its slot of the rate limiter until its body is
+            read or it is closed, so it must be closed
+
+        Raises
+        ------
+        ThrottledError
+            If the request is still throttled after max_throttle_retries
+            retries
+        NoCapacityError
+            If the request is sent inside self.spare_capacity and the rate
+            limiter of the host does not allow it right away
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        limiter = self.rate_limiters.get(urllib.parse.urlsplit(url).netloc)
+        if limiter is None:
+            return self._send(method, url, **kwargs)
+
+        # Requests to a rate limited host are scheduled by its rate limiter,
+        # which also backs off and sends the request again when the API
+        # throttles it
+        spare_only = getattr(self._local, "spare_only", False)
+        stream = kwargs.get("stream", False)
+        for _ in range(self.max_throttle_retries + 1):
+            if spare_only:
+                ticket = limiter.try_acquire()
+                if ticket is None:
+                    raise NoCapacityError(f"{method} {url} has to wait for the rate limiter")
+            else:
+                ticket = limiter.acquire()
+            try:
+                response = self._send(method, url, **kwargs)
+            except BaseException:
+                limiter.release(None, ticket=ticket)
+                raise
+            if stream and response.status_code != 429:
+                # The body of a streamed response is still downloading, its
+                # slot is released with the connection
+                _release_with_connection(response, limiter, ticket)
+                return response
+            limiter.release(
+                response.status_code, response.headers.get("Retry-After"), ticket=ticket
+            )
+            if response.status_code != 429:
+                return response
+            response.close()
+        raise ThrottledError(
+            f"{method} {url} is still throttled after "
+            f"{self.max_throttle_retries} retries",
+            response=response,
+        )
+
+    @contextlib.contextmanager
+    def spare_capacity(self) -> Iterator[None]:
+        """Context manager for background work that should only use the spare
+        capacity of the rate limited APIs, e.g., prefetching. The requests sent
+        by the current thread inside it take a slot of the rate limiter only if
+        one is free right away and raise NoCapacityError otherwise, so they
+        never wait for or queue ahead of the requests of the users
+        """
+        previous = getattr(self._local, "spare_only", False)
+        self._local.spare_only = True
+        try:
+            yield
+        finally:
+            self._local.spare_only = previous
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        with self._lock:
+            self.request_count += 1
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self.error_count += 1
+            raise
+
+    def set_rate_limiter(self, host: str, limiter: RateLimiter) -> None:
+        """The function schedules all the requests to the given host, e.g.,
+        "api.semanticscholar.org", through the given rate limiter
+        """
+        self.rate_limiters[host] = limiter
+
+    def get_rate_limiter(self, url: str) -> Union[RateLimiter, None]:
+        """Returns the rate limiter used for the host of the given URL, if any"""
+        return self.rate_limiters.get(urllib.parse.urlsplit(url).netloc)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get_stats(self) -> Dict[str, int]:
+        """The function returns the pooling metrics of the client. The number of
+        reused connections is the number of requests that did not have to open
+        a new connection
+
+        Returns
+        -------
+        Dict[str, int]
+            Dictionary of the request, error and connection counts
+        """
+        connections_opened = 0
+        pool_requests = 0
+        for pool in list(self.adapter.poolmanager.pools._container.values()):
+            connections_opened += pool.num_connections
+            pool_requests += pool.num_requests
+        with self._lock:
+            return {
+                "requests": self.request_count,
+                "errors": self.error_count,
+                "connections_opened": connections_opened,
+                "connections_reused": max(pool_requests - connections_opened, 0),
+            }
+
+
+def _release_with_connection(
+    response: requests.Response, limiter: RateLimiter, ticket: int
+) -> None:
+    """The function releases the slot of the rate limiter taken by a streamed
+    response once its connection goes back to the pool, i.e., once its body
+    is completely read or it is closed, whichever comes first
+    """
+    release_conn = response.raw.release_conn
+    tickets = [ticket]
+
+    def release() -> None:
+        try:
+            release_conn()
+        finally:
+            # The connection is released again when a read response is closed
+            if tickets:
+                limiter.release(
+                    response.status_code,
+                    response.headers.get("Retry-After"),
+                    ticket=tickets.pop(),
+                )
+
+    response.raw.release_conn = release
+
+
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def _default_client(**kwargs) -> HttpClient:
+    client = HttpClient(**kwargs)
+    client.set_rate_limiter("api.semanticscholar.org", RateLimiter())
+    client.set_rate_limiter(
+        "export.arxiv.org",
+        RateLimiter(
+            rate=rate_limiter.ARXIV_RATE,
+            min_rate=rate_limiter.ARXIV_RATE,
+            max_rate=rate_limiter.ARXIV_RATE,
+            concurrency=rate_limiter.ARXIV_CONCURRENCY,
+            max_concurrency=rate_limiter.ARXIV_CONCURRENCY,
+        ),
+    )
+    return client
+
+
+def get_client() -> HttpClient:
+    """Returns the HTTP client shared by all the trees, creating it with the
+    default configuration on first use. The shared client schedules the
+    requests to semantic scholar and arxiv through their rate limiters
+    """
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = _default_client()
+        return _CLIENT
+
+
+def configure_client(**kwargs) -> HttpClient:
+    """Replaces the shared HTTP client with a new one, e.g., to change the pool
+    size or the timeouts. The keyword arguments are passed to HttpClient
+    """
+    global _CLIENT
+    with _CLIENT_LOCK:
+        _CLIENT = _default_client(**kwargs)
+        return _CLIENT
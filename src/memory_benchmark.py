@@ -0,0 +1,77 @@
+"""Measures the memory used per cached record by the record classes of
+primitive_objects.py, compared with plain dict-backed objects that hold the
+same records the way the classes did before they used __slots__. Run it from
+the src directory:
+
+    python memory_benchmark.py
+"""
+import gc
+import json
+import tracemalloc
+from typing import Callable, Dict
+
+from primitive_objects import ArxivPaper, SemSchPaper
+
+CACHE_ARXIV = "../data/papers_arxiv_v1.json"
+CACHE_SEMSCH = "../data/papers_semsch_v1.json"
+# Every cached record is loaded this many times to make the measurement stable
+REPEATS = 20
+
+
+class DictRecord:
+    """A record that keeps its attributes in a per-object __dict__ and the
+    lists of the JSON record as they are, i.e., the layout of the records before
+    __slots__"""
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def bytes_per_record(cache_text: str, factory: Callable[[Dict], object]) -> float:
+    """The function returns the number of bytes kept in memory per record once
+    the records of a JSON cache are loaded with the factory and the parsed JSON
+    is released. Every repetition parses the cache again, so the records of
+    different repetitions only share strings that are interned
+
+    Parameters
+    ----------
+    cache_text : str
+        Text of a JSON cache file
+    factory : Callable[[Dict], object]
+        Function that builds the in-memory object of a record
+
+    Returns
+    -------
+    float
+        Number of bytes per record
+    """
+    gc.collect()
+    tracemalloc.start()
+    objects = []
+    for _ in range(REPEATS):
+        data = json.loads(cache_text)
+        objects.extend(factory(f) for f in data.values())
+        del data
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return used / len(objects)
+
+
+def main() -> None:
+    for name, cache_pth, record_cls in [
+        ("ArxivPaper", CACHE_ARXIV, ArxivPaper),
+        ("SemSchPaper", CACHE_SEMSCH, SemSchPaper),
+    ]:
+        with open(cache_pth, "r") as f:
+            cache_text = f.read()
+        before = bytes_per_record(cache_text, lambda v: DictRecord(**v))
+        after = bytes_per_record(cache_text, lambda v: record_cls(**v))
+        print(
+            f"{name}: {before:.0f} bytes per record before, {after:.0f} after "
+            f"({100 * (1 - after / before):.0f}% less)"
+        )
+
+
+if __name__ == "__main__":
+    main()
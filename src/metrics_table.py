@@ -0,0 +1,299 @@
+from typing import Any, Dict, Iterable, List, Union
+
+import numpy as np
+
+# Numeric columns of the paper and author tables, named after the attributes of
+# SemSchPaper and Authors
+PAPER_METRICS = ["year", "citation_count", "reference_count", "influential_paper_citations"]
+AUTHOR_METRICS = ["citations", "hindex", "paper_count"]
+# Number of rows allocated up front, the columns double in size when full
+INITIAL_CAPACITY = 1024
+
+
+class MetricsTable:
+    def __init__(self, columns: List[str], capacity: int = INITIAL_CAPACITY):
+        """A columnar side table of numeric metrics keyed by paper or author ID.
+        Every metric is a NumPy float array with one row per ID, missing values
+        are NaN. Rankings and filters over the metrics are vectorized instead of
+        walking the record objects, and the sorted order of every column is
+        cached until a value of the column changes
+
+        Parameters
+        ----------
+        columns : List[str]
+            Names of the metric columns
+        capacity : int, optional
+            Number of rows allocated up front, by default INITIAL_CAPACITY
+        """
+        self.column_names = list(columns)
+        self.columns = {f: np.full(capacity, np.nan) for f in self.column_names}
+        self.keys = []
+        self.rows = {}
+        # Version of every column, bumped when a row is added or a value of the
+        # column changes, and the sorted rows of the columns keyed by (column,
+        # descending) with the version they were sorted at
+        self.versions = {f: 0 for f in self.column_names}
+        self._orderings = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.rows
+
+    def _grow(self) -> None:
+        for name, values in self.columns.items():
+            grown = np.full(2 * len(values), np.nan)
+            grown[: len(values)] = values
+            self.columns[name] = grown
+
+    def upsert(self, key: str, values: Union[Dict[str, Any], Any]) -> None:
+        """The function inserts or updates the metrics of an ID
+
+        Parameters
+        ----------
+        key : str
+            Paper or author ID
+        values : Union[Dict[str, Any], Any]
+            Either a dictionary of metrics or a record object with the metrics
+            as attributes. Missing and None values are stored as NaN
+        """
+        row = self.rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == len(self.columns[self.column_names[0]]):
+                self._grow()
+            self.rows[key] = row
+            self.keys.append(key)
+            for name in self.column_names:
+                self.versions[name] += 1
+        for name in self.column_names:
+            if isinstance(values, dict):
+                value = values.get(name)
+            else:
+                value = getattr(values, name, None)
+            try:
+                value = np.nan if value is None else float(value)
+            except (TypeError, ValueError):
+                value = np.nan
+            previous = self.columns[name][row]
+            # NaN is the only value that is not equal to itself
+            if value != previous and (value == value or previous == previous):
+                self.columns[name][row] = value
+                self.versions[name] += 1
+
+    def value(self, key: str, name: str) -> float:
+        """Returns the value of the column for the ID, NaN if the value is
+        missing or the ID is not in the table
+        """
+        row = self.rows.get(key)
+        if row is None:
+            return np.nan
+        return float(self.columns[name][row])
+
+    def rows_of(self, keys: List[str]) -> np.ndarray:
+        """Returns the rows of the given IDs, -1 for the IDs that are not in
+        the table
+        """
+        return np.fromiter(
+            (self.rows.get(f, -1) for f in keys), dtype=np.intp, count=len(keys)
+        )
+
+    def column(self, name: str) -> np.ndarray:
+        """Returns a view of the values of the column for all the rows"""
+        return self.columns[name][: len(self.keys)]
+
+    def filter(
+        self,
+        rows: np.ndarray = None,
+        min_values: Dict[str, float] = None,
+        max_values: Dict[str, float] = None,
+    ) -> np.ndarray:
+        """The function returns the rows whose metrics lie within the given
+        bounds. Rows with a NaN in a bounded column are dropped
+
+        Parameters
+        ----------
+        rows : np.ndarray, optional
+            Rows to filter, by default all the rows
+        min_values : Dict[str, float], optional
+            Smallest allowed value per column, by default None
+        max_values : Dict[str, float], optional
+            Largest allowed value per column, by default None
+
+        Returns
+        -------
+        np.ndarray
+            Rows that satisfy all the bounds, in their input order
+        """
+        if rows is None:
+            rows = np.arange(len(self.keys))
+        mask = np.ones(len(rows), dtype=bool)
+        for name, bound in (min_values or {}).items():
+            mask &= self.columns[name][rows] >= bound
+        for name, bound in (max_values or {}).items():
+            mask &= self.columns[name][rows] <= bound
+        return rows[mask]
+
+    def order(
+        self,
+        column: str,
+        rows: np.ndarray = None,
+        descending: bool = True,
+        drop_missing: bool = True,
+    ) -> np.ndarray:
+        """The function sorts the rows by a column. Rows with equal values keep
+        their input order
+
+        Parameters
+        ----------
+        column : str
+            Column to sort by
+        rows : np.ndarray, optional
+            Rows to sort, by default all the rows
+        descending : bool, optional
+            Sort from the largest to the smallest value, by default True
+        drop_missing : bool, optional
+            Drop the rows with a NaN in the column instead of putting them last,
+            by default True
+
+        Returns
+        -------
+        np.ndarray
+            Sorted rows
+        """
+        if rows is None:
+            rows = np.arange(len(self.keys))
+        values = self.columns[column][rows]
+        valid = ~np.isnan(values)
+        missing_rows = rows[~valid]
+        rows = rows[valid]
+        values = values[valid]
+        if descending:
+            values = -values
+        rows = rows[np.argsort(values, kind="stable")]
+        if drop_missing:
+            return rows
+        return np.concatenate([rows, missing_rows])
+
+    def sorted_rows(self, column: str, descending: bool = True) -> np.ndarray:
+        """The function returns all the rows sorted by a column, the rows with
+        a NaN last and the rows with equal values in row order, as in
+        self.order. The result is cached until a row is added or a value of
+        the column changes, so reading the pages of an unchanged column does
+        not sort it again
+
+        Parameters
+        ----------
+        column : str
+            Column to sort by
+        descending : bool, optional
+            Sort from the largest to the smallest value, by default True
+
+        Returns
+        -------
+        np.ndarray
+            Read-only array of the sorted rows
+        """
+        # The version is read before sorting, so an ordering that races with
+        # an upsert is sorted again at the next call
+        version = self.versions[column]
+        cached = self._orderings.get((column, descending))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        rows = self.order(column, descending=descending, drop_missing=False)
+        rows.flags.writeable = False
+        self._orderings[(column, descending)] = (version, rows)
+        return rows
+
+    def keys_at(self, rows: Iterable[int]) -> List[str]:
+        """Returns the IDs of the given rows"""
+        return [self.keys[f] for f in rows]
+
+    def records(self, rows: np.ndarray, columns: List[str] = None) -> List[Dict]:
+        """The function returns the metrics of the given rows as dictionaries
+        with the ID under "id". The values are converted back to integers and
+        NaN to None, i.e., the values of the records the metrics came from
+
+        Parameters
+        ----------
+        rows : np.ndarray
+            Rows to return
+        columns : List[str], optional
+            Columns to return, by default all the columns
+
+        Returns
+        -------
+        List[Dict]
+            One dictionary per row
+        """
+        if columns is None:
+            columns = self.column_names
+        values = {}
+        for name in columns:
+            # NaN is the only value that is not equal to itself
+            values[name] = [
+                int(f) if f == f else None for f in self.columns[name][rows].tolist()
+            ]
+        records = []
+        for i, key in enumerate(self.keys_at(rows)):
+            record = {"id": key}
+            for name in columns:
+                record[name] = values[name][i]
+            records.append(record)
+        return records
+
+
+def top_k_keys(
+    keys: Iterable[str], name: str, k: int, tables: List[MetricsTable]
+) -> List[str]:
+    """The function returns the k IDs with the largest values of a column, in
+    descending order. The value of every ID is read from the first table that
+    has it, e.g., the table of the cached records and then the table of the
+    records only known by their metrics. The values are gathered from the
+    column arrays and the k largest are selected with np.argpartition, so only
+    the selected IDs are sorted. The IDs without a value come last and ties
+    keep the order of the IDs
+
+    Parameters
+    ----------
+    keys : Iterable[str]
+        Paper or author IDs
+    name : str
+        Name of the column
+    k : int
+        Number of IDs to return
+    tables : List[MetricsTable]
+        Tables to read the values from, in order of precedence
+
+    Returns
+    -------
+    List[str]
+        The k IDs with the largest values
+    """
+    keys = [f for f in dict.fromkeys(keys) if f is not None]
+    k = min(k, len(keys))
+    if k <= 0:
+        return []
+    values = np.full(len(keys), np.nan)
+    found = np.zeros(len(keys), dtype=bool)
+    for table in tables:
+        rows = table.rows_of(keys)
+        take = ~found & (rows >= 0)
+        values[take] = table.columns[name][rows[take]]
+        found |= take
+    # Negated so that the largest values come first, the missing values last
+    values = -values
+    values[np.isnan(values)] = np.inf
+
+    if k < len(keys):
+        # The k-th value splits the IDs, the IDs tied with it are taken in
+        # their order until there are k
+        kth_value = values[np.argpartition(values, k - 1)[k - 1]]
+        above = np.flatnonzero(values < kth_value)
+        tied = np.flatnonzero(values == kth_value)[: k - len(above)]
+        selected = np.sort(np.concatenate([above, tied]))
+    else:
+        selected = np.arange(len(keys))
+    selected = selected[np.argsort(values[selected], kind="stable")]
+    return [keys[f] for f in selected]
@@ -0,0 +1,332 @@
+import bisect
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Tuple
+
+import requests
+
+from http_client import NoCapacityError
+
+# Number of background threads fetching the neighbors of the served nodes
+PREFETCH_WORKERS = 2
+# Largest number of hops from a served node that are prefetched, e.g., 1 for the
+# references of a served paper and 2 for the references of the references
+PREFETCH_MAX_DEPTH = 2
+# Largest number of queued nodes, the nodes with the lowest priority are
+# dropped when the queue is full
+PREFETCH_MAX_QUEUE = 500
+# Largest number of papers fetched together through the batch endpoint
+PREFETCH_BATCH_SIZE = 100
+# Largest number of neighbors of a node of each kind (references, citations,
+# authors, papers, coauthors) that are queued
+PREFETCH_FANOUT = 20
+# Number of seconds a worker waits when the rate limiter has no spare capacity
+PREFETCH_BUDGET_WAIT = 0.5
+# Largest number of prefetched nodes remembered until they are served, the
+# least recently prefetched nodes are forgotten first
+PREFETCH_MAX_TRACKED = 10000
+
+PAPER = "paper"
+AUTHOR = "author"
+
+
+class Prefetcher:
+    def __init__(
+        self,
+        semsch_tree,
+        author_tree,
+        workers: int = PREFETCH_WORKERS,
+        max_depth: int = PREFETCH_MAX_DEPTH,
+        max_queue: int = PREFETCH_MAX_QUEUE,
+        fanout: int = PREFETCH_FANOUT,
+        max_tracked: int = PREFETCH_MAX_TRACKED,
+    ):
+        """A background prefetcher of the paper and author graph. After a paper
+        or an author is served, its neighbors (references, top citations,
+        authors, papers and coauthors) are queued and fetched by a small pool of
+        worker threads, so that the next click of the user is likely a cache
+        hit. Nodes closer to the served node are fetched first, nodes further
+        than max_depth hops are never queued, and the workers send their
+        requests inside HttpClient.spare_capacity, i.e., only when the rate
+        limiter of the API has a free slot right away, so prefetching never
+        delays the requests of the users
+
+        Parameters
+        ----------
+        semsch_tree : SemSchTree
+            Tree of the semantic scholar papers
+        author_tree : AuthorTree
+            Tree of the semantic scholar authors
+        workers : int, optional
+            Number of worker threads, by default PREFETCH_WORKERS
+        max_depth : int, optional
+            Largest number of hops from a served node, by default
+            PREFETCH_MAX_DEPTH
+        max_queue : int, optional
+            Largest number of queued nodes, by default PREFETCH_MAX_QUEUE
+        fanout : int, optional
+            Largest number of neighbors of each kind queued per node, by default
+            PREFETCH_FANOUT
+        max_tracked : int, optional
+            Largest number of prefetched nodes remembered until they are
+            served, by default PREFETCH_MAX_TRACKED
+        """
+        self.semsch_tree = semsch_tree
+        self.author_tree = author_tree
+        self.workers = workers
+        self.max_depth = max_depth
+        self.max_queue = max_queue
+        self.fanout = fanout
+        self.max_tracked = max_tracked
+        semsch_tree.prefetcher = self
+        author_tree.prefetcher = self
+
+        # Queued nodes as (priority, kind, ID, depth) sorted by priority, where
+        # a smaller priority is fetched first
+        self._queue = []
+        self._queued = set()
+        self._cond = threading.Condition()
+        self._seeds = itertools.count()
+        self._threads = []
+        self._stopped = False
+
+        # Nodes that were fetched by the prefetcher and not yet served, in the
+        # order they were fetched and at most max_tracked of them
+        self.prefetched = OrderedDict()
+        self.stats = {
+            "lookups": 0,
+            "hits": 0,
+            "misses": 0,
+            "queued": 0,
+            "dropped": 0,
+            "fetched": 0,
+            "deferred": 0,
+            "errors": 0,
+        }
+
+    def start(self) -> "Prefetcher":
+        """The function starts the worker threads"""
+        with self._cond:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._work_loop,
+                    name=f"prefetch-worker-{len(self._threads)}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def stop(self) -> None:
+        """The function stops the worker threads once their current fetch is
+        done, the queued nodes are discarded
+        """
+        with self._cond:
+            self._stopped = True
+            self._queue.clear()
+            self._queued.clear()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def record_lookup(self, kind: str, node_id: str, cached: bool) -> None:
+        """The function counts a node served to the user as a hit if it was
+        fetched by the prefetcher and is still cached and as a miss if it had
+        to be fetched on demand. Nodes that were already cached for another
+        reason count as neither
+
+        Parameters
+        ----------
+        kind : str
+            PAPER or AUTHOR
+        node_id : str
+            ID of the node
+        cached : bool
+            True if the node was in the cache when the user requested it
+        """
+        with self._cond:
+            self.stats["lookups"] += 1
+            # A prefetched node that the tree evicted before it was served is a
+            # miss
+            prefetched = self.prefetched.pop((kind, node_id), False)
+            if prefetched and cached:
+                self.stats["hits"] += 1
+            elif not cached:
+                self.stats["misses"] += 1
+
+    def schedule_paper(self, paper) -> None:
+        """The function queues the neighbors of a paper served to the user"""
+        self._schedule_neighbors(PAPER, paper, 0, next(self._seeds))
+
+    def schedule_author(self, author) -> None:
+        """The function queues the neighbors of an author served to the user"""
+        self._schedule_neighbors(AUTHOR, author, 0, next(self._seeds))
+
+    def neighbors(self, kind: str, record) -> List[Tuple[str, str]]:
+        """The function returns the neighbors of a paper or an author in the
+        order they are prefetched
+
+        Parameters
+        ----------
+        kind : str
+            PAPER or AUTHOR
+        record : Union[SemSchPaper, Authors]
+            Paper or author
+
+        Returns
+        -------
+        List[Tuple[str, str]]
+            Kind and ID of every neighbor
+        """
+        if kind == PAPER:
+            references = (record.references or ())[: self.fanout]
+            citations = (record.citations or ())[: self.fanout]
+            authors = [f.get("authorId") for f in record.authors or () if isinstance(f, dict)]
+            groups = [
+                [(PAPER, f) for f in references],
+                [(PAPER, f) for f in citations],
+                [(AUTHOR, f) for f in authors[: self.fanout]],
+            ]
+        else:
+            groups = [
+                [(PAPER, f) for f in (record.papers or ())[: self.fanout]],
+                [(AUTHOR, f) for f in (record.worked_with or ())[: self.fanout]],
+            ]
+        # Interleaving the groups so that every kind of neighbor gets fetched
+        # early
+        result = []
+        for group in itertools.zip_longest(*groups):
+            result.extend(f for f in group if f is not None and f[1] is not None)
+        return result
+
+    def _schedule_neighbors(self, kind: str, record, depth: int, seed: int) -> None:
+        if depth >= self.max_depth:
+            return
+        for rank, (neighbor_kind, neighbor_id) in enumerate(self.neighbors(kind, record)):
+            if self._is_cached(neighbor_kind, neighbor_id) and depth + 1 >= self.max_depth:
+                continue
+            # Closer nodes first, then the nodes of the latest served node, then
+            # the order of the neighbors
+            self._push((depth + 1, -seed, rank), neighbor_kind, neighbor_id, depth + 1)
+
+    def _push(self, priority: Tuple, kind: str, node_id: str, depth: int) -> None:
+        with self._cond:
+            if self._stopped or (kind, node_id) in self._queued:
+                return
+            item = (priority, kind, node_id, depth)
+            if len(self._queue) >= self.max_queue:
+                if item >= self._queue[-1]:
+                    self.stats["dropped"] += 1
+                    return
+                _, worst_kind, worst_id, _ = self._queue.pop()
+                self._queued.discard((worst_kind, worst_id))
+                self.stats["dropped"] += 1
+            bisect.insort(self._queue, item)
+            self._queued.add((kind, node_id))
+            self.stats["queued"] += 1
+            self._cond.notify()
+
+    def _pop_batch(self) -> List[Tuple]:
+        """Waits for queued nodes and returns the node with the highest priority
+        together with the other queued papers if it is a paper, so that they
+        share a batch request. Returns an empty list once stopped
+        """
+        with self._cond:
+            while not self._queue and not self._stopped:
+                self._cond.wait()
+            if self._stopped:
+                return []
+            first = self._queue.pop(0)
+            batch = [first]
+            if first[1] == PAPER:
+                rest = []
+                for item in self._queue:
+                    if item[1] == PAPER and len(batch) < PREFETCH_BATCH_SIZE:
+                        batch.append(item)
+                    else:
+                        rest.append(item)
+                self._queue = rest
+            for item in batch:
+                self._queued.discard((item[1], item[2]))
+            return batch
+
+    def _is_cached(self, kind: str, node_id: str) -> bool:
+        if kind == PAPER:
+            return node_id in self.semsch_tree.papers_dict
+        return node_id in self.author_tree.author_dict
+
+    def _work_loop(self) -> None:
+        while True:
+            batch = self._pop_batch()
+            if not batch:
+                return
+            # The prefetcher only uses the spare capacity of the API, the nodes
+            # that are not fetched yet are queued again until the rate limiter
+            # has a free slot
+            try:
+                with self.semsch_tree.client.spare_capacity():
+                    with self.author_tree.client.spare_capacity():
+                        self._fetch(batch)
+            except NoCapacityError:
+                with self._cond:
+                    self.stats["deferred"] += 1
+                for priority, kind, node_id, depth in batch:
+                    if not self._is_cached(kind, node_id):
+                        self._push(priority, kind, node_id, depth)
+                time.sleep(PREFETCH_BUDGET_WAIT)
+            except (requests.RequestException, ValueError, KeyError, TypeError):
+                with self._cond:
+                    self.stats["errors"] += 1
+
+    def _fetch(self, batch: List[Tuple]) -> None:
+        missing = [f for f in batch if not self._is_cached(f[1], f[2])]
+        kind = batch[0][1]
+        try:
+            if kind == PAPER:
+                self.semsch_tree.update_papers([f[2] for f in missing])
+                self.semsch_tree.write_cache()
+            else:
+                for _, _, node_id, _ in missing:
+                    self.author_tree.request_and_update(node_id)
+                self.author_tree.write_cache()
+        finally:
+            # Also counting the nodes fetched before a request of the batch
+            # failed or ran out of spare capacity
+            with self._cond:
+                for _, node_kind, node_id, _ in missing:
+                    if self._is_cached(node_kind, node_id):
+                        self.prefetched[(node_kind, node_id)] = True
+                        self.prefetched.move_to_end((node_kind, node_id))
+                        self.stats["fetched"] += 1
+                while len(self.prefetched) > self.max_tracked:
+                    self.prefetched.popitem(last=False)
+
+        # Queuing the neighbors of the fetched nodes up to max_depth hops away
+        for priority, node_kind, node_id, depth in batch:
+            if depth >= self.max_depth or not self._is_cached(node_kind, node_id):
+                continue
+            if node_kind == PAPER:
+                record = self.semsch_tree.papers_dict[node_id]
+            else:
+                record = self.author_tree.author_dict[node_id]
+            self._schedule_neighbors(node_kind, record, depth, -priority[1])
+
+    def get_stats(self) -> Dict[str, float]:
+        """The function returns the counters of the prefetcher together with the
+        hit rate, i.e., the share of the nodes served to the user that were not
+        cached before and were fetched by the prefetcher
+
+        Returns
+        -------
+        Dict[str, float]
+            Dictionary of the counters, the hit rate and the queue length
+        """
+        with self._cond:
+            stats = dict(self.stats)
+            stats["queue_length"] = len(self._queue)
+        served = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / served if served else 0.0
+        return stats
@@ -1,11 +1,55 @@
-import requests
-from typing import List, Dict
+import sys
+from typing import Any, List, Dict, Iterable, Tuple
 from data.secret_key import SemanticScholarCreds
+from http_client import HttpClient, get_client
 
 SEMSCH_LINK = "https://api.semanticscholar.org/graph/v1"
+# Note that older caches appended to the titles of the arxiv papers that are
+# not on semantic scholar. It is removed from the titles when they are loaded
+SEMSCH_MISSING_NOTE = " (Unfortunately, this paper is not available on semantic scholar so you can't explore it further) :/ "
 
 
-class Authors:
+def intern_id(value: Any) -> Any:
+    """Interns string IDs so that every record referring to the same paper or
+    author shares one string object
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def intern_ids(values: Iterable[Any]) -> Tuple:
+    """Returns the list of IDs as a tuple of interned strings, None stays None"""
+    if values is None:
+        return None
+    return tuple(intern_id(f) for f in values)
+
+
+class Record:
+    # The records only store the attributes listed in _fields inside their
+    # __slots__, which avoids a __dict__ per object. _fields is also the key
+    # order of the cache schema
+    __slots__ = ()
+    _fields = ()
+
+    def to_dict(self) -> Dict:
+        """Returns the record as a dictionary in the schema of the cache"""
+        return {f: getattr(self, f) for f in self._fields}
+
+
+class Authors(Record):
+    _fields = (
+        "id",
+        "name",
+        "homepage",
+        "paper_count",
+        "citations",
+        "hindex",
+        "papers",
+        "worked_with",
+    )
+    __slots__ = _fields
+
     def __init__(
         self,
         id: str=None,
@@ -21,26 +65,37 @@ class Authors:
 
         if cache_file is None:
 
-            self.id = id
+            self.id = intern_id(id)
             self.name = name
             self.homepage = homepage
             self.paper_count = paper_count
             self.citations = citations
             self.hindex = hindex
-            self.papers = papers
-            self.worked_with = worked_with
+            self.papers = intern_ids(papers)
+            self.worked_with = intern_ids(worked_with)
         else:
-            self.id = cache_file["id"]
+            self.id = intern_id(cache_file["id"])
             self.name = cache_file["name"]
             self.homepage = cache_file["homepage"]
             self.paper_count = cache_file["paper_count"]
             self.citations = cache_file["citations"]
             self.hindex = cache_file["hindex"]
-            self.papers = cache_file["papers"]
-            self.worked_with = cache_file["worked_with"]
+            self.papers = intern_ids(cache_file["papers"])
+            self.worked_with = intern_ids(cache_file["worked_with"])
+
 
+class Paper(Record):
+    _fields = (
+        "id",
+        "title",
+        "authors",
+        "abstract",
+        "arxiv_id",
+        "primary_category",
+        "secondary_category",
+    )
+    __slots__ = _fields
 
-class Paper:
     def __init__(
         self,
         id: str=None,
@@ -54,24 +109,26 @@ class Paper:
     ):
         if cache_file is None:
 
-            self.id = id
+            self.id = intern_id(id)
             self.title = title
-            self.authors = authors
+            self.authors = intern_ids(authors)
             self.abstract = abstract
-            self.arxiv_id = arxiv_id
-            self.primary_category = primary_category
-            self.secondary_category = secondary_category
+            self.arxiv_id = intern_id(arxiv_id)
+            self.primary_category = intern_ids(primary_category)
+            self.secondary_category = intern_ids(secondary_category)
         else:
-            self.id = cache_file["id"]
+            self.id = intern_id(cache_file["id"])
             self.title = cache_file["title"]
-            self.authors = cache_file["authors"]
+            self.authors = intern_ids(cache_file["authors"])
             self.abstract = cache_file["abstract"]
-            self.primary_category = cache_file["primary_category"]
-            self.secondary_category = cache_file["secondary_category"]
-            self.arxiv_id = cache_file["arxiv_id"]
+            self.primary_category = intern_ids(cache_file["primary_category"])
+            self.secondary_category = intern_ids(cache_file["secondary_category"])
+            self.arxiv_id = intern_id(cache_file["arxiv_id"])
 
 
 class ArxivPaper(Paper):
+    __slots__ = ()
+
     def __init__(
         self,
         id: str=None,
@@ -84,19 +141,36 @@ class ArxivPaper(Paper):
         cache_file: Dict=None,
     ):
         super().__init__(id, arxiv_id, title, authors, abstract, primary_category,secondary_category, cache_file)
-        
+        if self.title is not None and self.title.endswith(SEMSCH_MISSING_NOTE):
+            self.title = self.title[: -len(SEMSCH_MISSING_NOTE)]
 
-    def update_semsch_id(self):
+    def semsch_lookup_id(self) -> str:
+        """Returns the ID used to look up this paper on semantic scholar, i.e.,
+        the arxiv ID without the version prefixed with "arXiv:"
+        """
         arxiv_id = self.arxiv_id
         arxiv_id = arxiv_id.replace("abs/", "").split("v")[0]
-        url = f"{SEMSCH_LINK}/paper/arXiv:{arxiv_id}"
-        res = requests.get(url, headers={"x-api-key": SemanticScholarCreds.API_KEY})
-        response = res.json()
-        if response.get("paperId"):
-            self.id = res.json()["paperId"]
+        return f"arXiv:{arxiv_id}"
+
+    def set_semsch_id(self, paper_id: str=None):
+        # Papers that are not on semantic scholar have no ID, the templates
+        # tell the user that they cannot be explored further
+        if paper_id:
+            self.id = intern_id(paper_id)
         else:
             self.id = None
-            self.title = self.title + " (Unfortunately, this paper is not available on semantic scholar so you can't explore it further) :/ "
+
+    def update_semsch_id(self, api_link: str=SEMSCH_LINK, client: HttpClient=None) -> bool:
+        """Requests the semantic scholar ID of the paper. Returns False if
+        semantic scholar does not know the paper, True otherwise
+        """
+        if client is None:
+            client = get_client()
+        url = f"{api_link}/paper/{self.semsch_lookup_id()}"
+        res = client.get(url, headers={"x-api-key": SemanticScholarCreds.API_KEY})
+        response = res.json()
+        self.set_semsch_id(response.get("paperId"))
+        return res.status_code != 404
 
 
 class ArxivID:
@@ -105,6 +179,18 @@ class ArxivID:
 
 
 class SemSchPaper(Paper):
+    _fields = Paper._fields + (
+        "year",
+        "reference_count",
+        "citation_count",
+        "influential_paper_citations",
+        "is_open_access",
+        "citations",
+        "references",
+        "url",
+    )
+    __slots__ = _fields[len(Paper._fields) :]
+
     def __init__(
         self,
         id: str=None,
@@ -133,8 +219,8 @@ class SemSchPaper(Paper):
             self.citation_count = citation_count
             self.influential_paper_citations = influential_paper_citations
             self.is_open_access = is_open_access
-            self.citations = citations
-            self.references = references
+            self.citations = intern_ids(citations)
+            self.references = intern_ids(references)
             self.url = url
 
         else:
@@ -143,8 +229,8 @@ class SemSchPaper(Paper):
             self.citation_count = cache_file["citation_count"]
             self.influential_paper_citations = cache_file["influential_paper_citations"]
             self.is_open_access = cache_file["is_open_access"]
-            self.citations = cache_file["citations"]
-            self.references = cache_file["references"]
+            self.citations = intern_ids(cache_file["citations"])
+            self.references = intern_ids(cache_file["references"])
             self.url = cache_file["url"]
 
 
@@ -0,0 +1,149 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Union
+
+# Number of threads loading the neighbors of the explore pages
+JOB_WORKERS = 4
+# Number of seconds the records of a finished job are kept for polling
+JOB_TTL = 300
+
+
+class NeighborJob:
+    def __init__(self, job_id: str):
+        """The records loaded by a background job for one explore page. The
+        records are kept as a list of events, so every poll only returns the
+        events added since the previous poll
+
+        Parameters
+        ----------
+        job_id : str
+            ID of the job
+        """
+        self.job_id = job_id
+        self.events = []
+        self.done = False
+        self.error = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def emit(self, section: str, records: List[Dict], replace: bool = False) -> None:
+        """The function adds records to a section of the page, e.g.,
+        "references". With replace the records replace the whole section, e.g.,
+        to show the final ranking of the section once all of it is loaded
+
+        Parameters
+        ----------
+        section : str
+            Name of the section of the page
+        records : List[Dict]
+            Records of the section
+        replace : bool, optional
+            Replace the records of the section instead of appending to it, by
+            default False
+        """
+        if not records and not replace:
+            return
+        with self._lock:
+            self.events.append(
+                {"section": section, "records": records, "replace": replace}
+            )
+
+    def finish(self, error: str = None) -> None:
+        with self._lock:
+            self.done = True
+            self.error = error
+            self.finished_at = time.monotonic()
+
+    def poll(self, cursor: int = 0) -> Dict:
+        """The function returns the events added after the cursor
+
+        Parameters
+        ----------
+        cursor : int, optional
+            Number of events already received, by default 0
+
+        Returns
+        -------
+        Dict
+            The new events, the cursor for the next poll and whether the job is
+            done
+        """
+        with self._lock:
+            events = self.events[cursor:]
+            return {
+                "events": events,
+                "cursor": cursor + len(events),
+                "done": self.done,
+                "error": self.error,
+            }
+
+
+class NeighborJobs:
+    def __init__(self, workers: int = JOB_WORKERS, ttl: float = JOB_TTL):
+        """A registry of the background jobs that load the neighbors of the
+        explore pages. The explore pages are rendered with the cached neighbors
+        straight away and poll the registry for the rest
+
+        Parameters
+        ----------
+        workers : int, optional
+            Number of threads running the jobs, by default JOB_WORKERS
+        ttl : float, optional
+            Number of seconds a finished job is kept, by default JOB_TTL
+        """
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="neighbor-job"
+        )
+        self.jobs = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def submit(self, load: Callable[[Callable], None]) -> str:
+        """The function runs a loading function in the background. The function
+        gets the emit method of the job and calls it with the records as they
+        are loaded
+
+        Parameters
+        ----------
+        load : Callable[[Callable], None]
+            Loading function, e.g., lambda emit: tree.load_neighbors(ID, emit)
+
+        Returns
+        -------
+        str
+            ID of the job
+        """
+        self._expire()
+        with self._lock:
+            job = NeighborJob(f"{next(self._ids)}-{time.time_ns()}")
+            self.jobs[job.job_id] = job
+        self.executor.submit(self._run, job, load)
+        return job.job_id
+
+    def _run(self, job: NeighborJob, load: Callable[[Callable], None]) -> None:
+        try:
+            load(job.emit)
+        except Exception as e:
+            job.finish(error=str(e))
+        else:
+            job.finish()
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for job_id, job in list(self.jobs.items()):
+                if job.finished_at is not None and now - job.finished_at > self.ttl:
+                    del self.jobs[job_id]
+
+    def poll(self, job_id: str, cursor: int = 0) -> Union[Dict, None]:
+        """Returns the events of the job after the cursor, None if the job is
+        unknown or expired
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        return job.poll(cursor)
@@ -0,0 +1,224 @@
+import email.utils
+import threading
+import time
+from typing import Dict, Union
+
+# Default limits for the semantic scholar API. The scheduler starts at
+# SEMSCH_RATE requests per second and adapts between the minimum and maximum
+SEMSCH_RATE = 10.0
+SEMSCH_MIN_RATE = 0.5
+SEMSCH_MAX_RATE = 100.0
+SEMSCH_CONCURRENCY = 4
+SEMSCH_MAX_CONCURRENCY = 16
+# Arxiv asks for no more than one request every three seconds
+ARXIV_RATE = 1 / 3
+ARXIV_CONCURRENCY = 1
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        rate: float = SEMSCH_RATE,
+        min_rate: float = SEMSCH_MIN_RATE,
+        max_rate: float = SEMSCH_MAX_RATE,
+        burst: float = None,
+        concurrency: int = SEMSCH_CONCURRENCY,
+        max_concurrency: int = SEMSCH_MAX_CONCURRENCY,
+        decrease_factor: float = 0.5,
+    ):
+        """A token bucket request scheduler with additive increase and
+        multiplicative decrease (AIMD) of both the request rate and the number
+        of requests in flight. Every successful response slowly raises the
+        limits and a 429 response halves them and pauses the requests for the
+        duration given by the Retry-After header. The limits are halved at most
+        once per window, i.e., the 429 responses of the requests sent before
+        the latest decrease only extend the pause, so a burst of throttled
+        requests in flight does not collapse the rate
+
+        Parameters
+        ----------
+        rate : float, optional
+            Initial number of requests per second, by default SEMSCH_RATE
+        min_rate : float, optional
+            Lowest rate the scheduler backs off to, by default SEMSCH_MIN_RATE
+        max_rate : float, optional
+            Highest rate the scheduler ramps up to, by default SEMSCH_MAX_RATE
+        burst : float, optional
+            Size of the token bucket, by default the initial rate
+        concurrency : int, optional
+            Initial number of requests in flight, by default SEMSCH_CONCURRENCY
+        max_concurrency : int, optional
+            Highest number of requests in flight, by default
+            SEMSCH_MAX_CONCURRENCY
+        decrease_factor : float, optional
+            Factor applied to the limits on a 429 response, by default 0.5
+        """
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.max_rate = max(max_rate, rate)
+        self.burst = max(burst if burst is not None else rate, 1.0)
+        self.concurrency = concurrency
+        self.max_concurrency = max(max_concurrency, concurrency)
+        self.decrease_factor = decrease_factor
+
+        self._cond = threading.Condition()
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._in_flight = 0
+        self._successes = 0
+        # Ticket of the next request and first ticket sent after the latest
+        # multiplicative decrease
+        self._next_ticket = 1
+        self._decrease_ticket = 0
+
+        self.request_count = 0
+        self.throttled_count = 0
+        self.wait_time = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._last_refill) * self.rate
+        )
+        self._last_refill = now
+
+    def _wait_for(self, now: float) -> float:
+        """Returns the number of seconds to wait before the next request can be
+        sent, 0 if it can be sent right away. Must be called with the lock held
+        """
+        self._refill(now)
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._in_flight >= self.concurrency:
+            # Woken up by release()
+            return None
+        if self._tokens < 1.0:
+            return (1.0 - self._tokens) / self.rate
+        return 0.0
+
+    def _issue(self) -> int:
+        self._tokens -= 1.0
+        self._in_flight += 1
+        self.request_count += 1
+        ticket = self._next_ticket
+        self._next_ticket += 1
+        return ticket
+
+    def acquire(self) -> int:
+        """The function blocks until a request is allowed to be sent. Every call
+        must be followed by a call to self.release once the response arrives
+
+        Returns
+        -------
+        int
+            Ticket of the request, passed to self.release
+        """
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                wait = self._wait_for(time.monotonic())
+                if wait == 0.0:
+                    break
+                self._cond.wait(wait)
+            self.wait_time += time.monotonic() - start
+            return self._issue()
+
+    def try_acquire(self) -> Union[int, None]:
+        """Non blocking version of self.acquire. It is used by background work
+        that should only use the spare capacity of the API
+
+        Returns
+        -------
+        Union[int, None]
+            Ticket of the request if it is allowed to be sent now, None
+            otherwise
+        """
+        with self._cond:
+            if self._wait_for(time.monotonic()) != 0.0:
+                return None
+            return self._issue()
+
+    def release(
+        self, status_code: int = None, retry_after: str = None, ticket: int = None
+    ) -> None:
+        """The function records the response of a request sent after
+        self.acquire and adapts the limits to it
+
+        Parameters
+        ----------
+        status_code : int, optional
+            HTTP status code of the response, None if the request failed
+        retry_after : str, optional
+            Value of the Retry-After header of the response, if any
+        ticket : int, optional
+            Ticket returned by self.acquire, a 429 response without a ticket
+            always decreases the limits
+        """
+        with self._cond:
+            self._in_flight -= 1
+            if status_code == 429:
+                self.throttled_count += 1
+                self._successes = 0
+                if ticket is None or ticket >= self._decrease_ticket:
+                    self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                    self.concurrency = max(
+                        1, int(self.concurrency * self.decrease_factor)
+                    )
+                    self._decrease_ticket = self._next_ticket
+                self._tokens = min(self._tokens, 0.0)
+                pause = parse_retry_after(retry_after)
+                if pause is None:
+                    pause = 1.0 / self.rate
+                self._blocked_until = max(
+                    self._blocked_until, time.monotonic() + pause
+                )
+            elif status_code is not None and status_code < 400:
+                # Additive increase, i.e., roughly one more request per second
+                # and one more request in flight for every window of successful
+                # requests
+                self._successes += 1
+                self.rate = min(self.max_rate, self.rate + 1.0 / self.rate)
+                if self._successes >= self.concurrency:
+                    self._successes = 0
+                    self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+                self.burst = max(self.burst, min(self.rate, self.max_rate))
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        """Returns the current limits and the counters of the scheduler"""
+        with self._cond:
+            return {
+                "rate": self.rate,
+                "concurrency": self.concurrency,
+                "in_flight": self._in_flight,
+                "requests": self.request_count,
+                "throttled": self.throttled_count,
+                "wait_time": self.wait_time,
+            }
+
+
+def parse_retry_after(retry_after: Union[str, None]) -> Union[float, None]:
+    """The function parses the Retry-After header, which is either a number of
+    seconds or an HTTP date
+
+    Parameters
+    ----------
+    retry_after : Union[str, None]
+        Value of the Retry-After header
+
+    Returns
+    -------
+    Union[float, None]
+        Number of seconds to wait, None if the header is missing or invalid
+    """
+    if not retry_after:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_date = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_date.timestamp() - time.time(), 0.0)
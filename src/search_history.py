@@ -0,0 +1,287 @@
+import atexit
+import csv
+import io
+import os
+import queue
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # File locks are only available on Unix, where the app is deployed with
+    # several worker processes
+    fcntl = None
+
+# CSV file of the papers explored by the user
+PREV_SEARCHES = "../data/prev_searches.csv"
+# Columns of the CSV file, one row per explored paper
+HISTORY_COLUMNS = [
+    "paper_id",
+    "Title",
+    "citation_count",
+    "reference_count",
+    "influencial_citations_count",
+]
+# Number of seconds the writer waits for more rows before appending the
+# buffered rows to the file
+FLUSH_INTERVAL = 1.0
+# Largest number of rows appended to the file in one write
+MAX_BUFFERED_ROWS = 100
+
+
+class SearchHistory:
+    # Shared histories keyed by the path of their CSV file
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(
+        self,
+        csv_pth: str = PREV_SEARCHES,
+        flush_interval: float = FLUSH_INTERVAL,
+        max_buffered_rows: int = MAX_BUFFERED_ROWS,
+    ):
+        """An append-only log of the papers explored by the user. The rows are
+        buffered and appended to the CSV file by a background thread, so the
+        explore requests never read or rewrite the file. The reader keeps the
+        byte offset of every row and the view count of every paper, and only
+        parses the rows that were appended since the last read
+
+        Parameters
+        ----------
+        csv_pth : str, optional
+            Path of the CSV file, by default PREV_SEARCHES
+        flush_interval : float, optional
+            Number of seconds the writer waits for more rows, by default
+            FLUSH_INTERVAL
+        max_buffered_rows : int, optional
+            Largest number of rows appended in one write, by default
+            MAX_BUFFERED_ROWS
+        """
+        self.csv_pth = csv_pth
+        self.flush_interval = flush_interval
+        self.max_buffered_rows = max_buffered_rows
+        self.pending = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._closed = False
+
+        # Index of the rows of the file, built incrementally by self.refresh
+        self._index_lock = threading.Lock()
+        self.indexed_size = 0
+        self.row_offsets = []
+        self.view_counts = Counter()
+        # Offset of the latest row of every paper
+        self.latest_offsets = {}
+
+    @classmethod
+    def open(cls, csv_pth: str = PREV_SEARCHES) -> "SearchHistory":
+        """Returns the history shared by all the users of the given CSV file,
+        creating it on first use
+        """
+        csv_pth = os.path.abspath(csv_pth)
+        with cls._instances_lock:
+            history = cls._instances.get(csv_pth)
+            if history is None:
+                history = cls(csv_pth)
+                cls._instances[csv_pth] = history
+            return history
+
+    def record(self, paper) -> None:
+        """The function queues a row for the explored paper and returns
+        immediately, the row is appended to the file by the writer thread
+
+        Parameters
+        ----------
+        paper : SemSchPaper
+            Paper explored by the user
+        """
+        row = [
+            paper.id,
+            paper.title,
+            paper.citation_count,
+            paper.reference_count,
+            paper.influential_paper_citations,
+        ]
+        with self._writer_lock:
+            if self._closed:
+                # The writer is gone, e.g., at interpreter exit
+                self.append_rows([row])
+                return
+            self.pending.put(row)
+            self._start_writer()
+
+    def _start_writer(self) -> None:
+        if self._writer is None:
+            self._writer = threading.Thread(
+                target=self._write_loop, name="search-history-writer", daemon=True
+            )
+            self._writer.start()
+            atexit.register(self.close)
+
+    def _write_loop(self) -> None:
+        while True:
+            row = self.pending.get()
+            if row is None:
+                self.pending.task_done()
+                return
+            rows = [row]
+            stop = False
+            # Waiting a little for more rows so that they are appended together
+            while len(rows) < self.max_buffered_rows:
+                try:
+                    row = self.pending.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    break
+                if row is None:
+                    stop = True
+                    break
+                rows.append(row)
+            try:
+                self.append_rows(rows)
+            except OSError:
+                # A failed write loses the buffered rows but not the writer
+                pass
+            for _ in range(len(rows) + int(stop)):
+                self.pending.task_done()
+            if stop:
+                return
+
+    def append_rows(self, rows: List[List]) -> None:
+        """The function appends the given rows to the CSV file in a single
+        write, adding the header if the file is new. The file is locked during
+        the write, so the rows of several processes sharing the file are never
+        interleaved
+
+        Parameters
+        ----------
+        rows : List[List]
+            Rows in the order of HISTORY_COLUMNS
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        for row in rows:
+            # Every row is kept on a single line so that it can be indexed by
+            # its byte offset
+            writer.writerow(
+                ["" if f is None else " ".join(str(f).splitlines()) for f in row]
+            )
+        with open(self.csv_pth, "a", encoding="utf-8", newline="") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                # The header is written under the lock, so only one process
+                # writes it to a new file
+                if f.seek(0, os.SEEK_END) == 0:
+                    f.write(",".join(HISTORY_COLUMNS) + "\n")
+                f.write(buffer.getvalue())
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def flush(self) -> None:
+        """The function waits until all the queued rows are in the file"""
+        self.pending.join()
+
+    def close(self) -> None:
+        """The function writes the queued rows and stops the writer thread"""
+        with self._writer_lock:
+            if self._closed:
+                return
+            self._closed = True
+            writer = self._writer
+        if writer is not None:
+            self.pending.put(None)
+            writer.join()
+
+    def refresh(self) -> None:
+        """The function indexes the rows that were appended to the file since
+        the last call. Only the new bytes of the file are read. It does not
+        wait for the writer thread, the rows that are still queued are indexed
+        by a later call once they are written
+        """
+        with self._index_lock:
+            if not os.path.exists(self.csv_pth):
+                return
+            with open(self.csv_pth, "rb") as f:
+                f.seek(self.indexed_size)
+                offset = self.indexed_size
+                for line in f:
+                    # A row without its line end is still being written
+                    if not line.endswith(b"\n"):
+                        break
+                    if offset > 0:
+                        paper_id = line.split(b",", 1)[0].decode("utf-8").strip('"')
+                        self.row_offsets.append(offset)
+                        self.view_counts[paper_id] += 1
+                        self.latest_offsets[paper_id] = offset
+                    offset += len(line)
+                self.indexed_size = offset
+
+    def read_row(self, offset: int) -> Dict[str, str]:
+        """Returns the row starting at the given byte offset of the file"""
+        with open(self.csv_pth, "rb") as f:
+            f.seek(offset)
+            line = f.readline().decode("utf-8")
+        return dict(zip(HISTORY_COLUMNS, next(csv.reader([line]))))
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self.row_offsets)
+
+    def page(
+        self, page_idx: int = 0, page_size: int = 50, newest_first: bool = True
+    ) -> Tuple[List[Dict[str, str]], int]:
+        """The function returns one page of the history. Only the rows of the
+        page are read from the file
+
+        Parameters
+        ----------
+        page_idx : int, optional
+            Index of the page, by default 0
+        page_size : int, optional
+            Number of rows per page, by default 50
+        newest_first : bool, optional
+            Start from the latest explored paper, by default True
+
+        Returns
+        -------
+        Tuple[List[Dict[str, str]], int]
+            Rows of the page keyed by HISTORY_COLUMNS and the total number of
+            rows
+        """
+        self.refresh()
+        with self._index_lock:
+            offsets = self.row_offsets
+            if newest_first:
+                offsets = offsets[::-1]
+            offsets = offsets[page_idx * page_size : (page_idx + 1) * page_size]
+            total = len(self.row_offsets)
+        return [self.read_row(f) for f in offsets], total
+
+    def most_viewed(self, k: int = 10) -> List[Dict[str, str]]:
+        """The function returns the k papers explored the most often, with the
+        details of their latest row and their number of views under "views"
+
+        Parameters
+        ----------
+        k : int, optional
+            Number of papers, by default 10
+
+        Returns
+        -------
+        List[Dict[str, str]]
+            Rows of the most viewed papers, the most viewed first
+        """
+        self.refresh()
+        with self._index_lock:
+            top_papers = self.view_counts.most_common(k)
+            offsets = [self.latest_offsets[f] for f, _ in top_papers]
+        records = []
+        for (_, views), offset in zip(top_papers, offsets):
+            record = self.read_row(offset)
+            record["views"] = views
+            records.append(record)
+        return records
@@ -0,0 +1,440 @@
+from collections import Counter, defaultdict
+from typing import Hashable, Iterable, List, Set
+
+import numpy as np
+
+import utils
+
+# Length of the character n-grams used by the title index
+GRAM_SIZE = 3
+
+
+def char_ngrams(text: str, gram_size: int = GRAM_SIZE) -> Counter:
+    """Returns the multiset of character n-grams of the given text"""
+    return Counter(text[i : i + gram_size] for i in range(len(text) - gram_size + 1))
+
+
+def bag_distance(chars1: Counter, chars2: Counter) -> int:
+    """Returns the bag distance of two strings given the multisets of their
+    characters. It is a lower bound of their edit distance, since one edit adds
+    or removes at most one character on each side
+    """
+    return max(sum((chars1 - chars2).values()), sum((chars2 - chars1).values()))
+
+
+class TrigramIndex:
+    def __init__(self, gram_size: int = GRAM_SIZE):
+        """An inverted index from character n-grams to the documents that
+        contain them, used for fuzzy title search. The index is updated
+        incrementally with self.add and generates candidates for a query by the
+        number of n-grams they share with it before any edit distance is
+        computed.
+
+        A string within edit distance k of another string shares at least
+        max(len1, len2) - gram_size + 1 - k * gram_size n-grams with it, since
+        one edit destroys at most gram_size n-grams. Documents short enough for
+        this bound to be zero can not be pruned by n-grams and are found
+        through their length instead. Every candidate is then checked against
+        the bag distance of the characters before the edit distance is
+        computed.
+
+        Note that the n-gram bound only prunes when k is small compared with
+        the length of the strings, e.g., for the author names. For the title
+        search of ArxivTree (k = 29) it is zero for every title shorter than
+        about 90 characters, and no exact filter tried on the cached titles,
+        n-grams of any length or pieces of the query, prunes much more than
+        the bag distance at that threshold. A title search is therefore a scan
+        of the titles of a similar length, narrowed by the bag distance, whose
+        edit distances are computed with the bit-parallel algorithm of
+        utils.lev_dist_bit_parallel.
+
+        Parameters
+        ----------
+        gram_size : int, optional
+            Length of the character n-grams, by default GRAM_SIZE
+        """
+        self.gram_size = gram_size
+        self.postings = defaultdict(dict)
+        self.length_buckets = defaultdict(set)
+        self.doc_grams = {}
+        self.doc_chars = {}
+        self.doc_text = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_text)
+
+    def add(self, doc_id: Hashable, text: str) -> None:
+        """The function adds a document to the index, replacing the previous
+        text of the document if it is already indexed
+
+        Parameters
+        ----------
+        doc_id : Hashable
+            ID of the document
+        text : str
+            Text of the document
+        """
+        if doc_id in self.doc_text:
+            self.remove(doc_id)
+        if text is None:
+            return
+        grams = char_ngrams(text, self.gram_size)
+        for gram, count in grams.items():
+            self.postings[gram][doc_id] = count
+        self.doc_grams[doc_id] = grams
+        self.doc_chars[doc_id] = Counter(text)
+        self.doc_text[doc_id] = text
+        self.length_buckets[len(text)].add(doc_id)
+
+    def remove(self, doc_id: Hashable) -> None:
+        """The function removes a document from the index"""
+        text = self.doc_text.pop(doc_id, None)
+        if text is None:
+            return
+        del self.doc_chars[doc_id]
+        for gram in self.doc_grams.pop(doc_id):
+            postings = self.postings[gram]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[gram]
+        self.length_buckets[len(text)].discard(doc_id)
+
+    def min_shared_grams(self, len1: int, len2: int, max_dist: int) -> int:
+        """Returns the least number of n-grams that two strings of the given
+        lengths share if their edit distance is at most max_dist
+        """
+        return max(len1, len2) - self.gram_size + 1 - max_dist * self.gram_size
+
+    def candidates(self, query: str, max_dist: int) -> Set[Hashable]:
+        """The function returns the documents that can be within max_dist edits
+        of the query. The result is a superset of the matching documents
+
+        Parameters
+        ----------
+        query : str
+            Query text
+        max_dist : int
+            Largest edit distance of interest
+
+        Returns
+        -------
+        Set[Hashable]
+            IDs of the candidate documents
+        """
+        len_query = len(query)
+        candidate_ids = set()
+
+        # Counting the n-grams shared with the query, taking the multiplicity of
+        # every n-gram into account. The postings are skipped when the bound is
+        # zero for every length close enough to the query
+        shared = defaultdict(int)
+        if self.min_shared_grams(len_query, len_query + max_dist, max_dist) <= 0:
+            query_grams = {}
+        else:
+            query_grams = char_ngrams(query, self.gram_size)
+        for gram, count in query_grams.items():
+            for doc_id, doc_count in self.postings.get(gram, {}).items():
+                shared[doc_id] += min(count, doc_count)
+        for doc_id, shared_cnt in shared.items():
+            len_doc = len(self.doc_text[doc_id])
+            if abs(len_doc - len_query) > max_dist:
+                continue
+            if shared_cnt >= self.min_shared_grams(len_query, len_doc, max_dist):
+                candidate_ids.add(doc_id)
+
+        # Documents for which the n-gram bound is zero are candidates as long as
+        # their length is close enough to the query
+        for len_doc in range(max(len_query - max_dist, 0), len_query + max_dist + 1):
+            if self.min_shared_grams(len_query, len_doc, max_dist) <= 0:
+                candidate_ids.update(self.length_buckets.get(len_doc, ()))
+        return candidate_ids
+
+    def search(self, query: str, threshold: int) -> List[Hashable]:
+        """The function returns the documents whose edit distance to the query
+        is strictly smaller than the threshold
+
+        Parameters
+        ----------
+        query : str
+            Query text
+        threshold : int
+            Edit distance threshold
+
+        Returns
+        -------
+        List[Hashable]
+            Sorted IDs of the matching documents
+        """
+        if threshold <= 0:
+            return []
+        candidate_ids = self.candidates(query, threshold - 1)
+        query_chars = Counter(query)
+        return sorted(
+            f
+            for f in candidate_ids
+            if bag_distance(self.doc_chars[f], query_chars) < threshold
+            and utils.lev_dist_below(self.doc_text[f], query, threshold)
+        )
+
+
+def parse_keyword_query(query: str) -> List[List[str]]:
+    """The function parses a keyword query into a list of clauses. A document
+    matches the query if it contains all the terms of at least one clause.
+    Terms joined by "AND" belong to the same clause, while terms separated by
+    "OR" or only by spaces start a new clause, e.g., "graph AND neural OR
+    transformer" gives [["graph", "neural"], ["transformer"]]
+
+    Parameters
+    ----------
+    query : str
+        Keyword query
+
+    Returns
+    -------
+    List[List[str]]
+        List of clauses, each a list of lower case terms
+    """
+    clauses = []
+    join_next = False
+    for word in query.split(" "):
+        if not word:
+            continue
+        if word == "AND":
+            join_next = bool(clauses)
+            continue
+        if word == "OR":
+            join_next = False
+            continue
+        if join_next:
+            clauses[-1].append(word.lower())
+        else:
+            clauses.append([word.lower()])
+        join_next = False
+    return clauses
+
+
+class TokenIndex:
+    def __init__(self):
+        """An inverted index from lower case tokens to the documents that
+        contain them, used for keyword search over abstracts. Each document is
+        tokenized once when it is added and the keyword queries are answered by
+        intersecting and merging the posting lists of their terms
+        """
+        self.postings = defaultdict(set)
+        self.doc_tokens = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_tokens)
+
+    def add(self, doc_id: Hashable, text: str) -> None:
+        """The function adds a document to the index, replacing the previous
+        text of the document if it is already indexed
+
+        Parameters
+        ----------
+        doc_id : Hashable
+            ID of the document
+        text : str
+            Text of the document
+        """
+        if doc_id in self.doc_tokens:
+            self.remove(doc_id)
+        if text is None:
+            return
+        tokens = frozenset(utils.tokenize(text))
+        for token in tokens:
+            self.postings[token].add(doc_id)
+        self.doc_tokens[doc_id] = tokens
+
+    def remove(self, doc_id: Hashable) -> None:
+        """The function removes a document from the index"""
+        for token in self.doc_tokens.pop(doc_id, ()):
+            postings = self.postings[token]
+            postings.discard(doc_id)
+            if not postings:
+                del self.postings[token]
+
+    def search_all(self, terms: Iterable[str]) -> Set[Hashable]:
+        """Returns the documents that contain all the given terms"""
+        postings = [self.postings.get(f, set()) for f in set(terms)]
+        if not postings:
+            return set()
+        # Intersecting the shortest posting lists first
+        postings = sorted(postings, key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result &= posting
+        return result
+
+    def search_any(self, terms: Iterable[str]) -> Set[Hashable]:
+        """Returns the documents that contain at least one of the given terms"""
+        result = set()
+        for term in set(terms):
+            result |= self.postings.get(term, set())
+        return result
+
+    def search(self, query: str) -> List[Hashable]:
+        """The function answers a keyword query as parsed by
+        parse_keyword_query, i.e., terms separated by spaces or "OR" are
+        alternatives and terms joined by "AND" must all be present
+
+        Parameters
+        ----------
+        query : str
+            Keyword query
+
+        Returns
+        -------
+        List[Hashable]
+            Sorted IDs of the matching documents
+        """
+        result = set()
+        for clause in parse_keyword_query(query):
+            result |= self.search_all(clause)
+        return sorted(result)
+
+
+def normalize_name(name: str) -> str:
+    """Normalizes an author name by lower casing it and collapsing the
+    whitespace, e.g., "Ashish  Vaswani" and "ashish vaswani" are the same name
+    """
+    return " ".join(name.split()).casefold()
+
+
+class AuthorIndex:
+    def __init__(self):
+        """An index from normalized author names to the documents written by
+        them, used for author search. The distinct names are kept in a
+        TrigramIndex so that an edit distance lookup only computes the distance
+        to the few names that share enough trigrams with the query or are short
+        enough to be close to it
+        """
+        self.name_docs = defaultdict(set)
+        self.doc_names = {}
+        self.name_index = TrigramIndex()
+
+    def __len__(self) -> int:
+        return len(self.doc_names)
+
+    def add(self, doc_id: Hashable, names: Iterable[str]) -> None:
+        """The function adds the authors of a document to the index, replacing
+        the previous authors of the document if it is already indexed
+
+        Parameters
+        ----------
+        doc_id : Hashable
+            ID of the document
+        names : Iterable[str]
+            Author names of the document
+        """
+        if doc_id in self.doc_names:
+            self.remove(doc_id)
+        if names is None:
+            return
+        norm_names = frozenset(normalize_name(f) for f in names if f is not None)
+        for name in norm_names:
+            if name not in self.name_docs:
+                self.name_index.add(name, name)
+            self.name_docs[name].add(doc_id)
+        self.doc_names[doc_id] = norm_names
+
+    def remove(self, doc_id: Hashable) -> None:
+        """The function removes a document from the index"""
+        for name in self.doc_names.pop(doc_id, ()):
+            docs = self.name_docs[name]
+            docs.discard(doc_id)
+            if not docs:
+                del self.name_docs[name]
+                self.name_index.remove(name)
+
+    def search(self, query: str, threshold: int) -> List[Hashable]:
+        """The function returns the documents with an author whose normalized
+        name is strictly less than threshold edits away from the normalized
+        query
+
+        Parameters
+        ----------
+        query : str
+            Author name
+        threshold : int
+            Edit distance threshold
+
+        Returns
+        -------
+        List[Hashable]
+            Sorted IDs of the matching documents
+        """
+        result = set()
+        for name in self.name_index.search(normalize_name(query), threshold):
+            result |= self.name_docs.get(name, set())
+        return sorted(result)
+
+
+class CategoryIndex:
+    def __init__(self):
+        """An index from categories to bitmaps over the positions of the
+        documents, used for category browsing. Bitmaps of several categories are
+        combined with bitwise AND/OR and only the positions of the set bits are
+        materialized
+        """
+        self.bitmaps = {}
+        self.doc_categories = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_categories)
+
+    def _set_bit(self, category: str, doc_pos: int, value: bool) -> None:
+        bitmap = self.bitmaps.setdefault(category, bytearray())
+        byte_idx = doc_pos >> 3
+        if byte_idx >= len(bitmap):
+            if not value:
+                return
+            bitmap.extend(bytes(byte_idx + 1 - len(bitmap)))
+        if value:
+            bitmap[byte_idx] |= 1 << (doc_pos & 7)
+        else:
+            bitmap[byte_idx] &= ~(1 << (doc_pos & 7)) & 0xFF
+
+    def add(self, doc_pos: int, categories: Iterable[str]) -> None:
+        """The function adds the categories of a document to the index,
+        replacing the previous categories of the document if it is already
+        indexed
+
+        Parameters
+        ----------
+        doc_pos : int
+            Position of the document
+        categories : Iterable[str]
+            Categories of the document
+        """
+        if doc_pos in self.doc_categories:
+            self.remove(doc_pos)
+        if categories is None:
+            return
+        doc_categories = frozenset(categories)
+        for category in doc_categories:
+            self._set_bit(category, doc_pos, True)
+        self.doc_categories[doc_pos] = doc_categories
+
+    def remove(self, doc_pos: int) -> None:
+        """The function removes a document from the index"""
+        for category in self.doc_categories.pop(doc_pos, ()):
+            self._set_bit(category, doc_pos, False)
+
+    def bitmap(self, category: str) -> int:
+        """Returns the bitmap of the category as an integer whose bit i is set
+        if the document at position i belongs to the category
+        """
+        return int.from_bytes(self.bitmaps.get(category, b""), "little")
+
+    @staticmethod
+    def positions(bitmap: int) -> List[int]:
+        """Returns the sorted positions of the set bits of the bitmap"""
+        if bitmap <= 0:
+            return []
+        bitmap_bytes = np.frombuffer(
+            bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little"), dtype=np.uint8
+        )
+        return np.flatnonzero(np.unpackbits(bitmap_bytes, bitorder="little")).tolist()
@@ -0,0 +1,144 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple, Type
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, retry_errors: Tuple[Type[BaseException], ...] = ()):
+        """Coalesces concurrent fetches of the same key, e.g., a paper ID. The
+        first caller of a key runs the fetch and the callers that arrive while
+        it is in flight wait for it and share its result instead of sending
+        their own request
+
+        Parameters
+        ----------
+        retry_errors : Tuple[Type[BaseException], ...], optional
+            Exceptions that only concern the caller whose fetch raised them,
+            e.g., the NoCapacityError of a caller that only uses the spare
+            capacity of the API. The callers waiting for such a fetch run the
+            fetch themselves instead of sharing the exception, by default ()
+        """
+        self.retry_errors = retry_errors
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.call_count = 0
+        self.shared_count = 0
+
+    def do(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """The function runs fetch unless a fetch of the same key is already in
+        flight, in which case it waits for that fetch and returns its result or
+        raises its exception. If that fetch raised one of self.retry_errors,
+        the function runs fetch itself
+
+        Parameters
+        ----------
+        key : Hashable
+            Key of the fetch
+        fetch : Callable[[], Any]
+            Function fetching the key
+
+        Returns
+        -------
+        Any
+            Result of the fetch
+        """
+        while True:
+            with self._lock:
+                self.call_count += 1
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    self._calls[key] = call
+                else:
+                    self.shared_count += 1
+            if leader:
+                break
+
+            call.event.wait()
+            if isinstance(call.error, self.retry_errors):
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fetch()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def do_many(self, keys: Iterable[Hashable], fetch: Callable[[List[Hashable]], Any]) -> None:
+        """The function fetches many keys at once, e.g., through a batch
+        endpoint. It calls fetch with the keys that are not in flight yet and
+        then waits for the keys that other callers are fetching. Failures of
+        the fetches of other callers are not raised, their keys are simply not
+        fetched, except for the keys whose fetch raised one of
+        self.retry_errors, which are fetched again
+
+        Parameters
+        ----------
+        keys : Iterable[Hashable]
+            Keys to fetch
+        fetch : Callable[[List[Hashable]], Any]
+            Function fetching a list of keys
+        """
+        own_calls = {}
+        other_calls = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                self.call_count += 1
+                call = self._calls.get(key)
+                if call is None:
+                    call = _Call()
+                    self._calls[key] = call
+                    own_calls[key] = call
+                else:
+                    self.shared_count += 1
+                    other_calls[key] = call
+
+        try:
+            if own_calls:
+                fetch(list(own_calls))
+        except BaseException as e:
+            for call in own_calls.values():
+                call.error = e
+            raise
+        finally:
+            with self._lock:
+                for key in own_calls:
+                    del self._calls[key]
+            for call in own_calls.values():
+                call.event.set()
+
+        retry_keys = []
+        for key, call in other_calls.items():
+            call.event.wait()
+            if isinstance(call.error, self.retry_errors):
+                retry_keys.append(key)
+        if retry_keys:
+            self.do_many(retry_keys, fetch)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Returns the number of fetches requested, the number of them that
+        shared a fetch already in flight and the number of fetches in flight
+        """
+        with self._lock:
+            return {
+                "calls": self.call_count,
+                "shared": self.shared_count,
+                "in_flight": len(self._calls),
+            }
@@ -0,0 +1,29 @@
+// Polls the neighbors of an explore page that are loaded in the background and
+// adds them to their section of the page as they arrive. The kind and the ID of
+// the explored node let another worker process answer from the shared cache
+var POLL_INTERVAL = 1000;
+
+
+function pollNeighbors(jobId, kind, nodeId, cursor) {
+    var params = new URLSearchParams({cursor: cursor, kind: kind, id: nodeId});
+    fetch(`/papers/neighbors/${jobId}?${params}`)
+        .then((response) => response.json())
+        .then((data) => {
+            data.events.forEach((event) => {
+                var section = document.getElementById(event.section);
+                if (section === null) {
+                    return;
+                }
+                if (event.replace) {
+                    section.innerHTML = "";
+                }
+                event.html.forEach((html) => section.insertAdjacentHTML("beforeend", html));
+            });
+            if (data.done) {
+                document.getElementById("neighbors_loading").remove();
+            } else {
+                setTimeout(() => pollNeighbors(jobId, kind, nodeId, data.cursor), POLL_INTERVAL);
+            }
+        })
+        .catch(() => setTimeout(() => pollNeighbors(jobId, kind, nodeId, cursor), POLL_INTERVAL));
+}
@@ -1,52 +1,169 @@
 from typing import List
 
-import numpy
+# Smallest bound of lev_dist_bounded for which the distance is computed with
+# the bit-parallel algorithm instead of the diagonal band, the band is faster
+# for small bounds since it stops early on distant strings
+BIT_PARALLEL_MIN_DIST = 10
 
 
-def lev_dist(token1, token2):
-    distances = numpy.zeros((len(token1) + 1, len(token2) + 1))
+def lev_dist_bit_parallel(token1: str, token2: str) -> int:
+    """The function computes the Levenshtein distance between two strings with
+    the bit-parallel algorithm of Myers, as formulated by Hyyro. A column of
+    the distance matrix is encoded as bit vectors of its vertical differences,
+    so every character of the longer string costs a constant number of
+    integer operations whatever the length of the shorter one.
+
+    Parameters
+    ----------
+    token1 : str
+        First string
+    token2 : str
+        Second string
+
+    Returns
+    -------
+    int
+        The Levenshtein distance
+    """
+    if len(token1) < len(token2):
+        token1, token2 = token2, token1
+    len2 = len(token2)
+    if len2 == 0:
+        return len(token1)
+
+    # Bit i of the mask of a character is set if token2[i] is that character
+    char_masks = {}
+    for pos, char in enumerate(token2):
+        char_masks[char] = char_masks.get(char, 0) | (1 << pos)
+    all_bits = (1 << len2) - 1
+    last_bit = 1 << (len2 - 1)
+
+    # Positive and negative vertical differences of the current column, and
+    # the distance of the last cell of the column
+    pos_vert = all_bits
+    neg_vert = 0
+    dist = len2
+    for char in token1:
+        eq = char_masks.get(char, 0)
+        x_vert = eq | neg_vert
+        x_horz = (((eq & pos_vert) + pos_vert) ^ pos_vert) | eq
+        pos_horz = neg_vert | (~(x_horz | pos_vert) & all_bits)
+        neg_horz = pos_vert & x_horz
+        if pos_horz & last_bit:
+            dist += 1
+        elif neg_horz & last_bit:
+            dist -= 1
+        # The first row of the matrix increases by one in every column
+        pos_horz = ((pos_horz << 1) | 1) & all_bits
+        neg_horz = (neg_horz << 1) & all_bits
+        pos_vert = neg_horz | (~(x_vert | pos_horz) & all_bits)
+        neg_vert = pos_horz & x_vert
+    return dist
+
+
+def lev_dist_bounded(token1: str, token2: str, max_dist: int) -> int:
+    """The function computes the Levenshtein distance between two strings as
+    long as it is at most max_dist. Only the diagonal band of width
+    2 * max_dist + 1 of the distance matrix is computed, using two rolling rows,
+    and the computation stops as soon as every value of a row exceeds max_dist.
+    Bounds of at least BIT_PARALLEL_MIN_DIST are computed with
+    lev_dist_bit_parallel instead, whose cost does not grow with the bound.
+
+    Parameters
+    ----------
+    token1 : str
+        First string
+    token2 : str
+        Second string
+    max_dist : int
+        Largest distance of interest
+
+    Returns
+    -------
+    int
+        The Levenshtein distance if it is at most max_dist, max_dist + 1
+        otherwise
+    """
+    len1 = len(token1)
+    len2 = len(token2)
+    over = max_dist + 1
+
+    # The distance is at least the difference between the lengths
+    if abs(len1 - len2) > max_dist:
+        return over
+    if token1 == token2:
+        return 0
+    if max_dist >= BIT_PARALLEL_MIN_DIST:
+        return min(lev_dist_bit_parallel(token1, token2), over)
 
-    for t1 in range(len(token1) + 1):
-        distances[t1][0] = t1
+    prev_row = [j if j <= max_dist else over for j in range(len2 + 1)]
+    curr_row = [over] * (len2 + 1)
 
-    for t2 in range(len(token2) + 1):
-        distances[0][t2] = t2
+    for t1 in range(1, len1 + 1):
+        low = max(1, t1 - max_dist)
+        high = min(len2, t1 + max_dist)
 
-    a = 0
-    b = 0
-    c = 0
+        # The cell left of the band is either the first column or outside of
+        # the band
+        if low == 1:
+            curr_row[0] = t1 if t1 <= max_dist else over
+        else:
+            curr_row[low - 1] = over
+        row_min = curr_row[low - 1]
 
-    for t1 in range(1, len(token1) + 1):
-        for t2 in range(1, len(token2) + 1):
-            if token1[t1 - 1] == token2[t2 - 1]:
-                distances[t1][t2] = distances[t1 - 1][t2 - 1]
+        char1 = token1[t1 - 1]
+        for t2 in range(low, high + 1):
+            if char1 == token2[t2 - 1]:
+                dist = prev_row[t2 - 1]
             else:
-                a = distances[t1][t2 - 1]
-                b = distances[t1 - 1][t2]
-                c = distances[t1 - 1][t2 - 1]
+                dist = 1 + min(prev_row[t2 - 1], prev_row[t2], curr_row[t2 - 1])
+                if dist > over:
+                    dist = over
+            curr_row[t2] = dist
+            if dist < row_min:
+                row_min = dist
 
-                if a <= b and a <= c:
-                    distances[t1][t2] = a + 1
-                elif b <= a and b <= c:
-                    distances[t1][t2] = b + 1
-                else:
-                    distances[t1][t2] = c + 1
+        # The cell right of the band is read by the next row
+        if high < len2:
+            curr_row[high + 1] = over
 
-    return distances[len(token1)][len(token2)]
+        if row_min > max_dist:
+            return over
+        prev_row, curr_row = curr_row, prev_row
+
+    return min(prev_row[len2], over)
+
+
+def lev_dist_below(token1: str, token2: str, threshold: int) -> bool:
+    """Returns True if the Levenshtein distance between the two strings is
+    strictly smaller than the threshold
+    """
+    if threshold <= 0:
+        return False
+    return lev_dist_bounded(token1, token2, threshold - 1) < threshold
+
+
+def lev_dist(token1, token2):
+    return float(lev_dist_bounded(token1, token2, max(len(token1), len(token2))))
 
 
 def arxiv_author_match(query_author: str, author_list: List[str]):
     for auth in author_list:
-        if lev_dist(query_author, auth) < 3:
+        if lev_dist_below(query_author, auth, 3):
             return True
     return False
 
 
+def tokenize(text: str) -> List[str]:
+    """Splits the text into lower case tokens on single spaces, skipping the
+    empty tokens
+    """
+    return [f.lower() for f in text.split(" ") if f]
+
+
 def arxiv_abstract_match(query_abstract, target_abstract):
-    list_query = query_abstract.split(" ")
-    list_target = target_abstract.split(" ")
-    list_query = [f.lower() for f in list_query]
-    list_target = [f.lower() for f in list_target]
+    list_query = tokenize(query_abstract)
+    list_target = tokenize(target_abstract)
 
     list_inter = list(set(list_query) & set(list_target))
     if bool(list_inter):
@@ -0,0 +1,27 @@
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "src"), ROOT, os.path.dirname(__file__)]
+
+# data/secret_key.py holds the API key of the user and is not part of the
+# repository. The tests only send requests to local stand-in servers, so an
+# empty key is used when it is missing
+try:
+    import data.secret_key  # noqa: F401
+except ImportError:
+    secret_key = types.ModuleType("data.secret_key")
+    secret_key.SemanticScholarCreds = type("SemanticScholarCreds", (), {"API_KEY": ""})
+    sys.modules["data.secret_key"] = secret_key
+
+from standin import StandinServer  # noqa: E402
+
+
+@pytest.fixture
+def standin():
+    server = StandinServer().start()
+    yield server
+    server.stop()
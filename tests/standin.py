@@ -0,0 +1,226 @@
+import threading
+import time
+import urllib.parse
+from typing import Dict, Iterator, List
+
+from flask import Flask, Response, jsonify, request
+from werkzeug.serving import make_server
+
+# Prefixes of the paper IDs the stand-in does not know, and of the IDs it
+# returns under another paper ID, as semantic scholar does for some papers
+MISSING_PREFIX = "missing"
+ALIAS_PREFIX = "alias"
+# Number of citations of every stand-in paper
+CITATION_COUNT = 15
+# Number of chunks and bytes per chunk of the body of the /stream endpoint
+STREAM_CHUNKS = 64
+STREAM_CHUNK_SIZE = 1024
+# Number of papers of every stand-in author, and number of results of every
+# stand-in arxiv search
+AUTHOR_PAPERS = 3
+ARXIV_RESULTS = 250
+
+
+def paper(paper_id: str) -> Dict:
+    """Returns the batch endpoint result of a stand-in paper. The paper has
+    one author, three references and CITATION_COUNT citations with increasing
+    influential citation counts
+    """
+    if paper_id.startswith(ALIAS_PREFIX):
+        paper_id = f"canonical-{paper_id}"
+    return {
+        "paperId": paper_id,
+        "title": f"Title of {paper_id}",
+        "authors": [{"authorId": f"author-{paper_id}", "name": f"Author {paper_id}"}],
+        "abstract": f"Abstract of {paper_id}",
+        "year": 2020,
+        "referenceCount": 3,
+        "citationCount": CITATION_COUNT,
+        "influentialCitationCount": 1,
+        "isOpenAccess": True,
+        "url": f"https://example.org/{paper_id}",
+        "references": [{"paperId": f"{paper_id}-ref{i}"} for i in range(3)]
+        + [{"paperId": None}],
+        "citations": [
+            {"paperId": f"{paper_id}-cit{i}", "influentialCitationCount": i}
+            for i in range(CITATION_COUNT)
+        ],
+    }
+
+
+def author(author_id: str) -> Dict:
+    """Returns the author endpoint result of a stand-in author. The author has
+    AUTHOR_PAPERS papers, each of them written with one coauthor
+    """
+    return {
+        "authorId": author_id,
+        "name": f"Name of {author_id}",
+        "affiliations": [],
+        "homepage": None,
+        "paperCount": AUTHOR_PAPERS,
+        "citationCount": CITATION_COUNT,
+        "hIndex": 1,
+        "papers": [
+            {
+                "paperId": f"{author_id}-paper{i}",
+                "title": f"Title of {author_id}-paper{i}",
+                "authors": [
+                    {"authorId": author_id},
+                    {"authorId": f"{author_id}-coauthor{i}"},
+                ],
+            }
+            for i in range(AUTHOR_PAPERS)
+        ],
+    }
+
+
+def arxiv_entry(position: int) -> str:
+    """Returns the Atom entry of the stand-in arxiv paper at a position of the
+    search results
+    """
+    return f"""
+  <entry>
+    <id>http://arxiv.org/abs/2101.{position:05d}v1</id>
+    <title>Arxiv paper {position}</title>
+    <summary>Abstract of arxiv paper {position}</summary>
+    <author><name>Author {position}</name></author>
+    <category term="cs.LG" />
+  </entry>"""
+
+
+def arxiv_feed(start: int, max_results: int, total: int) -> Iterator[bytes]:
+    """Yields the Atom feed of a page of the stand-in arxiv search, one entry
+    at a time
+    """
+    yield b'<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield b'<feed xmlns="http://www.w3.org/2005/Atom">'
+    for position in range(start, min(start + max_results, total)):
+        yield arxiv_entry(position).encode("utf-8")
+    yield b"\n</feed>\n"
+
+
+def create_app() -> Flask:
+    """Returns a Flask app standing in for the semantic scholar API. Every
+    request is appended to app.config["CALLS"] as (endpoint, payload). The
+    /throttled and the paper batch endpoints answer the next
+    app.config["THROTTLE"] requests with HTTP 429 and a Retry-After of
+    app.config["RETRY_AFTER"] seconds, after holding them for
+    app.config["THROTTLE_DELAY"] seconds. The /stream
+    endpoint streams STREAM_CHUNKS chunks of STREAM_CHUNK_SIZE bytes. The
+    /arxiv endpoint answers arxiv queries with app.config["ARXIV_RESULTS"]
+    results in total, and the paper batch endpoint answers with an error
+    object instead of a list while app.config["BATCH_ERROR"] is set
+    """
+    app = Flask("standin")
+    app.config["CALLS"] = []
+    app.config["THROTTLE"] = 0
+    app.config["RETRY_AFTER"] = "0"
+    app.config["THROTTLE_DELAY"] = 0.0
+    app.config["ARXIV_RESULTS"] = ARXIV_RESULTS
+    app.config["BATCH_ERROR"] = False
+    throttle_lock = threading.Lock()
+
+    def take_throttle() -> bool:
+        with throttle_lock:
+            throttle = app.config["THROTTLE"] > 0
+            app.config["THROTTLE"] -= throttle
+        if throttle:
+            time.sleep(app.config["THROTTLE_DELAY"])
+        return throttle
+
+    def too_many_requests() -> tuple:
+        return "Too Many Requests", 429, {"Retry-After": app.config["RETRY_AFTER"]}
+
+    @app.route("/throttled", methods=["GET"])
+    def throttled():
+        throttle = take_throttle()
+        app.config["CALLS"].append(("throttled", throttle))
+        if throttle:
+            return too_many_requests()
+        return jsonify({"ok": True})
+
+    @app.route("/stream", methods=["GET"])
+    def stream():
+        app.config["CALLS"].append(("stream", None))
+        return Response(b"x" * STREAM_CHUNK_SIZE for _ in range(STREAM_CHUNKS))
+
+    @app.route("/paper/batch", methods=["POST"])
+    def paper_batch():
+        paper_ids = request.get_json()["ids"]
+        app.config["CALLS"].append(("paper_batch", list(paper_ids)))
+        if take_throttle():
+            return too_many_requests()
+        if app.config["BATCH_ERROR"]:
+            return jsonify({"error": "Internal server error"})
+        return jsonify(
+            [None if f.startswith(MISSING_PREFIX) else paper(f) for f in paper_ids]
+        )
+
+    @app.route("/paper/<path:paper_id>", methods=["GET"])
+    def single_paper(paper_id):
+        app.config["CALLS"].append(("paper", paper_id))
+        if paper_id.split(":")[-1].startswith(MISSING_PREFIX):
+            return jsonify({"error": "Paper not found"}), 404
+        return jsonify(paper(paper_id))
+
+    @app.route("/author/batch", methods=["POST"])
+    def author_batch():
+        author_ids = request.get_json()["ids"]
+        app.config["CALLS"].append(("author_batch", list(author_ids)))
+        return jsonify(
+            [None if f.startswith(MISSING_PREFIX) else author(f) for f in author_ids]
+        )
+
+    @app.route("/author/<author_id>", methods=["GET"])
+    def single_author(author_id):
+        app.config["CALLS"].append(("author", author_id))
+        if author_id.startswith(MISSING_PREFIX):
+            return jsonify({"error": "Author not found"}), 404
+        return jsonify(author(author_id))
+
+    @app.route("/arxiv", methods=["GET"])
+    def arxiv():
+        # The query string is built by ArxivTree.construct_arxiv_link and
+        # starts with the search query itself
+        query = urllib.parse.parse_qs(request.query_string.decode("utf-8"))
+        start = int(query["start"][0])
+        max_results = int(query["max_results"][0])
+        app.config["CALLS"].append(("arxiv", (start, max_results)))
+        return Response(
+            arxiv_feed(start, max_results, app.config["ARXIV_RESULTS"]),
+            mimetype="application/atom+xml",
+        )
+
+    return app
+
+
+class StandinServer:
+    def __init__(self, app: Flask = None):
+        """A stand-in server running in a background thread on a free local
+        port
+
+        Parameters
+        ----------
+        app : Flask, optional
+            App served by the server, by default create_app()
+        """
+        self.app = app if app is not None else create_app()
+        self.server = make_server("127.0.0.1", 0, self.app, threaded=True)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def calls(self) -> List:
+        return self.app.config["CALLS"]
+
+    @property
+    def arxiv_link(self) -> str:
+        return f"{self.url}/arxiv?search_query="
+
+    def start(self) -> "StandinServer":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.thread.join()
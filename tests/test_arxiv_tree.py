@@ -0,0 +1,97 @@
+import urllib.parse
+
+import pytest
+
+import generate_object_tree
+from generate_object_tree import ARXIV_RESOLVE_CHUNK, ArxivTree
+from http_client import HttpClient, ThrottledError
+from primitive_objects import ArxivPaper
+from rate_limiter import RateLimiter
+from standin import ARXIV_RESULTS
+
+
+@pytest.fixture
+def client(standin):
+    client = HttpClient(max_throttle_retries=1)
+    client.set_rate_limiter(
+        urllib.parse.urlsplit(standin.url).netloc, RateLimiter(rate=20.0, concurrency=4)
+    )
+    return client
+
+
+@pytest.fixture
+def tree(tmp_path, standin, client):
+    return ArxivTree(
+        str(tmp_path / "arxiv.json"),
+        api_link=standin.url,
+        client=client,
+        arxiv_link=standin.arxiv_link,
+    )
+
+
+def arxiv_paper(arxiv_id: str) -> ArxivPaper:
+    return ArxivPaper(
+        arxiv_id=f"abs/{arxiv_id}v1",
+        title=f"Title of {arxiv_id}",
+        authors=["A"],
+        abstract="",
+        primary_category=["cs"],
+        secondary_category=["LG"],
+    )
+
+
+def test_failed_batches_fall_back_to_single_lookups(tree, standin):
+    standin.app.config["BATCH_ERROR"] = True
+    papers = [arxiv_paper("2101.00001"), arxiv_paper("missing-2")]
+    tree.resolve_semsch_ids(papers)
+
+    assert [f.id for f in papers] == ["arXiv:2101.00001", None]
+    assert sorted(f for endpoint, f in standin.calls if endpoint == "paper") == [
+        "arXiv:2101.00001",
+        "arXiv:missing-2",
+    ]
+
+
+def test_throttled_batches_do_not_fall_back_to_single_lookups(tree, standin):
+    standin.app.config["THROTTLE"] = 100
+    with pytest.raises(ThrottledError):
+        tree.resolve_semsch_ids([arxiv_paper(f"2101.{i:05d}") for i in range(10)])
+
+    # The batch was retried once and no single lookup was sent
+    assert [endpoint for endpoint, f in standin.calls] == ["paper_batch"] * 2
+
+
+def test_arxiv_searches_are_read_page_by_page(tree, standin, client):
+    limiter = client.rate_limiters[urllib.parse.urlsplit(standin.url).netloc]
+    papers = tree.iter_arxiv_search(paper_title="graphs", page_size=100)
+    first = next(papers)
+
+    # The page was closed before its first chunk was resolved
+    assert limiter.get_stats()["in_flight"] == 0
+    assert standin.calls == [
+        ("arxiv", (0, 100)),
+        ("paper_batch", [f"arXiv:2101.{i:05d}" for i in range(ARXIV_RESOLVE_CHUNK)]),
+    ]
+    papers = [first] + list(papers)
+    assert [f.title for f in papers] == [f"Arxiv paper {i}" for i in range(ARXIV_RESULTS)]
+    assert papers[-1].id == f"arXiv:2101.{ARXIV_RESULTS - 1:05d}"
+    assert [f for endpoint, f in standin.calls if endpoint == "arxiv"] == [
+        (0, 100),
+        (100, 100),
+        (200, 100),
+    ]
+
+
+def test_arxiv_pages_are_cached_once_read(tree, standin, monkeypatch):
+    # Spooling the responses to disk after the first kilobyte
+    monkeypatch.setattr(generate_object_tree, "ARXIV_SPOOL_BYTES", 1024)
+    papers = tree.iter_arxiv_search(paper_title="graphs", max_results=150)
+    arxiv_ids = [f.arxiv_id for f in papers]
+    calls = len(standin.calls)
+
+    papers = tree.iter_arxiv_search(paper_title="graphs", max_results=150)
+    assert [f.arxiv_id for f in papers] == arxiv_ids
+    assert len(arxiv_ids) == 150
+    # Both pages were served from the cache and the papers were resolved already
+    assert len(standin.calls) == calls
+    assert tree.responses.get_stats()["hits"] == 2
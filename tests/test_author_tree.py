@@ -0,0 +1,58 @@
+import pytest
+
+import generate_object_tree
+from generate_object_tree import AuthorTree, SemSchTree
+from http_client import HttpClient
+from search_history import SearchHistory
+from standin import AUTHOR_PAPERS
+
+
+@pytest.fixture
+def trees(tmp_path, standin):
+    client = HttpClient()
+    history = SearchHistory(str(tmp_path / "prev_searches.csv"))
+    semsch_tree = SemSchTree(
+        str(tmp_path / "papers.json"), api_link=standin.url, client=client, history=history
+    )
+    author_tree = AuthorTree(str(tmp_path / "authors.json"), api_link=standin.url, client=client)
+    yield semsch_tree, author_tree
+    history.close()
+
+
+def test_only_the_top_neighbors_are_fetched_in_full(trees, standin, monkeypatch):
+    semsch_tree, author_tree = trees
+    monkeypatch.setattr(generate_object_tree, "AUTHOR_TOP_COAUTHORS", 2)
+    monkeypatch.setattr(generate_object_tree, "AUTHOR_TOP_PAPERS", 2)
+    name, _, paper_count, _, _, coauthors, papers = author_tree.get_author_data(
+        semsch_tree, "a1"
+    )
+
+    assert (name, paper_count) == ("Name of a1", AUTHOR_PAPERS)
+    coauthor_ids = {f"a1-coauthor{i}" for i in range(AUTHOR_PAPERS)}
+    paper_ids = {f"a1-paper{i}" for i in range(AUTHOR_PAPERS)}
+    # The metrics of every neighbor are requested in one batch, and only the
+    # neighbors shown on the page are requested in full
+    (endpoint, author_id), *calls = standin.calls
+    assert (endpoint, author_id) == ("author", "a1")
+    assert [endpoint for endpoint, f in calls] == [
+        "author_batch",
+        "paper_batch",
+        "author_batch",
+        "paper_batch",
+    ]
+    assert set(calls[0][1]) == coauthor_ids
+    assert set(calls[1][1]) == paper_ids
+    assert calls[2][1] == [f["id"] for f in coauthors]
+    assert calls[3][1] == [f["id"] for f in papers]
+    assert len(coauthors) == len(papers) == 2
+    assert {f["id"] for f in coauthors} <= coauthor_ids
+    assert {f["id"] for f in papers} <= paper_ids
+
+
+def test_unknown_authors_are_not_found(trees, standin):
+    semsch_tree, author_tree = trees
+    assert author_tree.get_author_data(semsch_tree, "missing-a1") is None
+    # The second lookup is answered by the negative cache
+    assert author_tree.get_author_data(semsch_tree, "missing-a1") is None
+
+    assert standin.calls == [("author", "missing-a1")]
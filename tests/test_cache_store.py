@@ -0,0 +1,191 @@
+import multiprocessing
+import threading
+
+import pytest
+
+from cache_store import CacheStore
+from generate_object_tree import ArxivTree, AuthorTree, SemSchTree
+from primitive_objects import ArxivPaper, Authors, SemSchPaper
+from search_history import SearchHistory
+from standin import CITATION_COUNT, paper
+
+WRITERS = 4
+BATCHES = 20
+BATCH_SIZE = 25
+
+
+def write_records(db_pth: str, writer: int) -> None:
+    """Writes BATCHES batches of records of its own and overwrites a record
+    shared by all the writers after every batch
+    """
+    store = CacheStore(db_pth)
+    for batch in range(BATCHES):
+        store.put_many(
+            {
+                f"w{writer}-b{batch}-r{i}": {"writer": writer, "batch": batch, "i": i}
+                for i in range(BATCH_SIZE)
+            }
+        )
+        store.put_many({"shared": {"writer": writer, "batch": batch}})
+
+
+def assert_no_lost_records(store: CacheStore) -> None:
+    records = dict(store.iter_items())
+    assert len(records) == WRITERS * BATCHES * BATCH_SIZE + 1
+    for writer in range(WRITERS):
+        for batch in range(BATCHES):
+            for i in range(BATCH_SIZE):
+                assert records[f"w{writer}-b{batch}-r{i}"] == {
+                    "writer": writer,
+                    "batch": batch,
+                    "i": i,
+                }
+    # The shared record is the last batch of one of the writers
+    assert records["shared"]["batch"] == BATCHES - 1
+
+
+def test_parallel_threads_do_not_lose_records(tmp_path):
+    store = CacheStore(str(tmp_path / "records.sqlite3"))
+    threads = [
+        threading.Thread(target=write_records, args=(store.db_pth, f))
+        for f in range(WRITERS)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert_no_lost_records(store)
+
+
+def test_parallel_processes_do_not_lose_records(tmp_path):
+    store = CacheStore(str(tmp_path / "records.sqlite3"))
+    # Forked like the worker processes of a server sharing the cache
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=write_records, args=(store.db_pth, f))
+        for f in range(WRITERS)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert [f.exitcode for f in processes] == [0] * WRITERS
+    assert_no_lost_records(store)
+
+
+def stored_paper(paper_id: str, citation_count: int) -> dict:
+    return SemSchPaper(
+        id=paper_id,
+        title=f"Title of {paper_id}",
+        citation_count=citation_count,
+        reference_count=3,
+        influential_paper_citations=0,
+    ).to_dict()
+
+
+@pytest.fixture(params=[False, True], ids=["eager", "lazy"])
+def tree(request, tmp_path):
+    cache_pth = str(tmp_path / "papers.json")
+    CacheStore.for_cache(cache_pth).put_many(
+        {"p0": stored_paper("p0", 1), "p1": stored_paper("p1", 1)}
+    )
+    history = SearchHistory(str(tmp_path / "prev_searches.csv"))
+    yield SemSchTree(cache_pth, lazy=request.param, history=history)
+    history.close()
+
+
+def test_sync_replaces_papers_stored_later_by_another_process(tree):
+    # Another process sharing the store fetched p0 again
+    other = CacheStore(tree.store.db_pth)
+    other.put_many({"p0": stored_paper("p0", 5)})
+
+    assert tree.sync(force=True) == 1
+    assert tree.papers_dict["p0"].citation_count == 5
+    assert tree.metrics.value("p0", "citation_count") == 5
+    assert tree.papers_dict["p1"].citation_count == 1
+    # The versions already in memory are not read again
+    assert tree.sync(force=True) == 0
+
+
+def test_sync_keeps_papers_changed_in_memory(tree):
+    tree.update_paper_info(paper("p1"), "p1")
+    other = CacheStore(tree.store.db_pth)
+    other.put_many({"p1": stored_paper("p1", 5)})
+
+    assert tree.sync(force=True) == 0
+    assert tree.papers_dict["p1"].citation_count == CITATION_COUNT
+
+    # The version the tree writes itself is newer and not read back
+    assert tree.write_cache()
+    assert tree.sync(force=True) == 0
+    assert tree.papers_dict["p1"].citation_count == CITATION_COUNT
+    assert tree.store.get("p1")["citation_count"] == CITATION_COUNT
+
+
+STORED_RECORDS = {
+    "semsch": (SemSchTree, lambda i: stored_paper(f"p{i}", i)),
+    "arxiv": (
+        ArxivTree,
+        lambda i: ArxivPaper(
+            arxiv_id=f"abs/2101.{i:05d}v1", title=f"Title {i}", authors=["A"], abstract=""
+        ).to_dict(),
+    ),
+    "author": (AuthorTree, lambda i: Authors(id=f"a{i}", name="A", citations=i).to_dict()),
+}
+
+
+@pytest.mark.parametrize("lazy", [False, True], ids=["eager", "lazy"])
+@pytest.mark.parametrize("kind", sorted(STORED_RECORDS))
+def test_every_tree_syncs_with_the_shared_store(tmp_path, kind, lazy):
+    tree_class, record = STORED_RECORDS[kind]
+    cache_pth = str(tmp_path / "records.json")
+    kwargs = {"history": SearchHistory(str(tmp_path / "h.csv"))} if kind == "semsch" else {}
+    tree = tree_class(cache_pth, lazy=lazy, **kwargs)
+    other = tree_class(cache_pth, lazy=lazy, **kwargs)
+
+    other.add_stored_record("r0", record(0))
+    other.dirty_ids.add("r0")
+    assert other.write_cache()
+    assert tree.sync(force=True) == 1
+    assert tree.records["r0"].to_dict() == record(0)
+    # A newer version written by the other tree replaces it
+    other.add_stored_record("r0", record(1))
+    other.dirty_ids.add("r0")
+    assert other.write_cache()
+    assert tree.sync(force=True) == 1
+    assert tree.records["r0"].to_dict() == record(1)
+    assert tree.sync(force=True) == 0
+    # Records written after the last sync are read through
+    other.add_stored_record("r1", record(2))
+    other.dirty_ids.add("r1")
+    assert other.write_cache()
+    assert not tree.needs_request("r1")
+    assert tree.records["r1"].to_dict() == record(2)
+    if "history" in kwargs:
+        kwargs["history"].close()
+
+
+def test_records_being_written_are_not_evicted(tmp_path):
+    history = SearchHistory(str(tmp_path / "prev_searches.csv"))
+    tree = SemSchTree(str(tmp_path / "papers.json"), lazy=True, max_records=1, history=history)
+    tree.update_paper_info(paper("p1"), "p1")
+    put_many = tree.store.put_many
+    read_back = []
+
+    def put_many_under_load(records):
+        # Other requests load papers while the write is not committed yet
+        for i in range(3):
+            tree.add_stored_record(f"p{i + 2}", stored_paper(f"p{i + 2}", i))
+        read_back.append(tree.papers_dict["p1"])
+        return put_many(records)
+
+    tree.store.put_many = put_many_under_load
+    assert tree.write_cache()
+    assert read_back[0].citation_count == CITATION_COUNT
+    # Once written the paper can be evicted and read back from the store
+    assert not tree.writing_ids
+    tree.papers_dict.trim()
+    assert tree.papers_dict["p1"].citation_count == CITATION_COUNT
+    history.close()
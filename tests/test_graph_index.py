@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from generate_object_tree import AuthorTree, SemSchTree
+from graph_index import AUTHORS, CITATIONS, REFERENCES, WORKED_WITH, GraphIndex
+from http_client import HttpClient
+from search_history import SearchHistory
+
+
+def random_papers(count: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    return {
+        f"p{i}": {
+            "references": [f"p{rng.randrange(2 * count)}" for _ in range(rng.randrange(8))],
+            "citations": [f"p{rng.randrange(2 * count)}" for _ in range(rng.randrange(4))],
+            "authors": [{"authorId": f"a{rng.randrange(20)}"}],
+        }
+        for i in range(count)
+    }
+
+
+def test_in_degrees_match_the_edges():
+    graph = GraphIndex()
+    papers = random_papers(200)
+    for paper_id, paper in papers.items():
+        graph.add_paper(paper_id, paper)
+    # Replacing some of the papers after a merge
+    graph.build()
+    replaced = random_papers(50, seed=1)
+    for paper_id, paper in replaced.items():
+        graph.add_paper(paper_id, paper)
+        papers[paper_id] = paper
+
+    for target in [f"p{i}" for i in range(400)] + ["unknown"]:
+        sources = [
+            k for k, v in papers.items() if target in dict.fromkeys(v["references"])
+        ]
+        assert graph.degree(REFERENCES, target, incoming=True) == len(sources)
+        # The sources come in the order of their node integers
+        assert sorted(graph.neighbors(REFERENCES, target, incoming=True)) == sorted(sources)
+
+    top = graph.top_degrees(AUTHORS, 3, incoming=True)
+    for author_id, degree in top:
+        assert degree == graph.degree(AUTHORS, author_id, incoming=True)
+
+
+def test_neighbors_of_new_nodes_do_not_wait_for_a_merge():
+    graph = GraphIndex()
+    graph.add_paper("p0", {"references": ["p1", "p2", "p1", None], "citations": ["p3"]})
+    graph.build()
+    graph.add_paper("p4", {"references": ["p0"]})
+
+    assert graph.neighbors(REFERENCES, "p0") == ["p1", "p2"]
+    assert graph.neighbors(REFERENCES, "p4") == ["p0"]
+    assert graph.degree(REFERENCES, "p4") == 1
+    # The row of p4 is still pending
+    assert graph.adjacency[REFERENCES].pending
+    assert graph.degree(REFERENCES, "p0", incoming=True) == 1
+    assert not graph.adjacency[REFERENCES].pending
+    # Replacing a merged row
+    graph.add_paper("p0", {"references": ["p2"], "citations": []})
+    assert graph.neighbors(REFERENCES, "p0") == ["p2"]
+    assert graph.neighbors(CITATIONS, "p0") == []
+
+
+@pytest.fixture
+def trees(tmp_path):
+    history = SearchHistory(str(tmp_path / "prev_searches.csv"))
+    semsch_tree = SemSchTree(
+        str(tmp_path / "papers.json"), client=HttpClient(), history=history
+    )
+    author_tree = AuthorTree(str(tmp_path / "authors.json"), client=HttpClient())
+    yield semsch_tree, author_tree
+    history.close()
+
+
+def test_explore_lookups_read_the_graph(trees):
+    semsch_tree, author_tree = trees
+    paper = {"id": "p0", "title": "Title of p0", "references": ["p1", "p2"], "citations": ["p3"]}
+    author = {"id": "a0", "name": "A", "papers": ["p0", "p1"], "worked_with": ["a1"]}
+    semsch_tree.store.put_many({"p0": paper})
+    semsch_tree.add_stored_record("p0", paper)
+    author_tree.store.put_many({"a0": author})
+    author_tree.add_stored_record("a0", author)
+    from_records = (semsch_tree.paper_neighbors("p0"), author_tree.author_neighbors("a0"))
+
+    graph = GraphIndex(semsch_tree, author_tree)
+    assert (semsch_tree.paper_neighbors("p0"), author_tree.author_neighbors("a0")) == from_records
+    assert from_records == ((["p1", "p2"], ["p3"]), (["a1"], ["p0", "p1"]))
+    queries = graph.get_stats()["queries"]
+
+    # Records added after the index are looked up in it too
+    author_tree.add_stored_record(
+        "a1", {"id": "a1", "name": "B", "papers": ["p0"], "worked_with": ["a0"]}
+    )
+    assert author_tree.author_neighbors("a1") == (["a0"], ["p0"])
+    assert graph.get_stats()["queries"] == queries + 2
+    assert graph.degree(WORKED_WITH, "a0", incoming=True) == 1
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from metrics_table import MetricsTable, top_k_keys
+
+
+@pytest.fixture
+def table():
+    table = MetricsTable(["citations", "hindex"], capacity=2)
+    for i, citations in enumerate([5, None, 7, 5, 1]):
+        table.upsert(f"a{i}", {"citations": citations, "hindex": i})
+    return table
+
+
+def test_sorted_rows_match_order(table):
+    for descending in (True, False):
+        expected = table.order("citations", descending=descending, drop_missing=False)
+        assert table.sorted_rows("citations", descending).tolist() == expected.tolist()
+    assert table.keys_at(table.sorted_rows("citations")) == ["a2", "a0", "a3", "a4", "a1"]
+
+
+def test_sorted_rows_are_cached_until_the_column_changes(table):
+    rows = table.sorted_rows("citations")
+    assert table.sorted_rows("citations") is rows
+    assert not rows.flags.writeable
+
+    # Updates that leave the column unchanged keep the ordering
+    table.upsert("a0", {"citations": 5, "hindex": 10})
+    table.upsert("a1", {"citations": None, "hindex": 11})
+    assert table.sorted_rows("citations") is rows
+
+    table.upsert("a4", {"citations": 9, "hindex": 4})
+    assert table.keys_at(table.sorted_rows("citations")) == ["a4", "a2", "a0", "a3", "a1"]
+
+    # A new row changes every column
+    hindex_rows = table.sorted_rows("hindex")
+    table.upsert("a5", {"citations": 6})
+    assert table.sorted_rows("hindex") is not hindex_rows
+    assert table.keys_at(table.sorted_rows("citations")) == [
+        "a4", "a2", "a5", "a0", "a3", "a1"
+    ]
+
+
+def test_filter_keeps_the_sorted_order(table):
+    rows = table.filter(table.sorted_rows("citations"), min_values={"citations": 2})
+    assert table.keys_at(rows) == ["a2", "a0", "a3"]
+
+
+def test_top_k_keys_reads_the_tables_in_order(table):
+    ranked = MetricsTable(["citations"])
+    ranked.upsert("b0", {"citations": 6})
+    ranked.upsert("a2", {"citations": 100})
+
+    keys = ["a0", "b0", "a2", "missing", "a3", "a0"]
+    assert top_k_keys(keys, "citations", 3, [table, ranked]) == ["a2", "b0", "a0"]
+    assert top_k_keys(keys, "citations", 10, [table, ranked])[-1] == "missing"
+    assert np.isnan(table.value("missing", "citations"))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_top_k_keys_match_a_sort(seed):
+    rng = np.random.default_rng(seed)
+    cached = MetricsTable(["citations"])
+    ranked = MetricsTable(["citations"])
+    for i in range(300):
+        # Few distinct values give many ties, and some values are missing
+        value = rng.integers(20) if rng.random() < 0.9 else None
+        table = cached if rng.random() < 0.5 else ranked
+        table.upsert(f"k{i}", {"citations": value})
+    ranked.upsert("k0", {"citations": 1000})
+    keys = [f"k{i}" for i in rng.permutation(320)]
+
+    def sort_key(position):
+        key = keys[position]
+        table = cached if key in cached else ranked
+        value = table.value(key, "citations")
+        return (np.inf if np.isnan(value) else -value, position)
+
+    expected = [keys[f] for f in sorted(range(len(keys)), key=sort_key)]
+    for k in (0, 1, 10, 57, 320, 400):
+        assert top_k_keys(keys, "citations", k, [cached, ranked]) == expected[:k]
@@ -0,0 +1,166 @@
+import threading
+import time
+import urllib.parse
+
+import pytest
+
+from generate_object_tree import AuthorTree, SemSchTree
+from http_client import HttpClient, NoCapacityError
+from prefetch import PAPER, Prefetcher
+from rate_limiter import RateLimiter
+from search_history import SearchHistory
+from single_flight import SingleFlight
+
+
+@pytest.fixture
+def limiter():
+    return RateLimiter(rate=20.0, concurrency=4)
+
+
+@pytest.fixture
+def trees(tmp_path, standin, limiter):
+    client = HttpClient()
+    client.set_rate_limiter(urllib.parse.urlsplit(standin.url).netloc, limiter)
+    history = SearchHistory(str(tmp_path / "prev_searches.csv"))
+    semsch_tree = SemSchTree(
+        str(tmp_path / "papers.json"), api_link=standin.url, client=client, history=history
+    )
+    author_tree = AuthorTree(str(tmp_path / "authors.json"), api_link=standin.url, client=client)
+    yield semsch_tree, author_tree
+    history.close()
+
+
+def batch_calls(standin):
+    return [f for endpoint, f in standin.calls if endpoint == "paper_batch"]
+
+
+def test_prefetch_waits_for_spare_capacity(trees, standin, limiter):
+    semsch_tree, author_tree = trees
+    semsch_tree.update_papers(["p0"])
+    # The API throttled a request of a user, so the limiter has no free slot
+    limiter.release(429, "10", ticket=limiter.acquire())
+
+    prefetcher = Prefetcher(semsch_tree, author_tree, workers=1, max_depth=1).start()
+    prefetcher.schedule_paper(semsch_tree.papers_dict["p0"])
+    deadline = time.monotonic() + 5.0
+    while prefetcher.get_stats()["deferred"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    prefetcher.stop()
+
+    assert prefetcher.get_stats()["deferred"] >= 1
+    assert batch_calls(standin) == [["p0"]]
+    # The prefetcher never waited in acquire() for a slot
+    assert limiter.get_stats()["in_flight"] == 0
+    assert limiter.wait_time < 0.1
+
+
+def test_prefetched_nodes_are_tracked_up_to_max_tracked(trees, standin):
+    semsch_tree, author_tree = trees
+    prefetcher = Prefetcher(semsch_tree, author_tree, max_depth=1, max_tracked=2)
+    prefetcher._fetch([((1, 0, i), PAPER, f"p{i}", 1) for i in range(3)])
+
+    assert batch_calls(standin) == [["p0", "p1", "p2"]]
+    assert list(prefetcher.prefetched) == [(PAPER, "p1"), (PAPER, "p2")]
+
+    prefetcher.record_lookup(PAPER, "p2", True)
+    # p0 is cached but no longer tracked, and p1 was evicted by the tree
+    prefetcher.record_lookup(PAPER, "p0", True)
+    prefetcher.record_lookup(PAPER, "p1", False)
+    stats = prefetcher.get_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert not prefetcher.prefetched
+
+
+def test_spare_capacity_raises_instead_of_waiting(standin, limiter):
+    client = HttpClient()
+    client.set_rate_limiter(urllib.parse.urlsplit(standin.url).netloc, limiter)
+    limiter.release(429, "10", ticket=limiter.acquire())
+
+    start = time.monotonic()
+    with client.spare_capacity():
+        with pytest.raises(NoCapacityError):
+            client.post(f"{standin.url}/paper/batch", json={"ids": ["p0"]})
+    assert time.monotonic() - start < 0.1
+    assert batch_calls(standin) == []
+    # Outside of the context the requests wait for the limiter again
+    assert not client._local.spare_only
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_followers_fetch_themselves_when_the_leader_has_no_capacity():
+    flights = SingleFlight(retry_errors=(NoCapacityError,))
+    go = threading.Event()
+
+    def refused():
+        go.wait()
+        raise NoCapacityError("no spare capacity")
+
+    errors = []
+    results = []
+
+    def prefetch():
+        try:
+            flights.do("p5", refused)
+        except NoCapacityError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=prefetch)
+    leader.start()
+    wait_for(lambda: flights.get_stats()["in_flight"] == 1)
+    follower = threading.Thread(target=lambda: results.append(flights.do("p5", lambda: "user")))
+    follower.start()
+    wait_for(lambda: flights.get_stats()["shared"] == 1)
+    go.set()
+    leader.join()
+    follower.join()
+
+    assert len(errors) == 1
+    assert results == ["user"]
+
+
+def test_batch_followers_fetch_the_keys_the_prefetcher_could_not(trees, standin, limiter):
+    semsch_tree, author_tree = trees
+    go = threading.Event()
+    request_paper_batch = semsch_tree.request_paper_batch
+    prefetching = threading.local()
+
+    def held_request_paper_batch(paper_ids, **kwargs):
+        if getattr(prefetching, "value", False):
+            go.wait()
+        return request_paper_batch(paper_ids, **kwargs)
+
+    semsch_tree.request_paper_batch = held_request_paper_batch
+    errors = []
+
+    def prefetch():
+        prefetching.value = True
+        try:
+            with semsch_tree.client.spare_capacity():
+                semsch_tree.update_papers(["p5"])
+        except NoCapacityError as e:
+            errors.append(e)
+
+    prefetcher = threading.Thread(target=prefetch)
+    prefetcher.start()
+    wait_for(lambda: semsch_tree.flights.get_stats()["in_flight"] == 1)
+    # Other requests of users hold all the slots of the limiter
+    tickets = [limiter.acquire() for _ in range(limiter.concurrency)]
+    user = threading.Thread(target=semsch_tree.update_papers, args=(["p5", "p6"],))
+    user.start()
+    wait_for(lambda: semsch_tree.flights.get_stats()["shared"] == 1)
+    go.set()
+    prefetcher.join()
+    for ticket in tickets:
+        limiter.release(200, ticket=ticket)
+    user.join()
+
+    assert len(errors) == 1
+    # The user fetched p6 and then p5, which the prefetcher could not fetch
+    assert batch_calls(standin) == [["p6"], ["p5"]]
+    assert "p5" in semsch_tree.papers_dict and "p6" in semsch_tree.papers_dict
@@ -0,0 +1,127 @@
+import threading
+import time
+import urllib.parse
+
+import pytest
+
+from http_client import HttpClient, ThrottledError
+from rate_limiter import RateLimiter, parse_retry_after
+from standin import STREAM_CHUNK_SIZE, STREAM_CHUNKS
+
+
+@pytest.fixture
+def limiter():
+    return RateLimiter(rate=20.0, min_rate=1.0, max_rate=40.0, concurrency=4, max_concurrency=8)
+
+
+@pytest.fixture
+def client(standin, limiter):
+    client = HttpClient(max_throttle_retries=2)
+    client.set_rate_limiter(urllib.parse.urlsplit(standin.url).netloc, limiter)
+    return client
+
+
+def throttled_calls(standin):
+    return [f for endpoint, f in standin.calls if endpoint == "throttled"]
+
+
+def test_429_halves_the_limits_and_waits_for_retry_after(standin, client, limiter):
+    standin.app.config.update(THROTTLE=1, RETRY_AFTER="0.3")
+    start = time.monotonic()
+    response = client.get(f"{standin.url}/throttled")
+
+    assert response.status_code == 200
+    assert time.monotonic() - start >= 0.3
+    assert throttled_calls(standin) == [True, False]
+    stats = limiter.get_stats()
+    assert stats["throttled"] == 1
+    assert stats["concurrency"] == 2
+    # Halved to 10 requests per second, then one additive increase
+    assert stats["rate"] == pytest.approx(10.0 + 1 / 10.0)
+
+
+def test_limits_recover_additively_after_a_backoff(standin, client, limiter):
+    standin.app.config.update(THROTTLE=1)
+    client.get(f"{standin.url}/throttled")
+    rates = []
+    for _ in range(20):
+        assert client.get(f"{standin.url}/throttled").status_code == 200
+        rates.append(limiter.rate)
+
+    assert rates == sorted(rates)
+    assert rates[-1] > 11.5
+    assert limiter.concurrency > 2
+
+
+def test_a_burst_of_429_halves_the_limits_once(standin, client, limiter):
+    # The four requests are in flight together and all throttled
+    standin.app.config.update(THROTTLE=4, THROTTLE_DELAY=0.2)
+    threads = [
+        threading.Thread(target=client.get, args=(f"{standin.url}/throttled",))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert throttled_calls(standin).count(True) == 4
+    assert limiter.throttled_count == 4
+    # Halved once to 10 requests per second and 2 in flight, then raised by
+    # the four successful retries, instead of 20 / 2 ** 4 requests per second
+    assert 10.0 <= limiter.rate < 11.0
+    assert limiter.concurrency in (2, 3)
+
+
+def test_429_of_requests_sent_after_a_decrease_decrease_again(limiter):
+    first = limiter.acquire()
+    limiter.release(429, "0", ticket=first)
+    second = limiter.acquire()
+    limiter.release(429, "0", ticket=second)
+
+    assert limiter.rate == pytest.approx(5.0)
+    assert limiter.concurrency == 1
+
+
+def test_exhausted_retries_raise(standin, client):
+    standin.app.config.update(THROTTLE=100)
+    with pytest.raises(ThrottledError) as error:
+        client.get(f"{standin.url}/throttled")
+
+    assert error.value.response.status_code == 429
+    assert throttled_calls(standin) == [True] * 3
+
+
+def test_streamed_responses_hold_their_slot_until_read(standin, client, limiter):
+    response = client.get(f"{standin.url}/stream", stream=True)
+    assert limiter.get_stats()["in_flight"] == 1
+
+    body = b"".join(response.iter_content(4096))
+    assert len(body) == STREAM_CHUNKS * STREAM_CHUNK_SIZE
+    assert limiter.get_stats()["in_flight"] == 0
+    # Closing the read response does not release the slot twice
+    response.close()
+    assert limiter.get_stats()["in_flight"] == 0
+
+
+def test_closing_a_streamed_response_releases_its_slot(standin, client, limiter):
+    with client.get(f"{standin.url}/stream", stream=True) as response:
+        response.raw.read(10)
+        assert limiter.get_stats()["in_flight"] == 1
+    assert limiter.get_stats()["in_flight"] == 0
+
+
+def test_try_acquire_does_not_wait(limiter):
+    limiter.release(429, "10", ticket=limiter.acquire())
+
+    start = time.monotonic()
+    assert limiter.try_acquire() is None
+    assert time.monotonic() - start < 0.1
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("1.5") == 1.5
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
@@ -0,0 +1,44 @@
+import time
+
+from primitive_objects import SemSchPaper
+from search_history import SearchHistory
+
+
+def explored_paper(paper_id: str) -> SemSchPaper:
+    return SemSchPaper(
+        id=paper_id,
+        title=f"Title of {paper_id}",
+        citation_count=1,
+        reference_count=2,
+        influential_paper_citations=0,
+    )
+
+
+def test_reads_do_not_wait_for_the_writer(tmp_path):
+    history = SearchHistory(str(tmp_path / "prev_searches.csv"), flush_interval=1.0)
+    history.append_rows([["p0", "Title of p0", 1, 2, 0]])
+    history.record(explored_paper("p1"))
+
+    start = time.monotonic()
+    records, total = history.page()
+    assert time.monotonic() - start < 0.5
+    # Only the row already on disk is read, the queued one is not awaited
+    assert total == 1
+    assert records[0]["paper_id"] == "p0"
+
+    history.flush()
+    records, total = history.page()
+    assert total == 2
+    assert [f["paper_id"] for f in records] == ["p1", "p0"]
+    history.close()
+
+
+def test_most_viewed_counts_every_row(tmp_path):
+    history = SearchHistory(str(tmp_path / "prev_searches.csv"), flush_interval=0.01)
+    for paper_id in ["p1", "p2", "p1", "p1", "p2", "p3"]:
+        history.record(explored_paper(paper_id))
+    history.flush()
+
+    most_viewed = history.most_viewed(2)
+    assert [(f["paper_id"], f["views"]) for f in most_viewed] == [("p1", 3), ("p2", 2)]
+    history.close()
@@ -0,0 +1,147 @@
+import random
+
+import pytest
+
+from search_index import (
+    AuthorIndex,
+    CategoryIndex,
+    TokenIndex,
+    TrigramIndex,
+    normalize_name,
+    parse_keyword_query,
+)
+from utils import arxiv_abstract_match, lev_dist, tokenize
+
+WORDS = ["graph", "neural", "Network", "transformer", "attention", "loss", "AND", "OR"]
+
+
+def random_text(rng: random.Random, max_words: int = 8) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randrange(max_words)))
+
+
+def random_documents(rng: random.Random, count: int) -> dict:
+    documents = {f"d{i}": random_text(rng) for i in range(count)}
+    # Replacing and removing some of the documents
+    for i in rng.sample(range(count), count // 4):
+        documents[f"d{i}"] = random_text(rng)
+    return documents
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_keyword_search_matches_a_scan(seed):
+    rng = random.Random(seed)
+    index = TokenIndex()
+    documents = {}
+    for doc_id, text in random_documents(rng, 200).items():
+        index.add(doc_id, text)
+        documents[doc_id] = text
+    for doc_id in rng.sample(sorted(documents), 20):
+        index.remove(doc_id)
+        del documents[doc_id]
+
+    for _ in range(100):
+        query = random_text(rng, 5)
+        doc_tokens = {k: set(tokenize(v)) for k, v in documents.items()}
+        expected = sorted(
+            k
+            for k, tokens in doc_tokens.items()
+            if any(set(clause) <= tokens for clause in parse_keyword_query(query))
+        )
+        assert index.search(query) == expected
+
+
+def test_plain_keywords_match_the_abstract_scan():
+    rng = random.Random(0)
+    index = TokenIndex()
+    documents = random_documents(rng, 200)
+    for doc_id, text in documents.items():
+        index.add(doc_id, text)
+
+    keywords = [f for f in WORDS if f not in ("AND", "OR")]
+    for _ in range(50):
+        query = " ".join(rng.sample(keywords, rng.randrange(1, 4)))
+        # Any of the keywords matches, as in the scan the index replaced
+        assert index.search(query) == sorted(
+            k for k, v in documents.items() if arxiv_abstract_match(query, v)
+        )
+
+
+def random_name(rng: random.Random) -> str:
+    first = "".join(rng.choice("abn") for _ in range(rng.randrange(1, 5)))
+    last = "".join(rng.choice("abn") for _ in range(rng.randrange(1, 6)))
+    return rng.choice([f"{first} {last}", f"{first.title()}  {last.upper()}", last])
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_author_search_matches_a_scan(seed):
+    rng = random.Random(seed)
+    index = AuthorIndex()
+    documents = {}
+    for i in range(300):
+        names = [random_name(rng) for _ in range(rng.randrange(4))]
+        index.add(f"d{i % 250}", names)
+        documents[f"d{i % 250}"] = names
+    for doc_id in rng.sample(sorted(documents), 25):
+        index.remove(doc_id)
+        del documents[doc_id]
+
+    for _ in range(50):
+        query = random_name(rng)
+        distances = {
+            k: min(
+                (lev_dist(normalize_name(f), normalize_name(query)) for f in names),
+                default=None,
+            )
+            for k, names in documents.items()
+        }
+        for threshold in range(5):
+            expected = sorted(
+                k for k, dist in distances.items() if dist is not None and dist < threshold
+            )
+            assert index.search(query, threshold) == expected
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_category_bitmaps_match_a_scan(seed):
+    rng = random.Random(seed)
+    categories = ["LG", "CV", "CL", "AI"]
+    index = CategoryIndex()
+    documents = {}
+    for _ in range(400):
+        doc_pos = rng.randrange(300)
+        doc_categories = rng.sample(categories, rng.randrange(3))
+        index.add(doc_pos, doc_categories)
+        documents[doc_pos] = set(doc_categories)
+    for doc_pos in rng.sample(sorted(documents), 30):
+        index.remove(doc_pos)
+        del documents[doc_pos]
+
+    for category in categories + ["unknown"]:
+        assert CategoryIndex.positions(index.bitmap(category)) == sorted(
+            k for k, v in documents.items() if category in v
+        )
+    both = index.bitmap("LG") & index.bitmap("CV")
+    either = index.bitmap("LG") | index.bitmap("CV")
+    assert CategoryIndex.positions(both) == sorted(
+        k for k, v in documents.items() if {"LG", "CV"} <= v
+    )
+    assert CategoryIndex.positions(either) == sorted(
+        k for k, v in documents.items() if v & {"LG", "CV"}
+    )
+
+
+@pytest.mark.parametrize("threshold", [3, 30])
+def test_title_search_matches_a_scan(threshold):
+    rng = random.Random(threshold)
+    index = TrigramIndex()
+    documents = {}
+    for i in range(300):
+        text = random_text(rng, 12)
+        index.add(i % 250, text)
+        documents[i % 250] = text
+
+    for _ in range(20):
+        query = rng.choice(list(documents.values()) + [random_text(rng, 12)])
+        assert index.search(query, threshold) == sorted(
+            k for k, v in documents.items() if lev_dist(v, query) < threshold
+        )
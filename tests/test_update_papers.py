@@ -0,0 +1,112 @@
+import urllib.parse
+
+import pytest
+
+import generate_object_tree
+from generate_object_tree import SemSchTree
+from http_client import HttpClient, ThrottledError
+from rate_limiter import RateLimiter
+from search_history import SearchHistory
+from standin import CITATION_COUNT
+
+
+@pytest.fixture
+def tree(tmp_path, standin):
+    history = SearchHistory(str(tmp_path / "prev_searches.csv"))
+    tree = SemSchTree(
+        str(tmp_path / "papers.json"),
+        api_link=standin.url,
+        client=HttpClient(),
+        history=history,
+    )
+    yield tree
+    history.close()
+
+
+def test_missing_papers_are_requested_in_chunks(tree, standin):
+    paper_ids = [f"p{i}" for i in range(250)]
+    tree.update_papers(paper_ids + paper_ids[:10])
+
+    batches = [f for endpoint, f in standin.calls if endpoint == "paper_batch"]
+    assert [len(f) for f in batches] == [100, 100, 50]
+    assert [f for batch in batches for f in batch] == paper_ids
+    assert all(f in tree.papers_dict for f in paper_ids)
+
+
+def test_cached_papers_are_not_requested_again(tree, standin):
+    tree.update_papers(["p1", "p2"])
+    tree.update_papers(["p1", "p2", "p3"])
+
+    batches = [f for endpoint, f in standin.calls if endpoint == "paper_batch"]
+    assert batches == [["p1", "p2"], ["p3"]]
+
+
+def test_batch_results_feed_update_paper_info(tree):
+    tree.update_papers(["p1", "alias-p2", "missing-p3"])
+
+    paper = tree.papers_dict["p1"]
+    assert paper.title == "Title of p1"
+    assert [f["authorId"] for f in paper.authors] == ["author-p1"]
+    # References without an ID are dropped and the citations are the ten most
+    # influential ones
+    assert list(paper.references) == [f"p1-ref{i}" for i in range(3)]
+    assert list(paper.citations) == [
+        f"p1-cit{i}" for i in range(CITATION_COUNT - 1, CITATION_COUNT - 11, -1)
+    ]
+    # A paper returned under another ID is stored under both IDs
+    assert tree.papers_dict["alias-p2"] is tree.papers_dict["canonical-alias-p2"]
+    # Unknown papers are skipped and not requested again
+    assert "missing-p3" not in tree.papers_dict
+    assert "missing-p3" in tree.misses
+
+
+def test_batch_size_follows_the_module_constant(tree, standin, monkeypatch):
+    monkeypatch.setattr(generate_object_tree, "SEMSCH_BATCH_SIZE", 4)
+    tree.update_papers([f"p{i}" for i in range(10)])
+
+    batches = [f for endpoint, f in standin.calls if endpoint == "paper_batch"]
+    assert [len(f) for f in batches] == [4, 4, 2]
+
+
+def test_failed_batches_fall_back_to_single_requests(tree, standin):
+    standin.app.config["BATCH_ERROR"] = True
+    tree.update_papers(["p1", "missing-p2"])
+
+    assert standin.calls == [
+        ("paper_batch", ["p1", "missing-p2"]),
+        ("paper", "p1"),
+        ("paper", "missing-p2"),
+    ]
+    assert tree.papers_dict["p1"].title == "Title of p1"
+    assert "missing-p2" in tree.misses
+
+
+def test_papers_are_requested_one_by_one_without_batch(tree, standin):
+    tree.update_papers(["p1", "p2", "p1"], batch=False)
+
+    assert standin.calls == [("paper", "p1"), ("paper", "p2")]
+    assert tree.papers_dict["p2"].title == "Title of p2"
+
+
+def test_throttled_metric_requests_are_raised(tmp_path, standin):
+    client = HttpClient(max_throttle_retries=1)
+    client.set_rate_limiter(
+        urllib.parse.urlsplit(standin.url).netloc, RateLimiter(rate=20.0, concurrency=4)
+    )
+    history = SearchHistory(str(tmp_path / "prev_searches.csv"))
+    tree = SemSchTree(
+        str(tmp_path / "papers.json"), api_link=standin.url, client=client, history=history
+    )
+    standin.app.config["THROTTLE"] = 100
+    with pytest.raises(ThrottledError):
+        tree.update_ranked_metrics(["p1", "p2"])
+    history.close()
+
+
+def test_unknown_papers_are_not_found(tree, standin):
+    assert tree.fetch_paper_data("missing-p1") is None
+    # The second lookup is answered by the negative cache
+    assert tree.fetch_paper_data("missing-p1") is None
+    assert tree.fetch_paper_data(None) is None
+
+    assert [c for c in standin.calls if c[0] == "paper"] == [("paper", "missing-p1")]
@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from utils import lev_dist, lev_dist_below, lev_dist_bit_parallel, lev_dist_bounded
+
+
+def reference_lev_dist(token1: str, token2: str) -> int:
+    """Plain dynamic programming over the full distance matrix"""
+    prev_row = list(range(len(token2) + 1))
+    for t1, char1 in enumerate(token1, 1):
+        curr_row = [t1]
+        for t2, char2 in enumerate(token2, 1):
+            curr_row.append(
+                min(
+                    prev_row[t2] + 1,
+                    curr_row[t2 - 1] + 1,
+                    prev_row[t2 - 1] + (char1 != char2),
+                )
+            )
+        prev_row = curr_row
+    return prev_row[-1]
+
+
+def random_pairs(count: int, seed: int, max_len: int = 12):
+    rng = random.Random(seed)
+    for _ in range(count):
+        # A small alphabet gives many close pairs
+        token1 = "".join(rng.choice("abc") for _ in range(rng.randrange(max_len)))
+        if rng.random() < 0.5:
+            # An edited copy of the first string
+            token2 = list(token1)
+            for _ in range(rng.randrange(5)):
+                pos = rng.randrange(len(token2) + 1)
+                edit = rng.randrange(3)
+                if edit == 0:
+                    token2.insert(pos, rng.choice("abcd"))
+                elif pos < len(token2):
+                    if edit == 1:
+                        del token2[pos]
+                    else:
+                        token2[pos] = rng.choice("abcd")
+            token2 = "".join(token2)
+        else:
+            token2 = "".join(rng.choice("abc") for _ in range(rng.randrange(max_len)))
+        yield token1, token2
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_bounded_distance_matches_the_full_matrix(seed):
+    for token1, token2 in random_pairs(500, seed):
+        expected = reference_lev_dist(token1, token2)
+        for max_dist in range(0, 6):
+            assert lev_dist_bounded(token1, token2, max_dist) == min(expected, max_dist + 1)
+            assert lev_dist_below(token1, token2, max_dist) == (expected < max_dist)
+        assert lev_dist(token1, token2) == expected
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_bit_parallel_distance_matches_the_full_matrix(seed):
+    # Strings longer than a machine word, the bit vectors are Python integers
+    for token1, token2 in random_pairs(200, seed, max_len=90):
+        expected = reference_lev_dist(token1, token2)
+        assert lev_dist_bit_parallel(token1, token2) == expected
+        for max_dist in (10, 29):
+            assert lev_dist_bounded(token1, token2, max_dist) == min(expected, max_dist + 1)
+
+
+@pytest.mark.parametrize(
+    "token1, token2, expected",
+    [
+        ("", "", 0),
+        ("", "abc", 3),
+        ("kitten", "sitting", 3),
+        ("flaw", "lawn", 2),
+        ("abc", "cba", 2),
+    ],
+)
+def test_known_distances(token1, token2, expected):
+    assert lev_dist(token1, token2) == expected
+    assert lev_dist_bounded(token2, token1, expected) == expected
+    if expected > 0:
+        # One less than the distance is exceeded
+        assert lev_dist_bounded(token1, token2, expected - 1) == expected